@@ -1,14 +1,33 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import io
+import os
 import json
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+import logging
 import time
-from datetime import datetime
-import base64
-import os
-import geopandas as gpd
+from ev_insights.data import DATA_DIR, sales_year_columns
+from ev_insights.growth import ROLLING_WINDOW
+from ev_insights.forecast import (DEFAULT_MODEL as DEFAULT_FORECAST_MODEL, HORIZON as FORECAST_HORIZON,
+                                  MIN_HISTORY as FORECAST_MIN_HISTORY, MODELS as FORECAST_MODELS)
+from ev_insights.cube import share_with_others, top_n
+from ev_insights.analytics import (category_heatmap, category_sales, category_trend, filter_maker_places, forecast_ranking,
+                                   growth_ranking, maker_place_options, pcs_totals_by_state, sales_outlook)
+from ev_insights.timeseries import RESOLUTIONS, slice_dates
+from ev_insights.snapshot import SNAPSHOT_DIR, load_snapshot, watched_paths
+from ev_insights.datasets import KPI_SUMMARY, PAGE_DATASETS, load_dataset
+from ev_insights.kpis import sales_delta_pct
+from ev_insights.cache import LRUCache
+from ev_insights.boundaries import BOUNDARY_DIR, DEFAULT_LOD, LEVELS_OF_DETAIL, boundary_path, load_boundaries
+from ev_insights.spatial import StateLocator, count_by_state
+from ev_insights.clustering import DEFAULT_ZOOM, MAX_MAP_POINTS, cap_points
+from ev_insights.geocode import DEFAULT_SEED_CSV, DEFAULT_STORE_PATH, INTERACTIVE_TIMEOUT_S, GeocodeStore, make_backend
+from ev_insights.freshness import DataMonitor
+from ev_insights.dataplane import DEFAULT_ROOT as DATAPLANE_DEFAULT_ROOT, attach, published_paths
+from ev_insights.instrument import METRICS, logger as metrics_logger, serve_metrics
+from ev_insights.export import EXPORT_FORMATS, export_bytes, export_file_name, export_mime
+from ev_insights.lazy import lazy_module
+
+px = lazy_module("plotly.express")  # Imported on the first chart built, not on every worker's cold start
 
 # ---------- Page Configuration ----------
 st.set_page_config(
@@ -72,91 +91,172 @@ st.markdown(
 
 
 # ---------- Data Loading and Caching ----------
-@st.cache_data(ttl=3600) # Cache for 1 hour
-def load_data():
+# Cleaned frames come from the columnar snapshot under data/snapshot (see ev_insights/snapshot.py);
+# the CSVs are only re-parsed when their content hash changes. Opening the snapshot reads just its
+# manifest and KPI summary - each page then loads only the datasets it declares in
+# ev_insights.datasets.PAGE_DATASETS. cache_resource shares the memory-mapped frames across
+# sessions instead of copying them per rerun - treat them as read-only.
+# Cached data lives until its input files change (ev_insights/freshness.py): every rerun compares
+# the files' size/mtime, or with EV_WATCH_DATA=1 a watchdog observer flags changes as they happen.
+# EV_DATAPLANE=<dir> (or 1 for the default /dev/shm location) attaches to the tables a separate
+# `python -m ev_insights.dataplane` loader publishes in shared memory, so worker processes share one
+# copy instead of each loading the snapshot; the published manifest is then the only input to watch.
+DATAPLANE_ROOT = os.environ.get("EV_DATAPLANE") or None
+if DATAPLANE_ROOT == "1": DATAPLANE_ROOT = DATAPLANE_DEFAULT_ROOT
+
+@st.cache_resource
+def get_data_monitor():
+    snapshot_inputs = (lambda: published_paths(DATAPLANE_ROOT)) if DATAPLANE_ROOT else (lambda: watched_paths(DATA_DIR, SNAPSHOT_DIR))
+    return DataMonitor({
+        "snapshot": snapshot_inputs, # Sources, partitions, manifest (ingested drops), boundaries (state names) - or the published manifest
+        "boundaries": lambda: [boundary_path(lod, BOUNDARY_DIR) for lod in LEVELS_OF_DETAIL],
+        "geocode_seed": lambda: [DEFAULT_SEED_CSV], # GEOCODE_SEED_CSV below
+    }, watch=os.environ.get("EV_WATCH_DATA") == "1")
+
+data_monitor = get_data_monitor()
+
+@st.cache_resource(max_entries=2) # Keyed by the inputs' change token; the previous entry serves in-flight reruns
+def get_snapshot(data_token):
+    METRICS.mark_miss()
+    if DATAPLANE_ROOT:
+        return attach(DATAPLANE_ROOT)
+    return load_snapshot(DATA_DIR, SNAPSHOT_DIR)
+
+@st.cache_resource(max_entries=32) # Keyed by snapshot version, so a rebuilt snapshot gets fresh entries
+def load_dataset_cached(_snapshot, name, version): # Leading underscore: not part of the cache key
+    METRICS.mark_miss()
+    return load_dataset(_snapshot, name)
+
+def dataset(name):
     try:
-        vehicalclass_df = pd.read_csv("data/Vehicle Class - All.csv")
-        evsales_df_orig = pd.read_csv("data/ev_sales_by_makers_and_cat_15-24.csv")
-        ev_market_place_df = pd.read_csv("data/EV Maker by Place.csv")
-        operationIpc_df = pd.read_csv("data/OperationalPC.csv")
-        evcat_df = pd.read_csv("data/ev_cat_01-24.csv")
-
-        geojson_data = None
-        # IMPORTANT: Check your GeoJSON filename. Corrected potential double extension.
-        geojson_path = "data/india_with_disputed_boundaries.geojson.geojson"
-        if os.path.exists(geojson_path):
-             with open(geojson_path, "r") as f:
-                geojson_data = json.load(f)
-        elif os.path.exists("data/india_with_disputed_boundaries.geojson.geojson"):
-             st.warning("Found GeoJSON file with double extension '.geojson.geojson'. Attempting to load.")
-             with open("data/india_with_disputed_boundaries.geojson.geojson", "r") as f:
-                geojson_data = json.load(f)
-        else:
-            raise FileNotFoundError(f"GeoJSON file not found at expected paths: {geojson_path} or data/india_with_disputed_boundaries.geojson.geojson")
-
-
-    except FileNotFoundError as e:
-        st.error(f"Error: A required data file was not found. Please check your `data/` directory. Missing file related to: {e}")
-        st.info("Please ensure all 5 CSV files (Vehicle Class - All.csv, ev_sales_by_makers_and_cat_15-24.csv, EV Maker by Place.csv, OperationalPC.csv, ev_cat_01-24.csv) and your GeoJSON file (e.g., india_with_disputed_boundaries.geojson) are in the 'data' folder.")
-        return None, None, None, None, None, None, None
+        with METRICS.section("dataset", cache=True, name=name):
+            return load_dataset_cached(snapshot, name, data_version)
     except Exception as e:
-        st.error(f"An error occurred during data loading: {e}")
-        return None, None, None, None, None, None, None
-
-    # Data Cleaning and Preparation (Keep existing logic)
-    vehicalclass_df["Total Registration"] = vehicalclass_df["Total Registration"].str.replace(",", "").astype(int)
-    sales_year_columns = [col for col in evsales_df_orig.columns if col.isdigit() and len(col) == 4]
-    evsales_melted_df = evsales_df_orig.melt(id_vars=["Cat", "Maker"],
-                                             value_vars=sales_year_columns,
-                                             var_name="Year", value_name="Sales")
-    evsales_melted_df["Sales"] = pd.to_numeric(evsales_melted_df["Sales"], errors='coerce').fillna(0)
-    evsales_melted_df["Year"] = evsales_melted_df["Year"].astype(str)
-
-    evsales_df_with_growth = evsales_df_orig.copy()
-    if sales_year_columns:
-        earliest_year = min(sales_year_columns)
-        latest_year = max(sales_year_columns)
-        evsales_df_with_growth[f'{earliest_year}_numeric'] = pd.to_numeric(evsales_df_with_growth[earliest_year], errors='coerce').fillna(0)
-        evsales_df_with_growth[f'{latest_year}_numeric'] = pd.to_numeric(evsales_df_with_growth[latest_year], errors='coerce').fillna(0)
-        evsales_df_with_growth['Growth %'] = evsales_df_with_growth.apply(
-            lambda row: ((row[f'{latest_year}_numeric'] - row[f'{earliest_year}_numeric']) / row[f'{earliest_year}_numeric']) * 100
-            if row[f'{earliest_year}_numeric'] != 0 else pd.NA, axis=1)
-        evsales_df_with_growth.loc[(evsales_df_with_growth[f'{earliest_year}_numeric'] == 0) & (evsales_df_with_growth[f'{latest_year}_numeric'] > 0), 'Growth %'] = 10000 # Placeholder for very high growth
-        evsales_df_with_growth['Growth %'] = evsales_df_with_growth['Growth %'].fillna(0)
-
-    ev_market_place_df['State'] = ev_market_place_df['State'].apply(normalize_state_name)
-    operationIpc_df['State'] = operationIpc_df['State'].apply(normalize_state_name)
-    operationIpc_df["No. of Operational PCS"] = pd.to_numeric(operationIpc_df["No. of Operational PCS"], errors='coerce').fillna(0)
-
-    evcat_df["Date"] = pd.to_datetime(evcat_df["Date"], errors='coerce', dayfirst=True)
-    evcat_df = evcat_df.dropna(subset=['Date'])
-    for col in evcat_df.columns:
-        if col != 'Date':
-            evcat_df[col] = pd.to_numeric(evcat_df[col], errors='coerce').fillna(0)
-
-    return vehicalclass_df, evsales_df_with_growth, evsales_melted_df, ev_market_place_df, operationIpc_df, evcat_df, geojson_data
-
-# State Name Normalization (Crucial for GeoJSON mapping)
-STATE_NAME_MAPPING = {
-    "Andaman & Nicobar Islands": "Andaman and Nicobar Islands", "Arunanchal Pradesh": "Arunachal Pradesh",
-    "Dadra & Nagar Haveli and Daman & Diu": "Dadra and Nagar Haveli and Daman and Diu",
-    "NCT of Delhi": "Delhi", "Delhi": "Delhi", "Odisha": "Orissa", "Telengana": "Telangana",
-    "Jammu & Kashmir": "Jammu and Kashmir", "Pondicherry" : "Puducherry",
-    "Uttaranchal": "Uttarakhand" # Add more mappings as needed by comparing data states with GeoJSON states
-}
-def normalize_state_name(name):
-    if pd.isna(name): return "Unknown"
-    name_stripped = str(name).strip()
-    return STATE_NAME_MAPPING.get(name_stripped, name_stripped)
-
-# Load data
-vehicalclass_df, evsales_df, evsales_melted_df, ev_market_place_df, operationIpc_df, evcat_df, india_geojson = load_data()
-
-# Check if essential data loaded
-if any(df is None for df in [vehicalclass_df, evsales_df, evsales_melted_df, ev_market_place_df, operationIpc_df, evcat_df]) or india_geojson is None:
+        st.error(f"An error occurred while loading the '{name}' dataset: {e}")
+        st.stop()
+
+try:
+    with METRICS.section("snapshot", cache=True):
+        snapshot = get_snapshot(data_monitor.token("snapshot"))
+except FileNotFoundError as e:
+    st.error(f"Error: A required data file was not found. Please check your `data/` directory. Missing file related to: {e}")
+    st.info("Please ensure all 5 CSV files (Vehicle Class - All.csv, ev_sales_by_makers_and_cat_15-24.csv, EV Maker by Place.csv, OperationalPC.csv, ev_cat_01-24.csv) are in the 'data' folder.")
+    st.stop()
+except Exception as e:
+    st.error(f"An error occurred during data loading: {e}")
     st.error("Essential data files could not be loaded. Dashboard cannot proceed.")
-    # No background setting here, rely on static CSS
     st.stop()
+data_version = snapshot.version
+
+CHART_WIDTH_PX = 1200 # Point budget for time-series charts (roughly a wide-layout chart's width in pixels)
+
+# ---------- State Boundaries ----------
+# Pre-simplified boundaries vendored under data/boundaries (see ev_insights/boundaries.py).
+# Loaded once per process and shared across sessions; rendering needs no network or shapely work.
+BOUNDARY_LOD = os.environ.get("EV_BOUNDARY_LOD", DEFAULT_LOD) # high | medium | low
+
+@st.cache_resource(max_entries=3)
+def _get_state_boundaries(lod, data_token):
+    METRICS.mark_miss()
+    return load_boundaries(lod, BOUNDARY_DIR)
+
+def get_state_boundaries(lod=BOUNDARY_LOD):
+    return _get_state_boundaries(lod, data_monitor.token("boundaries"))
+
+# Point-in-polygon joins always use the most detailed polygons, whatever the choropleth renders
+@st.cache_resource(max_entries=1)
+def _get_state_locator(data_token):
+    METRICS.mark_miss()
+    return StateLocator(load_boundaries(LOCATOR_LOD, BOUNDARY_DIR))
+
+def get_state_locator():
+    return _get_state_locator(data_monitor.token("boundaries"))
+
+LOCATOR_LOD = "high"
+MAX_MAKER_TRACES = 30 # Above this many makers the point map uses a single trace
+
+# ---------- Geocode Store ----------
+GEOCODE_STORE_PATH = DEFAULT_STORE_PATH # Runtime cache, seeded from the CSV below
+GEOCODE_SEED_CSV = DEFAULT_SEED_CSV
+
+@st.cache_resource(max_entries=1) # A changed seed CSV gets a fresh store, which re-seeds from it
+def _get_geocode_store(data_token):
+    # EV_GEOCODER: nominatim (default) | nominatim:<domain> | file:<path> (offline) | none (store hits only)
+    # One short attempt per place, with failures remembered, so an unreachable geocoder does not stall reruns
+    backend = make_backend(os.environ.get("EV_GEOCODER", "nominatim"), timeout=INTERACTIVE_TIMEOUT_S)
+    return GeocodeStore(GEOCODE_STORE_PATH, seed_csv=GEOCODE_SEED_CSV, backend=backend)
+
+def get_geocode_store():
+    return _get_geocode_store(data_monitor.token("geocode_seed"))
+
+# ---------- Figure Cache ----------
+# Serialised figures keyed by (page, chart, filter state, data version) and shared by every session in
+# this process: a rerun with unchanged inputs skips both the aggregation and the Plotly construction.
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get("EV_FIGURE_CACHE_MB", "64")) * 1024 * 1024
+
+@st.cache_resource
+def get_figure_cache():
+    return LRUCache(max_bytes=FIGURE_CACHE_MAX_BYTES)
+
+def cached_figure(page, chart, filters, build_figure):
+    key = (page, chart, tuple(str(f) for f in filters), data_version)
+    with METRICS.section("figure", cache=True, page=page, chart=chart) as section:
+        figure_json, hit = get_figure_cache().get_or_create(key, lambda: build_figure().to_json())
+        section.miss = not hit
+        METRICS.add_bytes(len(figure_json))
+    return json.loads(figure_json)
+
+def plot_figure(page, chart, filters, build_figure):
+    figure = cached_figure(page, chart, filters, build_figure)
+    with METRICS.section("render", page=page, chart=chart):
+        st.plotly_chart(figure, use_container_width=True)
+
+# ---------- Exports ----------
+# Download buttons get a callable, so a file is only built when someone clicks (on Streamlit's download
+# thread, not in the rerun). It is written in chunks (ev_insights/export.py) and kept by (export, filter
+# state, format, data version), so repeated downloads of the same selection are served from memory.
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EV_EXPORT_CACHE_MB", "64")) * 1024 * 1024
+
+@st.cache_resource
+def get_export_cache():
+    return LRUCache(max_bytes=EXPORT_CACHE_MAX_BYTES)
+
+def export_button(label, page, name, filters, build_frame, base_name, key):
+    """Download button for the frame ``build_frame()`` returns, in the sidebar's export format."""
+    fmt = export_format
+    cache_key = (page, name, tuple(str(f) for f in filters), fmt, data_version)
+
+    def build_export():
+        with METRICS.section("export", cache=True, page=page, export=name, format=fmt) as section:
+            payload, hit = get_export_cache().get_or_create(cache_key, lambda: export_bytes(build_frame(), fmt))
+            section.miss = not hit
+            METRICS.add_bytes(len(payload))
+        return payload
+
+    st.download_button(f"{label} ({EXPORT_FORMATS[fmt][0]})", build_export, export_file_name(base_name, fmt),
+                       export_mime(fmt), key=key, on_click="ignore")
+
+# ---------- Instrumentation ----------
+# Section timings, cache hits/misses and figure payload sizes (ev_insights/instrument.py), shown in a
+# sidebar panel with ?debug=1 or EV_DEBUG_PANEL=1, served as Prometheus text on EV_METRICS_PORT (localhost
+# only unless EV_METRICS_HOST names another bind address, e.g. 0.0.0.0), and logged as JSON lines with EV_METRICS_LOG=1.
+DEBUG_PANEL = os.environ.get("EV_DEBUG_PANEL") == "1" or st.query_params.get("debug") == "1"
+METRICS_PORT = os.environ.get("EV_METRICS_PORT")
+METRICS_HOST = os.environ.get("EV_METRICS_HOST", "127.0.0.1")
+METRICS.log_events = os.environ.get("EV_METRICS_LOG") == "1"
+if METRICS.log_events and not metrics_logger.handlers:
+    metrics_logger.addHandler(logging.StreamHandler())
+    metrics_logger.setLevel(logging.INFO)
+
+@st.cache_resource
+def start_metrics_server(port, host):
+    return serve_metrics(port, host=host)
+
+if METRICS_PORT:
+    try:
+        start_metrics_server(int(METRICS_PORT), METRICS_HOST)
+    except (OSError, ValueError) as e:
+        st.sidebar.warning(f"Metrics endpoint unavailable on port {METRICS_PORT}: {e}")
 
 # ---------- Sidebar Navigation ----------
 st.sidebar.header("📊 Analysis Sections")
@@ -170,7 +270,12 @@ if st.sidebar.button("📋 EV Market Status"): st.session_state.app_mode = "EV M
 if st.sidebar.button("📈 EV Sales"): st.session_state.app_mode = "EV Sales"
 if st.sidebar.button("🚗 EV Category Trends"): st.session_state.app_mode = "EV Category Trends"
 
+# Only the current page's datasets are loaded (memory-mapped / derived on first use)
+page_data = {name: dataset(name) for name in PAGE_DATASETS[st.session_state.app_mode]}
+
 st.sidebar.markdown("---")
+export_format = st.sidebar.selectbox("Download format", list(EXPORT_FORMATS), format_func=lambda f: EXPORT_FORMATS[f][0],
+                                     key="export_format")
 st.sidebar.info("Select a section above to explore different aspects of the Indian EV market.")
 
 # ---------- Define Image Paths for Each Section ----------
@@ -182,6 +287,17 @@ IMAGE_PATHS = {
     "EV Category Trends": "images/bg_category.png"
 }
 DEFAULT_IMAGE = "images/bg_home.png" # Fallback image
+HEADER_IMAGE_WIDTH_PX = 1000 # The header column is ~30% of a wide layout; this covers it on high-DPI screens
+
+@st.cache_resource(max_entries=8) # Keyed by path and mtime, so a replaced image is picked up
+def header_image(path, mtime):
+    # The sources are up to 8000 px wide; st.image would decode and resize them on every rerun
+    from PIL import Image
+    with Image.open(path) as image:
+        image.thumbnail((HEADER_IMAGE_WIDTH_PX, HEADER_IMAGE_WIDTH_PX * 4))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
 
 
 # ---------- Header Section with Dynamic Image ----------
@@ -194,16 +310,21 @@ with header_col_main:
     # ---------- Key Performance Indicators (KPIs) - Shown on all pages ----------
     st.header("🚀 Key Insights")
     try:
-        total_registrations_all_classes = vehicalclass_df["Total Registration"].sum()
-        total_sales_all_time = evsales_melted_df["Sales"].sum()
-        latest_year_in_sales = ""
-        if not evsales_melted_df["Year"].empty: latest_year_in_sales = evsales_melted_df["Year"].max()
-        total_sales_latest_year = evsales_melted_df[evsales_melted_df["Year"] == latest_year_in_sales]["Sales"].sum() if latest_year_in_sales else 0
-        total_pcs = operationIpc_df["No. of Operational PCS"].sum()
+        # Precomputed when the snapshot was built (ev_insights/kpis.py): no table is loaded for the header
+        kpi_summary = dataset(KPI_SUMMARY)
+        total_registrations_all_classes = kpi_summary["total_registrations"]
+        latest_year_in_sales = kpi_summary["latest_year"]
+        total_sales_latest_year = kpi_summary["sales_latest_year"]
+        total_pcs = kpi_summary["total_pcs"]
+        sales_delta = sales_delta_pct(kpi_summary)
+        latest_year_by_cat = kpi_summary["sales_by_year_category"].get(latest_year_in_sales, {})
+        sales_by_cat_help = ", ".join(f"{cat}: {sales:,}" for cat, sales in sorted(latest_year_by_cat.items(), key=lambda kv: -kv[1]))
 
         kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
         kpi_col1.metric(label="Total EV Registrations (All Classes)", value=f"{total_registrations_all_classes:,.0f}")
-        kpi_col2.metric(label=f"Total EV Sales ({latest_year_in_sales if latest_year_in_sales else 'N/A'})", value=f"{total_sales_latest_year:,.0f}")
+        kpi_col2.metric(label=f"Total EV Sales ({latest_year_in_sales if latest_year_in_sales else 'N/A'})", value=f"{total_sales_latest_year:,.0f}",
+                        delta=f"{sales_delta:+.1f}% vs {kpi_summary['previous_year']}" if sales_delta is not None else None,
+                        help=f"By category: {sales_by_cat_help}" if sales_by_cat_help else None)
         kpi_col3.metric(label="Operational Public Charging Stations", value=f"{total_pcs:,.0f}")
     except Exception as e:
         st.error(f"Error calculating KPIs: {e}")
@@ -223,7 +344,7 @@ with header_col_image:
     # Add a container div with a class for potential specific CSS targeting
     st.markdown('<div class="header-image-container">', unsafe_allow_html=True)
     if os.path.exists(image_path):
-        st.image(image_path, use_container_width='auto') # 'auto' scales based on column width
+        st.image(header_image(image_path, os.path.getmtime(image_path)), use_container_width='auto') # 'auto' scales based on column width
         # st.caption(f"Illustrative: {current_mode.split('(')[0].strip()}") # Optional caption
     else:
         st.warning(f"Header image not found: {image_path}")
@@ -236,6 +357,7 @@ st.markdown("---") # Separator below the entire header section
 
 
 # ---------- Main Content Area - Dynamic based on Sidebar Navigation ----------
+page_started_at = time.perf_counter()
 
 if st.session_state.app_mode == "Geospatial Insights":
     # --- Geospatial Section ---
@@ -243,95 +365,128 @@ if st.session_state.app_mode == "Geospatial Insights":
     st.markdown("Analyze EV maker locations and charging infrastructure distribution.")
 
     # --- Explore EV Maker Locations ---
+    ev_market_place_df = page_data["maker_places"]
+    operationIpc_df = page_data["pcs"]
+    state_matches_df = page_data["state_matches"]
+
     st.subheader("📍 EV Maker Locations")
-    st.caption("Geocodes 'Place' names from 'EV Maker by Place.csv'. Can be slow. Results depend on name clarity & service availability.")
+    st.caption("Coordinates for 'Place' names from 'EV Maker by Place.csv' come from the local geocode store; only new places are geocoded online.")
 
     # Filters for geocoding
+    geo_makers, geo_places, geo_states = maker_place_options(ev_market_place_df)
     col_filter1, col_filter2, col_filter3 = st.columns(3)
     with col_filter1:
-        unique_makers_for_geo = ["All"] + sorted(ev_market_place_df['EV Maker'].unique().tolist())
-        selected_maker_geo = st.selectbox("Select EV Maker", unique_makers_for_geo, key="maker_geo_select_home")
+        selected_maker_geo = st.selectbox("Select EV Maker", ["All"] + geo_makers, key="maker_geo_select_home")
     with col_filter2:
-        unique_places_for_geo = ["All"] + sorted(ev_market_place_df['Place'].dropna().unique().tolist())
-        selected_place_geo = st.selectbox("Select Place", unique_places_for_geo, key="place_geo_select_home")
+        selected_place_geo = st.selectbox("Select Place", ["All"] + geo_places, key="place_geo_select_home")
     with col_filter3:
-        unique_states_for_geo = ["All"] + sorted([s for s in ev_market_place_df["State"].unique() if s not in ["Unknown", None]])
+        unique_states_for_geo = ["All"] + geo_states
         selected_state_geo = st.selectbox("Select State", unique_states_for_geo, key="state_geo_select_home")
 
     # Filter data for geocoding
-    locations_to_geocode = ev_market_place_df.copy()
-    if selected_maker_geo != "All": locations_to_geocode = locations_to_geocode[locations_to_geocode['EV Maker'] == selected_maker_geo]
-    if selected_place_geo != "All": locations_to_geocode = locations_to_geocode[locations_to_geocode['Place'] == selected_place_geo]
-    if selected_state_geo != "All": locations_to_geocode = locations_to_geocode[locations_to_geocode['State'] == selected_state_geo]
+    with METRICS.section("aggregate", name="maker_places"):
+        locations_to_geocode = filter_maker_places(ev_market_place_df,
+                                                   maker=None if selected_maker_geo == "All" else selected_maker_geo,
+                                                   place=None if selected_place_geo == "All" else selected_place_geo,
+                                                   state=None if selected_state_geo == "All" else selected_state_geo).copy()
 
     unique_places = locations_to_geocode[locations_to_geocode['Place'].notna()]['Place'].unique()
-    limit_geocode = 30 # Limit API calls
-    unique_places_to_process = unique_places[:limit_geocode] if len(unique_places) > limit_geocode else unique_places
-    if len(unique_places) > limit_geocode: st.warning(f"Geocoding limited to the first {limit_geocode} unique places ({len(unique_places)} total found for filters). Refine filters for more specific results.")
 
-    # Geocoding function (cached)
-    @st.cache_data(ttl=3600*24) # Cache for 24 hours
+    # Geocoding (store-backed): known places come from the local geocode store,
+    # only misses are sent to the geocoding backend and written back.
     def geocode_places(places_tuple):
-        geolocator = Nominatim(user_agent=f"ev_dashboard_streamlit_map_{int(time.time())}", timeout=10)
-        coords = {}
-        progress_bar_geo = st.progress(0)
-        status_text_geo = st.empty()
-        total_places = len(places_tuple)
-        status_text_geo.text(f"Geocoding {total_places} unique places...")
-
-        for idx, place in enumerate(places_tuple):
-            try:
-                location = geolocator.geocode(f"{place}, India")
-                time.sleep(0.4) # Increased delay to be respectful of Nominatim's usage policy
-                if location: coords[place] = (location.latitude, location.longitude)
-                else: coords[place] = (None, None)
-            except (GeocoderTimedOut, GeocoderServiceError) as e:
-                # print(f"Geocoding service error for {place}: {e}") # Server-side log
-                coords[place] = (None, None) # Mark as failed
-                time.sleep(1) # Longer sleep on error
-            except Exception as e:
-                # print(f"Unexpected geocoding error for {place}: {e}") # Server-side log
-                coords[place] = (None, None) # Mark as failed
-            finally:
-                 # Update progress (inside the loop)
-                 progress = (idx + 1) / total_places if total_places > 0 else 1
-                 try: # Handle potential UI element removal if user navigates away
-                     progress_bar_geo.progress(progress)
-                 except Exception:
-                     pass # Ignore if progress bar no longer exists
-
-        status_text_geo.text("Geocoding complete.")
-        time.sleep(1) # Keep "complete" message visible briefly
-        status_text_geo.empty()
-        progress_bar_geo.empty()
+        store = get_geocode_store()
+        progress_bar_geo = None
+
+        def report_progress(done, total):
+            nonlocal progress_bar_geo
+            METRICS.mark_miss() # Only called when some places had to be geocoded online
+            try: # Handle potential UI element removal if user navigates away
+                if progress_bar_geo is None:
+                    progress_bar_geo = st.progress(0, text=f"Geocoding {total} new places...")
+                progress_bar_geo.progress(done / total)
+            except Exception:
+                pass
+
+        with METRICS.section("geocode", cache=True): # The place count is an observed value, not a label (one series per count)
+            METRICS.add_items(len(places_tuple))
+            coords = store.lookup(places_tuple, on_progress=report_progress)
+        if progress_bar_geo is not None:
+            progress_bar_geo.empty()
         return coords
 
     # Execute geocoding and display map
-    if len(unique_places_to_process) > 0:
-        geocoded_coordinates = geocode_places(tuple(unique_places_to_process)) # Pass tuple for caching
-
-        locations_to_geocode['Coordinates'] = locations_to_geocode['Place'].map(geocoded_coordinates)
-        # Split coordinates into Lat/Lon columns
-        locations_to_geocode[['Latitude', 'Longitude']] = pd.DataFrame(
-            locations_to_geocode['Coordinates'].apply(lambda x: x if isinstance(x, tuple) else (None, None)).tolist(),
-            index=locations_to_geocode.index
-        )
+    if len(unique_places) > 0:
+        geocoded_coordinates = geocode_places(tuple(unique_places))
+
+        locations_to_geocode['Latitude'] = locations_to_geocode['Place'].map({p: c[0] for p, c in geocoded_coordinates.items()})
+        locations_to_geocode['Longitude'] = locations_to_geocode['Place'].map({p: c[1] for p, c in geocoded_coordinates.items()})
         plot_data_geocoded = locations_to_geocode.dropna(subset=['Latitude', 'Longitude'])
+        # Part of the map/export cache keys: seed corrections rewrite coordinates without changing the row count
+        coordinates_digest = int(pd.util.hash_pandas_object(plot_data_geocoded[['Latitude', 'Longitude']], index=False).sum())
+        # State from the coordinates themselves (STRtree point-in-polygon), not the CSV's free-text label
+        try:
+            with METRICS.section("locator", cache=True):
+                state_locator = get_state_locator()
+            with METRICS.section("aggregate", name="locate_makers"):
+                plot_data_geocoded = state_locator.join(plot_data_geocoded)
+        except Exception as e:
+            st.warning(f"Could not assign locations to state boundaries: {e}")
+            state_locator = None
 
         if not plot_data_geocoded.empty:
-            fig_scatter_map = px.scatter_mapbox(plot_data_geocoded, lat="Latitude", lon="Longitude",
-                                                hover_name="EV Maker", hover_data=["Place", "State"], color="EV Maker",
-                                                size_max=20, zoom=3.9, center={"lat": 20.5937, "lon": 78.9629},
-                                                mapbox_style="carto-positron", title="EV Maker Locations (Geocoded)")
-            fig_scatter_map.update_traces(marker=dict(size=10)) # Uniform marker size
-            fig_scatter_map.update_layout(margin={"r":0,"t":40,"l":0,"b":0}, legend_title_text='EV Maker')
-            st.plotly_chart(fig_scatter_map, use_container_width=True)
+            # Large selections are binned server-side into a zoom-dependent grid so the figure never
+            # carries more than MAX_MAP_POINTS markers, however many locations are selected.
+            col_render1, col_render2 = st.columns(2)
+            with col_render1:
+                map_mode = st.radio("Map rendering", ["Auto", "Points", "Clusters"], horizontal=True, key="maker_map_mode",
+                                    help=f"Auto draws individual locations up to {MAX_MAP_POINTS:,} and clusters beyond that.")
+            with col_render2:
+                map_zoom = st.slider("Cluster detail (map zoom)", 2, 10, DEFAULT_ZOOM, key="maker_map_zoom",
+                                     help="Higher values use smaller cluster cells.", disabled=map_mode == "Points")
+
+            def build_maker_map():
+                with METRICS.section("aggregate", name="maker_map_clusters"):
+                    map_data, clustered, _ = cap_points(plot_data_geocoded, zoom=map_zoom, mode=map_mode.lower(), label_col="EV Maker")
+                if clustered:
+                    fig_scatter_map = px.scatter_mapbox(map_data, lat="Latitude", lon="Longitude", size="Count", color="Count",
+                                                        hover_name="Top", hover_data={"Count": True, "Distinct": True},
+                                                        labels={"Top": "Most common maker", "Distinct": "Makers"},
+                                                        color_continuous_scale="Viridis", size_max=30, zoom=3.9,
+                                                        center={"lat": 20.5937, "lon": 78.9629}, mapbox_style="carto-positron",
+                                                        title=f"EV Maker Locations ({len(map_data):,} clusters of {len(plot_data_geocoded):,} locations)")
+                else:
+                    many_makers = map_data["EV Maker"].nunique() > MAX_MAKER_TRACES # One trace per maker gets slow beyond this
+                    title = "EV Maker Locations (Geocoded)" if len(map_data) == len(plot_data_geocoded) else \
+                        f"EV Maker Locations ({len(map_data):,} sampled of {len(plot_data_geocoded):,})"
+                    fig_scatter_map = px.scatter_mapbox(map_data, lat="Latitude", lon="Longitude",
+                                                        hover_name="EV Maker", hover_data=[c for c in ["Place", "State", "Located State"] if c in map_data.columns],
+                                                        color=None if many_makers else "EV Maker",
+                                                        size_max=20, zoom=3.9, center={"lat": 20.5937, "lon": 78.9629},
+                                                        mapbox_style="carto-positron", title=title)
+                    fig_scatter_map.update_traces(marker=dict(size=10)) # Uniform marker size
+                fig_scatter_map.update_layout(margin={"r":0,"t":40,"l":0,"b":0}, legend_title_text='EV Maker')
+                return fig_scatter_map
+            plot_figure("Geospatial Insights", "maker_map", (selected_maker_geo, selected_place_geo, selected_state_geo, len(plot_data_geocoded), map_mode, map_zoom,
+                                                                 coordinates_digest, data_monitor.token("boundaries")), build_maker_map) # Located State comes from the boundaries
 
             with st.expander("View Geocoded Maker Data & Download"):
                 st.dataframe(plot_data_geocoded[['EV Maker', 'Place', 'State', 'Latitude', 'Longitude']].reset_index(drop=True))
-                st.download_button("Download Geocoded Data",
-                                   plot_data_geocoded[['EV Maker', 'Place', 'State', 'Latitude', 'Longitude']].to_csv(index=False).encode('utf-8'),
-                                   "geocoded_maker_locations.csv", "text/csv", key="geo_maker_data_csv")
+                export_button("Download Geocoded Data", "Geospatial Insights", "maker_locations",
+                              (selected_maker_geo, selected_place_geo, selected_state_geo, len(plot_data_geocoded), coordinates_digest),
+                              lambda: plot_data_geocoded[['EV Maker', 'Place', 'State', 'Latitude', 'Longitude']],
+                              "geocoded_maker_locations", key="geo_maker_data_csv")
+
+            if state_locator is not None:
+                with st.expander("Maker Locations by State (from coordinates)"):
+                    located_states = plot_data_geocoded["Located State"]
+                    st.dataframe(state_locator.state_density(count_by_state(located_states))
+                                 .rename(columns={"Count": "Maker Locations"}).query("`Maker Locations` > 0"), hide_index=True)
+                    label_mismatch = plot_data_geocoded[located_states.astype(str) != plot_data_geocoded["State"].astype(str)]
+                    if not label_mismatch.empty:
+                        st.caption(f"{len(label_mismatch)} location(s) fall in a different state than their CSV label: " + "; ".join(
+                            f"{place} ({label} → {located if pd.notna(located) else 'outside all states'})"
+                            for place, label, located in zip(label_mismatch["Place"], label_mismatch["State"], label_mismatch["Located State"])))
         else:
             st.warning("Could not geocode any locations for the current selection, or no valid coordinates were returned.")
     else:
@@ -366,53 +521,62 @@ if st.session_state.app_mode == "Geospatial Insights":
 
 
 
-    # Load India GeoJSON
-    url = "https://raw.githubusercontent.com/Subhash9325/GeoJson-Data-of-Indian-States/master/Indian_States"
+    # Load India state boundaries (vendored, cached per process)
     try:
-        gdf = gpd.read_file(url)
-        gdf["geometry"] = gdf.to_crs(gdf.estimate_utm_crs()).simplify(1000).to_crs(gdf.crs)
-        gdf = gdf.rename(columns={"NAME_1": "State"})
-        india_geojson = gdf.__geo_interface__
+        with METRICS.section("boundaries", cache=True, lod=BOUNDARY_LOD):
+            india_geojson = get_state_boundaries()
     except Exception as e:
-        st.error(f"Error loading GeoJSON: {e}. Please ensure the URL is correct and the file is accessible.")
+        st.error(f"Error loading state boundaries: {e}. Rebuild them with `python -m ev_insights.boundaries`.")
         india_geojson = None
 
     st.subheader("⚡ Public Charging Stations (PCS) by State")
 
     if india_geojson:
-        pcs_by_state = operationIpc_df.groupby("State")["No. of Operational PCS"].sum().reset_index()
-
-        fig = px.choropleth(
-            pcs_by_state,
-            geojson=india_geojson,
-            locations="State",
-            featureidkey="properties.State",
-            color="No. of Operational PCS",
-            color_continuous_scale="viridis",
-            hover_name="State",
-            hover_data=["No. of Operational PCS"],
-            title="Operational Public Charging Stations Density",
-            fitbounds="locations",
-            scope="asia"
-        )
-
-        fig.update_layout(
-            margin={"r": 0, "t": 40, "l": 0, "b": 0},
-            coloraxis_colorbar=dict(title="PCS Count"),
-            template="plotly_dark",
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        with METRICS.section("aggregate", name="pcs_by_state"):
+            pcs_by_state = pcs_totals_by_state(operationIpc_df)
+
+        def build_pcs_choropleth():
+            fig = px.choropleth(
+                pcs_by_state,
+                geojson=india_geojson,
+                locations="State",
+                featureidkey="properties.NAME_1",
+                color="No. of Operational PCS",
+                color_continuous_scale="viridis",
+                hover_name="State",
+                hover_data=["No. of Operational PCS"],
+                title="Operational Public Charging Stations Density",
+                fitbounds="locations",
+                scope="asia"
+            )
 
-        with st.expander("View Charging Station Data by State & Download"):
-            st.dataframe(pcs_by_state.sort_values("No. of Operational PCS", ascending=False).reset_index(drop=True).style.background_gradient(cmap="viridis"))
-            csv_data = pcs_by_state.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Download PCS Data",
-                data=csv_data,
-                file_name="operational_pcs_by_state.csv",
-                mime="text/csv",
-                key="pcs_state_data_csv",
+            fig.update_layout(
+                margin={"r": 0, "t": 40, "l": 0, "b": 0},
+                coloraxis_colorbar=dict(title="PCS Count"),
+                template="plotly_dark",
             )
+            return fig
+        # data_version only covers the CSV snapshot; rebuilt boundary files must redraw the map too
+        plot_figure("Geospatial Insights", "pcs_choropleth", (BOUNDARY_LOD, data_monitor.token("boundaries")), build_pcs_choropleth)
+
+        with st.expander("View Charging Station Data by State & Download"):
+            try: # Density per 1,000 km² from the boundary areas
+                pcs_table = get_state_locator().state_density(pcs_by_state.set_index("State")["No. of Operational PCS"])
+                pcs_table = pcs_table.rename(columns={"Count": "No. of Operational PCS", "Per 1,000 km²": "PCS per 1,000 km²"})
+            except Exception:
+                pcs_table = pcs_by_state.sort_values("No. of Operational PCS", ascending=False).reset_index(drop=True)
+            st.dataframe(pcs_table.style.background_gradient(cmap="viridis", subset=["No. of Operational PCS"]), hide_index=True)
+            # State names were normalised against the boundary file when the snapshot was built
+            pcs_state_matches = state_matches_df[state_matches_df["dataset"] == "pcs"]
+            if not pcs_state_matches.empty:
+                st.caption("State names normalised to the boundary map: " + "; ".join(
+                    f"'{row.value}' → {row.state} ({row.match})" for row in pcs_state_matches.itertuples()))
+            boundary_state_names = {feature["properties"]["NAME_1"] for feature in india_geojson["features"]}
+            states_without_boundary = sorted(set(pcs_by_state["State"].astype(str)) - boundary_state_names)
+            if states_without_boundary:
+                st.caption(f"Not shown on the map (no boundary polygon): {', '.join(states_without_boundary)}")
+            export_button("Download PCS Data", "Geospatial Insights", "pcs_by_state", (), lambda: pcs_by_state,
+                          "operational_pcs_by_state", key="pcs_state_data_csv")
 
 
 
@@ -423,37 +587,47 @@ if st.session_state.app_mode == "Geospatial Insights":
 
 elif st.session_state.app_mode == "EV Market Status":
     st.header("📋 At a Glance: Overall EV Market Status")
+    vehicalclass_df = page_data["vehicle_class"]
+    sales_cube = page_data["sales_cube"]
     # This section shows overall data, not affected by local filters here.
     st.subheader("Vehicle Class Distribution & Overall Registrations")
     if vehicalclass_df is not None and not vehicalclass_df.empty:
         col_vc1, col_vc2 = st.columns([0.6, 0.4])
         with col_vc1:
-            fig_bar_vc = px.bar(vehicalclass_df, x="Vehicle Class", y="Total Registration",
-                                color="Vehicle Class", title="EV Registrations by Vehicle Class", text_auto=True)
-            fig_bar_vc.update_layout(showlegend=False, yaxis_title="Total Registrations")
-            st.plotly_chart(fig_bar_vc, use_container_width=True)
+            def build_vehicle_class_bar():
+                fig_bar_vc = px.bar(vehicalclass_df, x="Vehicle Class", y="Total Registration",
+                                    color="Vehicle Class", title="EV Registrations by Vehicle Class", text_auto=True)
+                fig_bar_vc.update_layout(showlegend=False, yaxis_title="Total Registrations")
+                return fig_bar_vc
+            plot_figure("EV Market Status", "vehicle_class_bar", (), build_vehicle_class_bar)
         with col_vc2:
-            fig_pie_vc = px.pie(vehicalclass_df, names="Vehicle Class", values="Total Registration",
-                                title="Share of EV Registrations by Vehicle Class", hole=0.4)
-            fig_pie_vc.update_traces(textposition='inside', textinfo='percent+label', pull=0.02)
-            fig_pie_vc.update_layout(legend_title_text='Vehicle Class')
-            st.plotly_chart(fig_pie_vc, use_container_width=True)
+            def build_vehicle_class_pie():
+                fig_pie_vc = px.pie(vehicalclass_df, names="Vehicle Class", values="Total Registration",
+                                    title="Share of EV Registrations by Vehicle Class", hole=0.4)
+                fig_pie_vc.update_traces(textposition='inside', textinfo='percent+label', pull=0.02)
+                fig_pie_vc.update_layout(legend_title_text='Vehicle Class')
+                return fig_pie_vc
+            plot_figure("EV Market Status", "vehicle_class_pie", (), build_vehicle_class_pie)
 
         with st.expander("View Vehicle Class Data & Download"):
             st.dataframe(vehicalclass_df)
-            st.download_button("Download Vehicle Class CSV", vehicalclass_df.to_csv(index=False).encode('utf-8'), "glance_vehicle_class_data.csv", "text/csv", key="glance_vc_csv")
+            export_button("Download Vehicle Class Data", "EV Market Status", "vehicle_class", (), lambda: vehicalclass_df,
+                          "glance_vehicle_class_data", key="glance_vc_csv")
     else:
         st.warning("Vehicle class data is unavailable.")
 
     st.markdown("---")
     st.subheader("Overall EV Sales Trend (All Makers, All Categories)")
-    if evsales_melted_df is not None and not evsales_melted_df.empty:
-        overall_yearly_sales = evsales_melted_df.groupby("Year")["Sales"].sum().reset_index().sort_values("Year")
-        fig_overall_sales_trend = px.line(overall_yearly_sales, x="Year", y="Sales", markers=True,
-                                          title="Total EV Sales Growth Over Time (Aggregated)", text="Sales")
-        fig_overall_sales_trend.update_traces(textposition="top center")
-        fig_overall_sales_trend.update_layout(yaxis_title="Total Units Sold", xaxis_title="Year")
-        st.plotly_chart(fig_overall_sales_trend, use_container_width=True)
+    if sales_cube.members("Year"):
+        with METRICS.section("aggregate", name="sales_by_year"):
+            overall_yearly_sales = sales_cube.aggregate(by=("Year",)).reset_index().sort_values("Year")
+        def build_overall_sales_trend():
+            fig_overall_sales_trend = px.line(overall_yearly_sales, x="Year", y="Sales", markers=True,
+                                              title="Total EV Sales Growth Over Time (Aggregated)", text="Sales")
+            fig_overall_sales_trend.update_traces(textposition="top center")
+            fig_overall_sales_trend.update_layout(yaxis_title="Total Units Sold", xaxis_title="Year")
+            return fig_overall_sales_trend
+        plot_figure("EV Market Status", "overall_sales_trend", (), build_overall_sales_trend)
         with st.expander("View Aggregated Yearly Sales Data"):
             st.dataframe(overall_yearly_sales)
     else:
@@ -463,22 +637,25 @@ elif st.session_state.app_mode == "EV Market Status":
 elif st.session_state.app_mode == "EV Sales":
     st.header("📈 Sales Deep Dive")
     st.markdown("Analyze sales performance by year, manufacturer, and category.")
+    evsales_df = page_data["sales"]
+    sales_cube = page_data["sales_cube"]
+    maker_growth_df = page_data["maker_growth"]
 
     st.markdown("#### Select Filters for Sales Analysis:")
     sd_col1, sd_col2 = st.columns(2)
     with sd_col1:
-        sd_year_options = ["All"] + sorted(evsales_melted_df["Year"].unique().tolist(), reverse=True)
+        sd_year_options = ["All"] + sorted(sales_cube.members("Year"), reverse=True)
         sd_selected_year = st.selectbox("Year", sd_year_options, key="sd_year")
     with sd_col2:
-        # Handle potential NaN or None makers if data issues exist
-        valid_makers = evsales_melted_df["Maker"].dropna().unique()
-        sd_maker_options = ["All"] + sorted(valid_makers.tolist())
+        sd_maker_options = ["All"] + sales_cube.members("Maker")
         sd_selected_maker = st.selectbox("EV Maker", sd_maker_options, key="sd_maker")
 
-    # Filter data based on selections
-    sales_deep_dive_data = evsales_melted_df.copy()
-    if sd_selected_year != "All": sales_deep_dive_data = sales_deep_dive_data[sales_deep_dive_data["Year"] == sd_selected_year]
-    if sd_selected_maker != "All": sales_deep_dive_data = sales_deep_dive_data[sales_deep_dive_data["Maker"] == sd_selected_maker]
+    # Filter via the pre-aggregated cube: every aggregate below is an index lookup, not a table scan
+    sd_filters = {"Year": None if sd_selected_year == "All" else sd_selected_year,
+                  "Maker": None if sd_selected_maker == "All" else sd_selected_maker}
+    with METRICS.section("aggregate", name="sales_by_maker"):
+        sales_deep_dive_data = sales_cube.rows(sd_filters)
+        sales_by_maker = sales_cube.aggregate(by=("Maker",), where=sd_filters)
 
     section_title_suffix = f"({sd_selected_year if sd_selected_year != 'All' else 'All Years'}, {sd_selected_maker if sd_selected_maker != 'All' else 'All Makers'})"
     st.markdown(f"### Sales Insights for: {section_title_suffix}")
@@ -487,102 +664,128 @@ elif st.session_state.app_mode == "EV Sales":
         col_mkt_share, col_top_makers = st.columns(2)
         with col_mkt_share:
             st.subheader(f"Market Share")
-            market_share_data = sales_deep_dive_data.groupby("Maker")["Sales"].sum().reset_index()
-            market_share_data = market_share_data[market_share_data["Sales"] > 0].sort_values("Sales", ascending=False)
-            if not market_share_data.empty:
-                # Combine small slices into 'Others' if too many makers
-                num_makers = len(market_share_data)
-                top_n_share = 9 # Show top 9 + Others
-                if num_makers > top_n_share + 1:
-                     market_share_data_plot = pd.concat([
-                         market_share_data.head(top_n_share),
-                         pd.DataFrame([{'Maker': 'Others', 'Sales': market_share_data.iloc[top_n_share:]['Sales'].sum()}])
-                     ], ignore_index=True)
-                else:
-                     market_share_data_plot = market_share_data
-
-                fig_market_share = px.pie(market_share_data_plot, names="Maker", values="Sales", hole=0.4,
-                                          title=f"Top {len(market_share_data_plot)-1 if 'Others' in market_share_data_plot['Maker'].tolist() else len(market_share_data_plot)} Makers' Share {section_title_suffix}")
-                fig_market_share.update_traces(textposition='outside', textinfo='percent+label', pull=0.03)
-                fig_market_share.update_layout(legend_title_text='EV Maker', showlegend=True)
-                st.plotly_chart(fig_market_share, use_container_width=True)
+            # Combine small slices into 'Others' if too many makers (top 9 + Others)
+            market_share_data_plot = share_with_others(sales_by_maker, top_n=9)
+            if not market_share_data_plot.empty:
+
+                def build_market_share():
+                    fig_market_share = px.pie(market_share_data_plot, names="Maker", values="Sales", hole=0.4,
+                                              title=f"Top {len(market_share_data_plot)-1 if 'Others' in market_share_data_plot['Maker'].tolist() else len(market_share_data_plot)} Makers' Share {section_title_suffix}")
+                    fig_market_share.update_traces(textposition='outside', textinfo='percent+label', pull=0.03)
+                    fig_market_share.update_layout(legend_title_text='EV Maker', showlegend=True)
+                    return fig_market_share
+                plot_figure("EV Sales", "market_share", (sd_selected_year, sd_selected_maker), build_market_share)
             else: st.info("No sales data for current filter to display market share.")
 
         with col_top_makers:
             st.subheader(f"Top Makers by Volume")
-            top_makers_volume = sales_deep_dive_data.groupby("Maker")["Sales"].sum().nlargest(10).reset_index()
+            top_makers_volume = top_n(sales_by_maker, 10)
             if not top_makers_volume.empty:
-                fig_top_makers_bar = px.bar(top_makers_volume, x="Sales", y="Maker", orientation='h',
-                                            title=f"Top 10 Makers by Sales Volume {section_title_suffix}", text_auto=True)
-                fig_top_makers_bar.update_layout(yaxis={'categoryorder':'total ascending'}, xaxis_title="Units Sold", yaxis_title="EV Maker")
-                st.plotly_chart(fig_top_makers_bar, use_container_width=True)
+                def build_top_makers():
+                    fig_top_makers_bar = px.bar(top_makers_volume, x="Sales", y="Maker", orientation='h',
+                                                title=f"Top 10 Makers by Sales Volume {section_title_suffix}", text_auto=True)
+                    fig_top_makers_bar.update_layout(yaxis={'categoryorder':'total ascending'}, xaxis_title="Units Sold", yaxis_title="EV Maker")
+                    return fig_top_makers_bar
+                plot_figure("EV Sales", "top_makers", (sd_selected_year, sd_selected_maker), build_top_makers)
             else: st.info("No sales data for current filter to display top makers.")
 
         with st.expander("View Detailed Filtered Sales Data & Download"):
             st.dataframe(sales_deep_dive_data[['Year', 'Cat', 'Maker', 'Sales']].sort_values(by=['Year', 'Maker']).reset_index(drop=True))
-            st.download_button("Download Filtered Sales CSV", sales_deep_dive_data.to_csv(index=False).encode('utf-8'), f"sales_deep_dive_{sd_selected_year}_{sd_selected_maker}.csv", "text/csv", key="sdd_filt_sales_csv")
+            export_button("Download Filtered Sales Data", "EV Sales", "sales_deep_dive", (sd_selected_year, sd_selected_maker),
+                          lambda: sales_deep_dive_data, f"sales_deep_dive_{sd_selected_year}_{sd_selected_maker}", key="sdd_filt_sales_csv")
 
         st.markdown("---")
         st.subheader(f"Sales by Vehicle Category {section_title_suffix}")
-        sales_by_cat_data = sales_deep_dive_data.groupby("Cat")["Sales"].sum().reset_index()
-        sales_by_cat_data = sales_by_cat_data[sales_by_cat_data['Sales'] > 0] # Filter out zero sales categories
+        with METRICS.section("aggregate", name="sales_by_category"):
+            sales_by_cat_data = category_sales(sales_cube, sd_filters) # Zero-sales categories left out
         if not sales_by_cat_data.empty:
-            fig_cat_sales_bar = px.bar(sales_by_cat_data, x="Cat", y="Sales", color="Cat",
-                                       title=f"Sales Distribution by Category {section_title_suffix}", text_auto=".2s")
-            fig_cat_sales_bar.update_layout(xaxis_title="Vehicle Category", yaxis_title="Units Sold")
-            st.plotly_chart(fig_cat_sales_bar, use_container_width=True)
+            def build_category_sales():
+                fig_cat_sales_bar = px.bar(sales_by_cat_data, x="Cat", y="Sales", color="Cat",
+                                           title=f"Sales Distribution by Category {section_title_suffix}", text_auto=".2s")
+                fig_cat_sales_bar.update_layout(xaxis_title="Vehicle Category", yaxis_title="Units Sold")
+                return fig_cat_sales_bar
+            plot_figure("EV Sales", "category_sales", (sd_selected_year, sd_selected_maker), build_category_sales)
         else: st.info("No sales data for current filters to display by category.")
 
         st.markdown("---")
         st.subheader("Manufacturer Growth Insights (Across All Available Years)")
-        st.caption(f"Calculated between earliest ({evsales_df.columns[2]} approx.) and latest ({evsales_df.columns[-2]} approx.) years in the source data. Growth % is shown; requires data for both start/end years.")
-
-        if 'Growth %' in evsales_df.columns:
-            # Use the evsales_df (which has growth calculated)
-            growth_data_to_display = evsales_df[['Maker', 'Growth %']].dropna(subset=['Growth %'])
-            # Filter out infinite or placeholder growth for better visualization, and zero growth
-            growth_data_to_display = growth_data_to_display[ (growth_data_to_display['Growth %'] < 9999) & (growth_data_to_display['Growth %'] != 0) ]
-            growth_data_to_display = growth_data_to_display.sort_values(by='Growth %', ascending=False)
-
-
+        growth_years = sales_year_columns(evsales_df)
+        latest_growth_year = growth_years[-1] if growth_years else "N/A"
+        st.caption(f"Growth % compares each maker's first year with non-zero sales against {latest_growth_year}; CAGR % annualises the same span. "
+                   f"Rolling Growth % compares the last {ROLLING_WINDOW} years with the {ROLLING_WINDOW} before them. Makers without a non-zero base year are left out.")
+        growth_metric = st.radio("Growth metric", ["Growth %", "CAGR %", "Rolling Growth %"], horizontal=True, key="sd_growth_metric")
+
+        if growth_metric in maker_growth_df.columns:
+            # Maker-level growth (all categories combined), precomputed in the data snapshot
+            with METRICS.section("aggregate", name="growth_ranking"):
+                growth_data_to_display_filtered = growth_ranking(maker_growth_df, growth_metric,
+                                                                 maker=None if sd_selected_maker == "All" else sd_selected_maker,
+                                                                 limit=15) # Top 15 overall growers unless a maker is selected
             if sd_selected_maker != "All":
-                growth_data_to_display_filtered = growth_data_to_display[growth_data_to_display['Maker'] == sd_selected_maker]
-                chart_title_growth = f"Sales Growth (%) for {sd_selected_maker}"
+                chart_title_growth = f"Sales {growth_metric.replace(' %', '')} (%) for {sd_selected_maker}"
             else:
-                growth_data_to_display_filtered = growth_data_to_display.head(15) # Show top 15 overall growers
-                chart_title_growth = f"Top 15 EV Manufacturers by Sales Growth (%)"
+                chart_title_growth = f"Top 15 EV Manufacturers by Sales {growth_metric.replace(' %', '')} (%)"
 
             if not growth_data_to_display_filtered.empty:
-                fig_growth_dive = px.bar(growth_data_to_display_filtered, x='Growth %', y='Maker', orientation='h',
-                                         color='Growth %', color_continuous_scale=px.colors.sequential.Tealgrn,
-                                         title=chart_title_growth, text='Growth %')
-                fig_growth_dive.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-                fig_growth_dive.update_layout(yaxis={'categoryorder':'total ascending'}, xaxis_title="Growth (%)", yaxis_title="EV Maker", coloraxis_showscale=False)
-                st.plotly_chart(fig_growth_dive, use_container_width=True)
-            else: st.info(f"No valid growth data available for '{sd_selected_maker}' (requires sales in both earliest and latest years, excluding zero start year).")
+                def build_growth_chart():
+                    fig_growth_dive = px.bar(growth_data_to_display_filtered, x=growth_metric, y='Maker', orientation='h',
+                                             color=growth_metric, color_continuous_scale=px.colors.sequential.Tealgrn,
+                                             hover_data=['First Year', 'Start Sales', 'Latest Sales'],
+                                             title=chart_title_growth, text=growth_metric)
+                    fig_growth_dive.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+                    fig_growth_dive.update_layout(yaxis={'categoryorder':'total ascending'}, xaxis_title=f"{growth_metric.replace(' %', '')} (%)", yaxis_title="EV Maker", coloraxis_showscale=False)
+                    return fig_growth_dive
+                plot_figure("EV Sales", "maker_growth", (growth_metric, sd_selected_maker), build_growth_chart)
+            else: st.info(f"No valid growth data available for '{sd_selected_maker}' (requires a year with non-zero sales before {latest_growth_year}).")
         else: st.warning("Growth % calculation was not performed or is missing in the sales data.")
 
+        # --- Sales Outlook ---
+        st.markdown("---")
+        st.subheader(f"Sales Outlook ({sd_selected_maker if sd_selected_maker != 'All' else 'All Makers'})")
+        st.caption(f"Projections for the next {FORECAST_HORIZON} years by category, fitted to yearly sales from each row's first year with sales "
+                   f"and precomputed with the data snapshot. Rows with fewer than {FORECAST_MIN_HISTORY} such years are not projected. "
+                   "They extrapolate past trends only.")
+        forecast_model = st.radio("Forecast model", list(FORECAST_MODELS), index=list(FORECAST_MODELS).index(DEFAULT_FORECAST_MODEL),
+                                  format_func=lambda m: FORECAST_MODELS[m][0], horizontal=True, key="sd_forecast_model")
+        with METRICS.section("aggregate", name="sales_outlook"):
+            if sd_selected_maker == "All":
+                outlook_data = sales_outlook(sales_cube, page_data["category_forecast"], forecast_model)
+            else:
+                outlook_data = sales_outlook(sales_cube, page_data["sales_forecast"], forecast_model, sd_selected_maker)
+        if (outlook_data["Kind"] == "Forecast").any():
+            def build_sales_outlook():
+                fig_outlook = px.line(outlook_data, x="Year", y="Sales", color="Cat", line_dash="Kind", markers=True,
+                                      title=f"Actual and Projected Sales by Category ({FORECAST_MODELS[forecast_model][0]})")
+                fig_outlook.update_layout(yaxis_title="Units Sold", xaxis_title="Year", legend_title_text="")
+                return fig_outlook
+            plot_figure("EV Sales", "sales_outlook", (forecast_model, sd_selected_maker), build_sales_outlook)
+        else: st.info(f"Not enough sales history to project '{sd_selected_maker}' (needs {FORECAST_MIN_HISTORY} years from its first sale).")
+        if sd_selected_maker == "All":
+            with st.expander("Largest Makers by Projected Sales"):
+                st.dataframe(forecast_ranking(page_data["maker_forecast"], forecast_model), hide_index=True)
+
     else:
         st.warning(f"No sales data found for the selected filters: Year '{sd_selected_year}', Maker '{sd_selected_maker}'.")
 
 
 elif st.session_state.app_mode == "EV Category Trends":
     st.header("🚗 EV Category Registration Trends Over Time")
-    st.markdown("Explore daily registration trends across different EV categories.")
+    st.markdown("Explore registration trends across different EV categories.")
+    evcat_df = page_data["ev_category"]
+    category_rollups = page_data["category_rollups"]
 
-    if evcat_df is None or evcat_df.empty or 'Date' not in evcat_df.columns:
+    if evcat_df is None or evcat_df.empty or not isinstance(evcat_df.index, pd.DatetimeIndex):
         st.warning("EV Category time series data (from ev_cat_01-24.csv) is not available or the 'Date' column is missing/invalid.")
     else:
         # Identify numeric category columns automatically
-        category_cols_for_ts = [col for col in evcat_df.columns if col != 'Date' and pd.api.types.is_numeric_dtype(evcat_df[col])]
+        category_cols_for_ts = [col for col in evcat_df.columns if pd.api.types.is_numeric_dtype(evcat_df[col])]
 
         if not category_cols_for_ts:
              st.warning("No numeric category columns found in the EV category data file.")
         else:
-            # Ensure Date column is datetime
-            evcat_df['Date'] = pd.to_datetime(evcat_df['Date'])
-            date_min_cat = evcat_df["Date"].min()
-            date_max_cat = evcat_df["Date"].max()
+            # evcat_df is indexed by a sorted DatetimeIndex (parsed once in the snapshot)
+            date_min_cat = evcat_df.index[0]
+            date_max_cat = evcat_df.index[-1]
 
             st.subheader("Select Date Range and Category")
             trend_dt_col1, trend_dt_col2 = st.columns(2)
@@ -590,33 +793,37 @@ elif st.session_state.app_mode == "EV Category Trends":
                 start_date_trend_cat = st.date_input("Start Date", date_min_cat, min_value=date_min_cat, max_value=date_max_cat, key="trend_cat_start")
             with trend_dt_col2:
                 end_date_trend_cat = st.date_input("End Date", date_max_cat, min_value=start_date_trend_cat, max_value=date_max_cat, key="trend_cat_end")
+            resolution_labels = {"Auto": None, **{label: key for key, (_, label) in RESOLUTIONS.items()}}
+            selected_resolution_label = st.selectbox("Chart Resolution", list(resolution_labels), key="trend_cat_resolution",
+                                                     help="Auto picks the finest resolution that fits the chart width for the selected span.")
 
-            # Filter data based on date range
-            trend_data_filtered_cat = evcat_df[
-                (evcat_df['Date'] >= pd.to_datetime(start_date_trend_cat)) &
-                (evcat_df['Date'] <= pd.to_datetime(end_date_trend_cat))
-            ].copy() # Use .copy() to avoid SettingWithCopyWarning if modifying later
+            # Filter data based on date range (binary search on the sorted index, no copy)
+            range_start, range_end = pd.to_datetime(start_date_trend_cat), pd.to_datetime(end_date_trend_cat)
+            trend_data_filtered_cat = slice_dates(evcat_df, range_start, range_end)
 
             if trend_data_filtered_cat.empty:
                 st.info("No data available for the selected date range.")
             else:
+                # Heatmap/line payloads come from the precomputed roll-ups, sized to the chart width
+                with METRICS.section("aggregate", name="category_heatmap"):
+                    heatmap_data_ts_indexed, heatmap_resolution = category_heatmap(
+                        category_rollups, range_start, range_end, resolution_labels[selected_resolution_label], width_px=CHART_WIDTH_PX)
+                heatmap_label = RESOLUTIONS[heatmap_resolution][1]
+
                 # --- Heatmap ---
-                st.subheader("Heatmap of Daily EV Registrations by Category")
+                st.subheader(f"Heatmap of {heatmap_label} EV Registrations by Category")
                 st.caption("Shows relative registration volume across categories over the selected period.")
-                heatmap_data_ts_indexed = trend_data_filtered_cat.set_index('Date')
 
                 if not heatmap_data_ts_indexed.empty and category_cols_for_ts:
-                    # Consider resampling for long periods to make heatmap clearer (e.g., 'W' for weekly sum)
-                    # Example: heatmap_data_resampled = heatmap_data_ts_indexed[category_cols_for_ts].resample('W').sum()
-                    # If resampling, use heatmap_data_resampled below
-                    # For now, using daily data:
-                    fig_heatmap_ts = px.imshow(heatmap_data_ts_indexed[category_cols_for_ts].T, # Transpose for dates on x-axis
-                                               labels=dict(x="Date", y="Vehicle Category", color="Registrations"),
-                                               aspect="auto", color_continuous_scale="Plasma",
-                                               title="Daily EV Registrations Heatmap")
-                    fig_heatmap_ts.update_xaxes(type='date', tickformat="%Y-%m-%d") # Ensure correct date formatting
-                    fig_heatmap_ts.update_layout(yaxis_title="EV Category")
-                    st.plotly_chart(fig_heatmap_ts, use_container_width=True)
+                    def build_category_heatmap():
+                        fig_heatmap_ts = px.imshow(heatmap_data_ts_indexed[category_cols_for_ts].T, # Transpose for dates on x-axis
+                                                   labels=dict(x="Date", y="Vehicle Category", color="Registrations"),
+                                                   aspect="auto", color_continuous_scale="Plasma",
+                                                   title=f"{heatmap_label} EV Registrations Heatmap")
+                        fig_heatmap_ts.update_xaxes(type='date', tickformat="%Y-%m-%d") # Ensure correct date formatting
+                        fig_heatmap_ts.update_layout(yaxis_title="EV Category")
+                        return fig_heatmap_ts
+                    plot_figure("EV Category Trends", "category_heatmap", (range_start, range_end, heatmap_resolution), build_category_heatmap)
                 else: st.info("Not enough data or no numeric category columns for the selected date range to display category heatmap.")
 
                 st.markdown("---")
@@ -625,19 +832,25 @@ elif st.session_state.app_mode == "EV Category Trends":
                 selected_cat_for_trend = st.selectbox("Select EV Category:", category_cols_for_ts, key="cat_trend_select_page_local")
 
                 if selected_cat_for_trend:
-                    fig_cat_trend_line = px.line(trend_data_filtered_cat.sort_values(by="Date"),
-                                                 x="Date", y=selected_cat_for_trend, markers=False, # Use markers=True for fewer points
-                                                 title=f"Registration Trend for {selected_cat_for_trend}")
-                    fig_cat_trend_line.update_layout(yaxis_title="Daily Registrations", xaxis_title="Date")
-                    st.plotly_chart(fig_cat_trend_line, use_container_width=True)
+                    line_resolution = resolution_labels[selected_resolution_label]
+                    with METRICS.section("aggregate", name="category_trend"): # Auto: native points, LTTB-downsampled to the chart width
+                        line_series, line_label = category_trend(category_rollups, selected_cat_for_trend, range_start, range_end,
+                                                                 line_resolution, width_px=CHART_WIDTH_PX)
+                    def build_category_trend():
+                        fig_cat_trend_line = px.line(line_series.reset_index(),
+                                                     x="Date", y=selected_cat_for_trend, markers=False, # Use markers=True for fewer points
+                                                     title=f"Registration Trend for {selected_cat_for_trend} ({line_label})")
+                        fig_cat_trend_line.update_layout(yaxis_title=f"{RESOLUTIONS[line_resolution or 'D'][1]} Registrations", xaxis_title="Date")
+                        return fig_cat_trend_line
+                    plot_figure("EV Category Trends", "category_trend", (range_start, range_end, selected_cat_for_trend, selected_resolution_label), build_category_trend)
 
                     with st.expander(f"View Data for {selected_cat_for_trend} ({start_date_trend_cat.strftime('%Y-%m-%d')} to {end_date_trend_cat.strftime('%Y-%m-%d')}) & Download"):
-                        display_df_cat = trend_data_filtered_cat[['Date', selected_cat_for_trend]].sort_values('Date').reset_index(drop=True)
+                        display_df_cat = trend_data_filtered_cat[[selected_cat_for_trend]].reset_index()
                         st.dataframe(display_df_cat)
-                        st.download_button("Download Category Trend CSV",
-                                           display_df_cat.to_csv(index=False).encode('utf-8'),
-                                           f"{selected_cat_for_trend}_trend_{start_date_trend_cat.strftime('%Y%m%d')}_{end_date_trend_cat.strftime('%Y%m%d')}.csv",
-                                           "text/csv", key="cat_trend_filt_csv")
+                        export_button("Download Category Trend Data", "EV Category Trends", "category_trend",
+                                      (range_start, range_end, selected_cat_for_trend), lambda: display_df_cat,
+                                      f"{selected_cat_for_trend}_trend_{start_date_trend_cat.strftime('%Y%m%d')}_{end_date_trend_cat.strftime('%Y%m%d')}",
+                                      key="cat_trend_filt_csv")
                 else:
                      st.info("Please select an EV category to view its trend.")
 
@@ -649,3 +862,18 @@ st.caption(
     '<a href="https://www.linkedin.com/in/vignesh-s-9b86a7243" target="_blank">Connect on LinkedIn</a>',
     unsafe_allow_html=True
 )
+
+METRICS.record("page", time.perf_counter() - page_started_at, page=st.session_state.app_mode)
+
+# ---------- Debug Panel (?debug=1 or EV_DEBUG_PANEL=1) ----------
+if DEBUG_PANEL:
+    with st.sidebar.expander("⏱️ Timings (this process)", expanded=True):
+        timing_rows = METRICS.rows()
+        if timing_rows:
+            timing_df = pd.DataFrame(timing_rows)
+            st.dataframe(timing_df.round({"mean_ms": 2, "last_ms": 2, "max_ms": 2, "total_ms": 1}), hide_index=True)
+        figure_cache_stats = get_figure_cache().stats()
+        st.caption(f"Figure cache: {figure_cache_stats['entries']} entries, {figure_cache_stats['bytes'] / 1024:,.0f} KiB, "
+                   f"{figure_cache_stats['hits']} hits / {figure_cache_stats['misses']} misses / {figure_cache_stats['evictions']} evictions")
+        if METRICS_PORT: st.caption(f"Prometheus metrics: {METRICS_HOST}:{METRICS_PORT}, path /metrics")
+        if st.button("Reset timings", key="debug_reset_timings"): METRICS.reset()
@@ -0,0 +1 @@
+"""Benchmarks for the headless ev_insights core (python -m benchmarks.bench_core)."""
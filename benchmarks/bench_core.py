@@ -0,0 +1,359 @@
+"""Load, memory and per-query benchmarks for the ev_insights core.
+
+Runs every loading, normalization, growth, aggregation and time-series
+operation the dashboard depends on against synthetic data scaled from the
+shipped CSVs (see benchmarks/synthetic.py), and reports wall time and peak
+Python-heap allocation per operation:
+
+    python -m benchmarks.bench_core                       # scales 1x and 100x
+    python -m benchmarks.bench_core --scales 1,100,10000  # needs several GB of RAM and disk
+    python -m benchmarks.bench_core --output baseline.json
+    python -m benchmarks.bench_core --compare baseline.json --threshold 1.25
+
+With ``--compare`` the exit status is 1 when any operation's median time (or
+peak memory) exceeds the baseline by more than ``--threshold``, so the run
+can gate a deployment. Before timing, every scale also runs the consistency
+checks in ``CHECKS`` (invariants a faster code path must not break); a failed
+check exits with status 1 as well.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_synthetic_sources
+from ev_insights.analytics import filter_maker_places, growth_ranking, maker_place_options, pcs_totals_by_state, sales_outlook
+from ev_insights.boundaries import load_boundaries
+from ev_insights.clustering import cap_points
+from ev_insights.cube import build_sales_cube, share_with_others, top_n
+from ev_insights.data import SOURCE_FILES, normalize_state_column, read_csv, read_sources, sales_year_columns
+from ev_insights.forecast import forecast_matrix, sales_forecast_tables
+from ev_insights.growth import sales_growth_tables
+from ev_insights.ingest import ingest
+from ev_insights.makers import apply_maker_aliases, build_maker_aliases
+from ev_insights.snapshot import build_snapshot, load_snapshot, load_snapshot_version, read_manifest
+from ev_insights.spatial import StateLocator, count_by_state
+from ev_insights.states import default_state_index
+from ev_insights.timeseries import RESOLUTIONS, build_rollups, choose_resolution, downsample_series, slice_dates
+
+SCALES = (1, 100, 10000)  # Supported scale factors; the default run skips the largest
+DEFAULT_SCALES = (1, 100)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 1.25
+POINTS_PER_SCALE = 1000  # Synthetic charger points for the spatial join
+MIN_TIME_DELTA_S = 0.002  # Slowdowns under 2 ms are timer noise, not regressions
+MIN_MEMORY_BYTES = 1 << 20  # Likewise peak-memory growth under 1 MiB
+
+
+class Context:
+    """Synthetic source directory plus the frames later operations reuse, built lazily."""
+
+    def __init__(self, data_dir, snapshot_dir, scale=1):
+        self.data_dir = data_dir
+        self.snapshot_dir = snapshot_dir
+        self.scale = scale
+        self._cache = {}
+
+    def get(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def frames(self):
+        return self.get("frames", lambda: read_sources(self.data_dir))
+
+    @property
+    def raw_sales(self):
+        return self.get("raw_sales", lambda: read_csv("sales", self.data_dir))
+
+    @property
+    def sales_matrix(self):
+        """The wide sales table's year columns as a rows x years array."""
+        return self.get("sales_matrix", lambda: self.raw_sales[sales_year_columns(self.raw_sales)]
+                        .apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float))
+
+    @property
+    def raw_places(self):
+        return self.get("raw_places", lambda: read_csv("maker_places", self.data_dir))
+
+    @property
+    def cube(self):
+        return self.get("cube", lambda: build_sales_cube(self.frames["sales_melted"]))
+
+    @property
+    def rollups(self):
+        return self.get("rollups", lambda: build_rollups(self.frames["ev_category"]))
+
+    @property
+    def locator(self):
+        return self.get("locator", lambda: StateLocator(load_boundaries("high")))
+
+    @property
+    def points(self):
+        """Synthetic point coordinates over India's bounding box, POINTS_PER_SCALE per unit of scale."""
+        def sample():
+            rng = np.random.default_rng(0)
+            n = POINTS_PER_SCALE * self.scale
+            return rng.uniform(68.0, 97.5, n), rng.uniform(6.5, 37.5, n)
+        return self.get("points", sample)
+
+    @property
+    def point_frame(self):
+        def frame():
+            lon, lat = self.points
+            makers = np.resize(self.frames["maker_places"]["EV Maker"].to_numpy(), len(lon))
+            return pd.DataFrame({"Latitude": lat, "Longitude": lon, "EV Maker": makers})
+        return self.get("point_frame", frame)
+
+    @property
+    def latest_year(self):
+        return self.cube.members("Year")[-1]
+
+
+def _first_access(ctx):
+    snapshot = load_snapshot_version(ctx.snapshot_dir, read_manifest(ctx.snapshot_dir))
+    return snapshot["sales_melted"]
+
+
+def _trend_query(ctx):
+    rollups = ctx.rollups
+    first, last = rollups["D"].index[0], rollups["D"].index[-1]
+    resolution = choose_resolution(rollups, first, last)
+    series = slice_dates(rollups[resolution], first, last).iloc[:, 0]
+    return downsample_series(series)
+
+
+# Operation name -> callable(ctx); grouped by the stage of the dashboard they stand for
+OPERATIONS = {
+    "load.read_sources": lambda ctx: read_sources(ctx.data_dir),
+    "load.build_snapshot": lambda ctx: build_snapshot(ctx.data_dir, ctx.snapshot_dir),
+    "load.open_snapshot": lambda ctx: load_snapshot(ctx.data_dir, ctx.snapshot_dir),
+    "load.first_access": _first_access,
+    "normalize.state_column": lambda ctx: normalize_state_column(ctx.raw_places["State"]),
+    "normalize.maker_aliases": lambda ctx: build_maker_aliases(ctx.raw_sales["Maker"], reference=ctx.raw_places["EV Maker"]),
+    "normalize.maker_column": lambda ctx: apply_maker_aliases(ctx.raw_sales["Maker"], ctx.frames["maker_aliases"]),
+    "growth.sales_growth_tables": lambda ctx: sales_growth_tables(ctx.raw_sales, sales_year_columns(ctx.raw_sales)),
+    "forecast.sales_forecast_tables": lambda ctx: sales_forecast_tables(ctx.raw_sales, sales_year_columns(ctx.raw_sales), workers=1),
+    "forecast.holt_fit_parallel": lambda ctx: forecast_matrix(ctx.sales_matrix, "holt-fit"),
+    "cube.build": lambda ctx: build_sales_cube(ctx.frames["sales_melted"]),
+    "query.sales_by_maker": lambda ctx: ctx.cube.aggregate(by=("Maker",), where={"Year": ctx.latest_year}),
+    "query.market_share": lambda ctx: share_with_others(ctx.cube.aggregate(by=("Maker",), where={"Year": ctx.latest_year})),
+    "query.top_n": lambda ctx: top_n(ctx.cube.aggregate(by=("Maker",)), 10),
+    "query.growth_ranking": lambda ctx: growth_ranking(ctx.frames["maker_growth"], "CAGR %"),
+    "query.sales_outlook": lambda ctx: sales_outlook(ctx.cube, ctx.frames["category_forecast"], "holt"),
+    "query.pcs_by_state": lambda ctx: pcs_totals_by_state(ctx.frames["pcs"]),
+    "query.maker_places": lambda ctx: (maker_place_options(ctx.frames["maker_places"]),
+                                       filter_maker_places(ctx.frames["maker_places"], state="Maharashtra")),
+    "timeseries.build_rollups": lambda ctx: build_rollups(ctx.frames["ev_category"]),
+    "timeseries.trend_query": _trend_query,
+    "spatial.locate_points": lambda ctx: count_by_state(ctx.locator.locate(*ctx.points)),
+    "spatial.cluster_points": lambda ctx: cap_points(ctx.point_frame, mode="clusters", label_col="EV Maker"),
+}
+
+
+def _check_rollup_periods(ctx):
+    """Coarser roll-ups are labelled by period start and add up to the native rows over the same span."""
+    rollups = ctx.rollups
+    native = rollups["D"]
+    for key, (freq, _) in RESOLUTIONS.items():
+        if freq is not None:
+            # Labelled by period start: each native row belongs to the last label at or before it
+            period = rollups[key].index.searchsorted(native.index, side="right") - 1
+            assert period.min() >= 0, f"{key} roll-up starts after the first native row"
+            regrouped = native.groupby(period).sum().to_numpy(dtype=float)
+            assert np.allclose(regrouped, np.nan_to_num(rollups[key].to_numpy(dtype=float))), \
+                f"{key} roll-up rows do not sum the native rows from their label on"
+    # A span that starts and ends on week and month boundaries alike: Mondays that are the 1st of a month
+    bounds = [ts for ts in pd.date_range(native.index[0].normalize(), native.index[-1], freq="MS") if ts.dayofweek == 0]
+    assert len(bounds) >= 2, "source span too short for an aligned check"
+    start, end = bounds[0], bounds[-1] - pd.Timedelta(seconds=1)
+    totals = {key: float(slice_dates(frame, start, end).to_numpy().sum()) for key, frame in rollups.items()}
+    assert np.allclose(list(totals.values()), totals["D"]), f"totals over {start:%Y-%m-%d}..{end:%Y-%m-%d} differ: {totals}"
+
+
+def _check_ambiguous_states(ctx):
+    """A state name that fits several states about equally is reported, not credited to one of them."""
+    extra = pd.Series(["Pradesh", "Uttar Prdesh"])
+    states, report = default_state_index().normalize(pd.concat([ctx.raw_places["State"], extra], ignore_index=True))
+    kinds = dict(zip(report["value"], report["match"]))
+    assert kinds.get("Pradesh") == "ambiguous", f"'Pradesh' matched as {kinds.get('Pradesh')!r}"
+    assert states.iloc[-2] == "Pradesh", f"'Pradesh' normalised to {states.iloc[-2]!r}"
+    assert (kinds.get("Uttar Prdesh"), states.iloc[-1]) == ("fuzzy", "Uttar Pradesh"), "a clear misspelling no longer resolves"
+
+
+def _check_ingest_matches_rebuild(ctx):
+    """Ingesting a split of the sources gives the same version, frames and summary as a full rebuild."""
+    work_dir = os.path.join(os.path.dirname(ctx.data_dir), "ingest_check")
+    split_dir = os.path.join(work_dir, "data")
+    os.makedirs(split_dir)
+    for name, file in SOURCE_FILES.items():
+        if name not in ("sales", "ev_category"):
+            shutil.copy(os.path.join(ctx.data_dir, file), split_dir)
+    # Sales: the base lacks the latest year, which arrives in two drops so the second adds to the first
+    sales = pd.read_csv(os.path.join(ctx.data_dir, SOURCE_FILES["sales"]), dtype=str, keep_default_na=False)
+    latest = sales_year_columns(sales)[-1]
+    sales.drop(columns=[latest]).to_csv(os.path.join(split_dir, SOURCE_FILES["sales"]), index=False)
+    half = len(sales) // 2
+    drops = [("sales", sales[["Cat", "Maker", latest]].iloc[:half]), ("sales", sales[["Cat", "Maker", latest]].iloc[half:])]
+    # Categories: the base stops a tenth of the way from the end, the rest is one drop
+    with open(os.path.join(ctx.data_dir, SOURCE_FILES["ev_category"]), encoding="utf-8") as f:
+        lines = f.readlines()
+    cut = 1 + (len(lines) - 1) * 9 // 10
+    with open(os.path.join(split_dir, SOURCE_FILES["ev_category"]), "w", encoding="utf-8") as f:
+        f.writelines(lines[:cut])
+    drops.append(("ev_category", pd.read_csv(os.path.join(ctx.data_dir, SOURCE_FILES["ev_category"]), dtype=str,
+                                             keep_default_na=False).iloc[cut - 1:]))
+
+    snapshot_dir = os.path.join(work_dir, "snapshot")
+    load_snapshot(split_dir, snapshot_dir)
+    for i, (name, frame) in enumerate(drops):
+        path = os.path.join(work_dir, f"drop_{i}.csv")
+        frame.to_csv(path, index=False)
+        incremental = ingest(name, path, split_dir, snapshot_dir)
+    rebuilt = build_snapshot(split_dir, os.path.join(work_dir, "rebuilt"))
+    assert incremental.version == rebuilt.version, f"version {incremental.version} after ingest, {rebuilt.version} rebuilt"
+    assert incremental.summary == rebuilt.summary, "summary after ingest differs from the rebuilt one"
+    combined = load_snapshot(ctx.data_dir, ctx.snapshot_dir)
+    for frame in rebuilt.names:
+        for label, reference in (("rebuilt", rebuilt), ("combined sources", combined)):
+            try:
+                pd.testing.assert_frame_equal(incremental[frame], reference[frame])
+            except AssertionError as e:
+                raise AssertionError(f"{frame} after ingest differs from the {label} snapshot: {e}") from None
+
+
+# Check name -> callable(ctx) that raises AssertionError when the invariant does not hold
+CHECKS = {
+    "timeseries.rollup_periods": _check_rollup_periods,
+    "states.ambiguous_names": _check_ambiguous_states,
+    "ingest.matches_rebuild": _check_ingest_matches_rebuild,
+}
+
+
+def check(ctx):
+    """Run every consistency check; returns the failures as human-readable lines."""
+    failures = []
+    for name, invariant in CHECKS.items():
+        try:
+            invariant(ctx)
+        except AssertionError as e:
+            failures.append(f"{name}: {e}")
+    return failures
+
+
+def measure(operation, ctx, repeat):
+    """Median/min wall time over ``repeat`` runs, plus peak traced allocation of one extra run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation(ctx)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        operation(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"median_s": statistics.median(times), "min_s": min(times), "peak_bytes": peak, "runs": repeat}
+
+
+def run(scales=DEFAULT_SCALES, operations=None, repeat=DEFAULT_REPEAT, seed=0, log=print, failures=None):
+    """Benchmark ``operations`` (default: all) at every scale. Returns {"<scale>x": {operation: result}}.
+
+    Failed consistency checks are logged and, when given a list, appended to ``failures``.
+    """
+    names = operations or list(OPERATIONS)
+    results = {}
+    for scale in scales:
+        work_dir = tempfile.mkdtemp(prefix=f"ev_bench_{scale}x_")
+        try:
+            start = time.perf_counter()
+            data_dir = write_synthetic_sources(f"{work_dir}/data", scale, seed=seed)
+            log(f"{scale}x: synthetic sources written in {time.perf_counter() - start:.1f}s")
+            ctx = Context(data_dir, f"{work_dir}/snapshot", scale)
+            build_snapshot(ctx.data_dir, ctx.snapshot_dir)  # open/first-access need an existing snapshot
+            for line in check(ctx):
+                log(f"  CHECK FAILED {line}")
+                if failures is not None:
+                    failures.append(f"{scale}x {line}")
+            scale_results = results[f"{scale}x"] = {}
+            for name in names:
+                # Loading whole datasets is slow at large scales; a single run is representative there
+                runs = 1 if name.startswith("load.") and scale >= 100 else repeat
+                scale_results[name] = measure(OPERATIONS[name], ctx, runs)
+                r = scale_results[name]
+                log(f"  {name:<28} median {r['median_s'] * 1000:>10.2f} ms   peak {r['peak_bytes'] / 2**20:>9.1f} MiB")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Regressions of ``results`` against ``baseline`` as a list of human-readable lines."""
+    regressions = []
+    for scale, ops in results.items():
+        for name, current in ops.items():
+            before = baseline.get(scale, {}).get(name)
+            if before is None:
+                continue
+            if (current["median_s"] > before["median_s"] * threshold
+                    and current["median_s"] - before["median_s"] > MIN_TIME_DELTA_S):
+                regressions.append(f"{scale} {name}: time {before['median_s'] * 1000:.2f} -> {current['median_s'] * 1000:.2f} ms "
+                                   f"({current['median_s'] / before['median_s']:.2f}x)")
+            if (current["peak_bytes"] > before["peak_bytes"] * threshold
+                    and current["peak_bytes"] - before["peak_bytes"] > MIN_MEMORY_BYTES):
+                regressions.append(f"{scale} {name}: peak memory {before['peak_bytes'] / 2**20:.1f} -> "
+                                   f"{current['peak_bytes'] / 2**20:.1f} MiB")
+    return regressions
+
+
+def _scales(value):
+    scales = tuple(int(s) for s in value.split(",") if s.strip())
+    if not scales or any(s < 1 for s in scales):
+        raise argparse.ArgumentTypeError("expected a comma-separated list of positive integers")
+    return scales
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ev_insights core on scaled synthetic data.")
+    parser.add_argument("--scales", type=_scales, default=DEFAULT_SCALES,
+                        help=f"comma-separated scale factors (default: {','.join(map(str, DEFAULT_SCALES))}; "
+                             f"supported: {','.join(map(str, SCALES))})")
+    parser.add_argument("--only", action="append", choices=sorted(OPERATIONS), help="run just this operation (repeatable)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON (e.g. to use as a baseline)")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown / memory growth factor before --compare fails")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore", UserWarning)  # pandas date-format inference chatter
+    failures = []
+    results = run(args.scales, args.only, args.repeat, args.seed, failures=failures)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.2f}x")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
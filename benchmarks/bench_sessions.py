@@ -0,0 +1,298 @@
+"""Concurrent-session load test for the dashboard.
+
+Simulates users of one app.py worker with Streamlit's ``AppTest``, offline.
+Each session opens the app and then, for ``--rounds`` rounds, walks through
+all four sidebar pages like a user:
+
+- on EV Sales it picks a year, then a maker, then goes back to all years;
+- on EV Category Trends it moves the start date, then the end date.
+
+Choices are drawn per session from a seeded RNG, so sessions do not all hit
+the same cached figures. Every rerun is timed. For each level of concurrent
+sessions the harness reports:
+
+- p50/p95/p99 rerun latency;
+- throughput in reruns per second;
+- the worker's peak RSS.
+
+    python -m benchmarks.bench_sessions                      # 1, 10 and 100 concurrent sessions
+    python -m benchmarks.bench_sessions --sessions 1,10 --rounds 2
+    python -m benchmarks.bench_sessions --think-ms 2000 --output sessions.json
+
+All sessions of a level run as threads in one process. They share its
+``st.cache_resource`` data and figure caches, as sessions on a Streamlit
+worker do. Each level runs in a fresh interpreter, so its peak RSS is its
+own. By default one unmeasured session warms the caches first, as on a
+worker that has served traffic; ``--cold`` leaves them cold.
+
+The runs need no network. Geocoding is answered from the seed CSV
+(``EV_GEOCODER=file:...``, see ev_insights/geocode.py), and the state
+boundaries are the vendored files under data/boundaries. The worker refuses
+to resolve any host other than localhost, so a code path that reaches for
+the network fails the run instead of being timed.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from ev_insights.boundaries import BOUNDARY_DIR, LEVELS_OF_DETAIL, boundary_path
+from ev_insights.geocode import DEFAULT_SEED_CSV
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+DEFAULT_SESSIONS = (1, 10, 100)
+DEFAULT_ROUNDS = 1
+DEFAULT_TIMEOUT_S = 900  # Per rerun; 100 sessions on one core queue for a long time
+PERCENTILES = (50, 95, 99)
+
+# Sidebar button label -> app mode (app.py's navigation)
+PAGES = {
+    "📋 EV Market Status": "EV Market Status",
+    "📈 EV Sales": "EV Sales",
+    "🚗 EV Category Trends": "EV Category Trends",
+    "🏠 Geospatial Insights": "Geospatial Insights",
+}
+MAKER_CHOICES = 30  # Sessions pick among the first makers of the list, as users mostly look at the big ones
+
+
+def _refuse_network():
+    """Make name resolution fail for anything but localhost in this process."""
+    resolve = socket.getaddrinfo
+
+    def local_only(host, *args, **kwargs):
+        if host not in (None, "localhost", "127.0.0.1", "::1"):
+            raise socket.gaierror(f"bench_sessions runs offline; refused to resolve {host!r}")
+        return resolve(host, *args, **kwargs)
+
+    socket.getaddrinfo = local_only
+
+
+def _share_app_test_globals():
+    """Make AppTest's per-run globals hold for every session thread.
+
+    AppTest installs a mock Runtime and patches ``global.appTest`` for each
+    run, then clears both when the run ends. With concurrent sessions that
+    pulls them out from under the others mid-run: their elements silently go
+    missing (bare mode) or their widgets lose the values AppTest reads back.
+    It also compiles app.py afresh on every run, and concurrent compiles
+    fail at random on Python 3.11 ("AST constructor recursion depth
+    mismatch"). Sessions of one worker share its runtime and script cache
+    anyway, so do the same here: one script cache, the option set for the
+    whole process, and the last runtime installed as the fallback.
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    script_cache = app_test.ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    config.set_option("global.appTest", True)
+
+    last = []
+
+    def current(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        return last[0] if last else None
+
+    def instance(cls):
+        runtime = current(cls)
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: current(cls) is not None)
+
+
+def _click(at, label):
+    next(button for button in at.sidebar.button if button.label == label).click()
+
+
+def _pick_year(at, rng):
+    box = at.selectbox(key="sd_year")
+    box.select(rng.choice([year for year in box.options if year != "All"]))
+
+
+def _pick_maker(at, rng):
+    box = at.selectbox(key="sd_maker")
+    box.select(rng.choice([maker for maker in box.options if maker != "All"][:MAKER_CHOICES]))
+
+
+def _all_years(at, rng):
+    at.selectbox(key="sd_year").select("All")
+
+
+def _move_start(at, rng):
+    start = at.date_input(key="trend_cat_start")
+    span = max((start.max - start.min).days - 30, 0)
+    start.set_value(start.min + timedelta(days=rng.randint(0, span)))
+
+
+def _move_end(at, rng):
+    start, end = at.date_input(key="trend_cat_start").value, at.date_input(key="trend_cat_end")
+    end.set_value(min(start + timedelta(days=rng.randint(30, 730)), end.max))
+
+
+def session_steps(rounds=DEFAULT_ROUNDS):
+    """The scripted (step name, action(at, rng)) sequence one session replays after opening the app."""
+    page = {mode: (lambda label: lambda at, rng: _click(at, label))(label) for label, mode in PAGES.items()}
+    one_round = [
+        ("page: EV Market Status", page["EV Market Status"]),
+        ("page: EV Sales", page["EV Sales"]),
+        ("sales: year", _pick_year),
+        ("sales: maker", _pick_maker),
+        ("sales: all years", _all_years),
+        ("page: EV Category Trends", page["EV Category Trends"]),
+        ("trend: start date", _move_start),
+        ("trend: end date", _move_end),
+        ("page: Geospatial Insights", page["Geospatial Insights"]),
+    ]
+    return one_round * rounds
+
+
+def run_session(seed, rounds, timeout, app_path=APP_PATH, start=None, think_s=0.0):
+    """[(step, seconds)] for one scripted session, plus the error that ended it early (or None)."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    timings = []
+    if start is not None:
+        start.wait()
+    name = "open"
+    try:
+        for name, action in [("open", None)] + session_steps(rounds):
+            if action is not None:
+                action(at, rng)
+            began = time.perf_counter()
+            at.run()
+            timings.append((name, time.perf_counter() - began))
+            if at.exception:
+                return timings, f"{name}: {at.exception[0].value}"
+            if at.error:  # The app reports load failures with st.error and stops the page
+                return timings, f"{name}: {at.error[0].value}"
+            if think_s:
+                time.sleep(think_s)
+    except Exception as e:  # A missing widget or a rerun timeout ends this session, not the run
+        return timings, f"{name}: {type(e).__name__}: {e}"
+    return timings, None
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB, macOS bytes
+
+
+def run_level(sessions, rounds=DEFAULT_ROUNDS, timeout=DEFAULT_TIMEOUT_S, think_s=0.0, warm=True, seed=0):
+    """Run ``sessions`` concurrent sessions in this process. Returns the level's summary."""
+    if warm:
+        _, error = run_session(-1, 1, timeout)
+        if error:
+            raise RuntimeError(f"warm-up session failed: {error}")
+    results = [None] * sessions
+    start = threading.Barrier(sessions + 1)
+
+    def worker(i):
+        results[i] = run_session(seed + i, rounds, timeout, start=start, think_s=think_s)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    start.wait()  # Every session has built its AppTest; start the clock with all of them at once
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+
+    timings = [timing for session_timings, _ in results for timing in session_timings]
+    latencies = np.array([seconds for _, seconds in timings]) * 1000
+    by_step = {}
+    for name, seconds in timings:
+        by_step.setdefault(name, []).append(seconds * 1000)
+    summary = {
+        "sessions": sessions,
+        "reruns": len(timings),
+        "errors": [error for _, error in results if error],
+        "wall_s": wall,
+        "throughput_per_s": len(timings) / wall if wall else 0.0,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "steps": {name: float(np.percentile(values, 50)) for name, values in by_step.items()},
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = float(np.percentile(latencies, pct)) if len(latencies) else None
+    return summary
+
+
+def measure_level(sessions, args):
+    """Run one level in a fresh interpreter (for its own peak RSS). Returns its summary."""
+    env = dict(os.environ, EV_GEOCODER=f"file:{args.seed_csv}",
+               PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    command = [sys.executable, "-m", "benchmarks.bench_sessions", "--worker", str(sessions),
+               "--rounds", str(args.rounds), "--timeout", str(args.timeout), "--think-ms", str(args.think_ms),
+               "--seed", str(args.seed)] + (["--cold"] if args.cold else [])
+    result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"{sessions}-session run failed:\n{result.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def _levels(value):
+    return [int(level) for level in value.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test one dashboard worker with concurrent scripted sessions.")
+    parser.add_argument("--sessions", type=_levels, default=list(DEFAULT_SESSIONS),
+                        help="comma-separated numbers of concurrent sessions (default: 1,10,100)")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="times each session walks through the pages")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause after each rerun, as a user reading the page")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S, help="seconds a single rerun may take")
+    parser.add_argument("--cold", action="store_true", help="skip the warm-up session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seed-csv", default=DEFAULT_SEED_CSV, help="local stand-in for the geocoder")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)  # Internal: run one level in this process
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        _refuse_network()
+        _share_app_test_globals()
+        print(json.dumps(run_level(args.worker, args.rounds, args.timeout, args.think_ms / 1000, not args.cold, args.seed)))
+        return 0
+
+    missing = [boundary_path(lod, BOUNDARY_DIR) for lod in LEVELS_OF_DETAIL
+               if not os.path.exists(os.path.join(ROOT, boundary_path(lod, BOUNDARY_DIR)))]
+    if missing:
+        parser.exit(1, f"Missing vendored boundaries {missing}; build them once with python -m ev_insights.boundaries\n")
+
+    print(f"{'sessions':>8}{'reruns':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'reruns/s':>10}{'peak RSS MiB':>14}{'errors':>8}")
+    results = []
+    for sessions in args.sessions:
+        r = measure_level(sessions, args)
+        results.append(r)
+        print(f"{sessions:>8}{r['reruns']:>8}{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['p99_ms']:>10.0f}"
+              f"{r['throughput_per_s']:>10.2f}{r['peak_rss_bytes'] / 2**20:>14.0f}{len(r['errors']):>8}", flush=True)
+    for r in results:
+        for error in r["errors"][:3]:
+            print(f"{r['sessions']} sessions: {error}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rounds": args.rounds, "think_ms": args.think_ms, "levels": results}, f, indent=2)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
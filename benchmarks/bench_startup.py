@@ -0,0 +1,139 @@
+"""Cold-start budget for the dashboard.
+
+Runs app.py's import block in a fresh interpreter under ``python -X importtime``
+and checks two things:
+
+- the summed import time stays under ``--budget-ms``;
+- none of the modules only some pages need (the geo stack, plotly.express)
+  is imported at start-up; they must load where they are used (see
+  ev_insights/lazy.py).
+
+The import block is read from app.py itself, so an import added there is
+measured without touching this script. The exit status is 1 on any
+violation, so the run can gate a deployment:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-ms 800 --repeat 5
+    python -m benchmarks.bench_startup --first-run   # also time the first script run of the default page
+
+Import times are the minimum over ``--repeat`` runs; the OS page cache makes
+the first run of a fresh machine slower than any later one.
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+DEFAULT_BUDGET_MS = 1000
+DEFAULT_REPEAT = 3
+DEFERRED_MODULES = ("geopandas", "shapely", "pyproj", "pyogrio", "fiona", "geopy", "plotly.express")
+TOP_IMPORTS = 12
+
+
+def app_imports(path=APP_PATH):
+    """Source of the module-level import statements of ``path``."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from ``-X importtime`` output, in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2  # Nested imports are indented two spaces per level
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure_imports(source, cwd=ROOT):
+    """(import rows, wall seconds) for running ``source`` in a fresh interpreter."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [cwd, os.environ.get("PYTHONPATH")])))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", source], cwd=cwd, env=env,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import block failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr), wall
+
+
+def measure_first_run(path=APP_PATH, cwd=ROOT):
+    """Seconds from a fresh interpreter to the default page's first script run finishing (Streamlit AppTest)."""
+    source = ("import time; t = time.perf_counter()\n"
+              "from streamlit.testing.v1 import AppTest\n"
+              f"at = AppTest.from_file({path!r}, default_timeout=120); at.run()\n"
+              "assert not at.exception, at.exception\n"
+              "print(time.perf_counter() - t)")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [cwd, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-c", source], cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"first run failed:\n{result.stderr[-2000:]}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the dashboard's cold-start import budget.")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"maximum summed import time of app.py's import block (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--first-run", action="store_true", help="also time the first script run (reported, not budgeted)")
+    parser.add_argument("--app", default=APP_PATH)
+    args = parser.parse_args(argv)
+
+    source = app_imports(args.app)
+    best_rows, best_total, best_wall = None, None, None
+    for _ in range(max(1, args.repeat)):
+        rows, wall = measure_imports(source, os.path.dirname(os.path.abspath(args.app)))
+        total = sum(row[1] for row in rows) / 1000
+        if best_total is None or total < best_total:
+            best_rows, best_total, best_wall = rows, total, wall
+
+    print(f"{'import':<40}{'cumulative ms':>15}")
+    top = sorted((row for row in best_rows if row[3] == 0), key=lambda row: row[2], reverse=True)[:TOP_IMPORTS]
+    for name, _, cumulative_us, _ in top:
+        print(f"{name:<40}{cumulative_us / 1000:>15.1f}")
+    print(f"\nImport block: {best_total:.0f} ms (budget {args.budget_ms:.0f} ms); "
+          f"interpreter start to exit: {best_wall * 1000:.0f} ms")
+
+    failures = []
+    if best_total > args.budget_ms:
+        failures.append(f"import block takes {best_total:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    imported = {row[0] for row in best_rows}
+    for module in DEFERRED_MODULES:
+        if module in imported:
+            chain = _importer_chain(best_rows, module)
+            via = " <- ".join(chain[1:]) if len(chain) > 1 else "app.py"
+            failures.append(f"{module} is imported at start-up (by {via}); import it where it is used")
+
+    if args.first_run:
+        print(f"First run of the default page: {measure_first_run(args.app) * 1000:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+def _importer_chain(rows, module):
+    """The chain of imports that pulled ``module`` in, innermost first."""
+    index = next(i for i, row in enumerate(rows) if row[0] == module)
+    chain, depth = [module], rows[index][3]
+    # importtime prints a module after everything it imported, so its importer is the next shallower row
+    for name, _, _, row_depth in rows[index + 1:]:
+        if row_depth < depth:
+            chain.append(name)
+            depth = row_depth
+            if depth == 0:
+                break
+    return chain
+
+
+if __name__ == "__main__":
+    sys.exit(main())
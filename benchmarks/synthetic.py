@@ -0,0 +1,77 @@
+"""Synthetic copies of the shipped CSVs, scaled up for benchmarking.
+
+``write_synthetic_sources(out_dir, scale)`` writes the five source files
+``ev_insights.data`` expects, with roughly ``scale`` times as many rows as
+the originals: sales and maker rows are replicated under suffixed maker
+names with jittered values, charging-station and vehicle-class rows are
+repeated, and the category time series is resampled onto a proportionally
+denser timeline over the same date span. Generation is seeded, so a given
+scale always produces the same files.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from ev_insights.data import DATA_DIR, SOURCE_FILES, read_csv, sales_year_columns
+
+CHUNK_ROWS = 250_000  # Rows generated and written per batch, to bound generator memory
+
+
+def _replicate(df, scale, label_col=None, value_cols=(), rng=None):
+    """Yield ``scale`` copies of ``df`` in batches; copy i > 0 suffixes ``label_col`` and jitters ``value_cols``."""
+    copies_per_batch = max(1, CHUNK_ROWS // max(len(df), 1))
+    for first in range(0, scale, copies_per_batch):
+        copies = range(first, min(first + copies_per_batch, scale))
+        batch = pd.concat([df] * len(copies), ignore_index=True)
+        copy_ids = np.repeat(np.fromiter(copies, dtype=np.int64), len(df))
+        if label_col is not None:
+            suffix = np.where(copy_ids == 0, "", " #" + copy_ids.astype(str))
+            batch[label_col] = batch[label_col].astype(str).to_numpy(dtype=object) + suffix.astype(object)
+        for col in value_cols:
+            values = pd.to_numeric(batch[col].astype(str).str.replace(",", ""), errors="coerce").fillna(0).to_numpy()
+            jitter = np.where(copy_ids == 0, 1.0, rng.uniform(0.5, 1.5, len(batch)))
+            batch[col] = np.rint(values * jitter).astype(np.int64)
+        yield batch
+
+
+def _write_batches(batches, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, batch in enumerate(batches):
+            batch.to_csv(f, index=False, header=(i == 0))
+
+
+def _category_timeline(evcat_df, scale):
+    """Category series interpolated onto ``scale`` times as many timestamps over the same span."""
+    dates = pd.to_datetime(evcat_df["Date"], errors="coerce", dayfirst=True)
+    evcat_df = evcat_df[dates.notna()].assign(Date=dates[dates.notna()]).set_index("Date").sort_index()
+    evcat_df = evcat_df.apply(pd.to_numeric, errors="coerce").fillna(0)
+    evcat_df = evcat_df.groupby(level=0).sum()
+    if scale == 1:
+        return evcat_df
+    timeline = pd.date_range(evcat_df.index[0], evcat_df.index[-1], periods=len(evcat_df) * scale).floor("min")
+    # Spread each period's count over the finer timestamps so totals stay comparable
+    positions = evcat_df.index.searchsorted(timeline, side="right") - 1
+    values = evcat_df.to_numpy()[positions] / scale
+    return pd.DataFrame(np.rint(values).astype(np.int64), index=timeline, columns=evcat_df.columns).rename_axis("Date")
+
+
+def write_synthetic_sources(out_dir, scale, source_dir=DATA_DIR, seed=0):
+    """Write scaled copies of every source CSV into ``out_dir``. Returns ``out_dir``."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    path = lambda name: os.path.join(out_dir, SOURCE_FILES[name])
+
+    sales = read_csv("sales", source_dir)
+    _write_batches(_replicate(sales, scale, "Maker", sales_year_columns(sales), rng), path("sales"))
+    places = read_csv("maker_places", source_dir)
+    _write_batches(_replicate(places, scale, "EV Maker"), path("maker_places"))
+    pcs = read_csv("pcs", source_dir)
+    _write_batches(_replicate(pcs, scale, value_cols=["No. of Operational PCS"], rng=rng), path("pcs"))
+    vehicle_class = read_csv("vehicle_class", source_dir)
+    _write_batches(_replicate(vehicle_class, scale, "Vehicle Class", ["Total Registration"], rng), path("vehicle_class"))
+
+    timeline = _category_timeline(read_csv("ev_category", source_dir), scale).reset_index()
+    timeline["Date"] = timeline["Date"].dt.strftime("%d/%m/%Y %H:%M")  # Day-first, like the source file
+    _write_batches((timeline.iloc[i:i + CHUNK_ROWS] for i in range(0, len(timeline), CHUNK_ROWS)), path("ev_category"))
+    return out_dir
@@ -0,0 +1,5 @@
+"""Headless data and analytics core behind the India EV Insights dashboard (app.py).
+
+Nothing in this package imports Streamlit or Plotly, so every step can be
+reused and timed outside a Streamlit run (see benchmarks/).
+"""
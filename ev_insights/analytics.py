@@ -0,0 +1,118 @@
+"""Page-level aggregations used by app.py.
+
+The remaining pandas work the dashboard pages did inline (filter option
+lists, the maker location filter, charging stations by state, the growth
+ranking, the sales outlook and the category trend/heatmap slices), as plain functions over the
+snapshot frames. Like the rest of the package this has no Streamlit or
+Plotly imports, so it can be timed and reused outside a Streamlit run (see
+benchmarks/ and the query API in ev_insights.api).
+"""
+import pandas as pd
+
+from ev_insights.states import UNKNOWN_STATE
+from ev_insights.timeseries import DEFAULT_CHART_WIDTH_PX, RESOLUTIONS, choose_resolution, downsample_series, slice_dates, slice_periods
+
+PCS_COLUMN = "No. of Operational PCS"
+
+
+def sorted_options(values, exclude=()):
+    """Sorted distinct non-null values of a column as strings, without ``exclude``."""
+    values = pd.Series(values).dropna().unique()
+    return sorted(str(v) for v in values if v not in exclude)
+
+
+def maker_place_options(maker_places):
+    """(makers, places, states) selectable on the maker location map."""
+    return (sorted_options(maker_places["EV Maker"]),
+            sorted_options(maker_places["Place"]),
+            sorted_options(maker_places["State"], exclude=(UNKNOWN_STATE,)))
+
+
+def filter_maker_places(maker_places, maker=None, place=None, state=None):
+    """Rows matching every given filter; ``None`` means "all". Returns the frame itself when unfiltered."""
+    mask = None
+    for col, value in (("EV Maker", maker), ("Place", place), ("State", state)):
+        if value is None:
+            continue
+        match = maker_places[col] == value
+        mask = match if mask is None else mask & match
+    return maker_places if mask is None else maker_places[mask]
+
+
+def pcs_totals_by_state(pcs):
+    """Operational public charging stations summed per state."""
+    return pcs.groupby("State", observed=True, sort=True)[PCS_COLUMN].sum().reset_index()
+
+
+def growth_ranking(maker_growth, metric, maker=None, limit=15):
+    """Makers ranked by a growth metric (largest first), dropping makers with no or zero growth.
+
+    With ``maker`` only that maker's row is returned, otherwise the top ``limit``.
+    """
+    ranked = maker_growth[["Maker", "First Year", "Start Sales", "Latest Sales", metric]]
+    ranked = ranked[ranked[metric].notna() & (ranked[metric] != 0)]
+    ranked = ranked.sort_values(by=metric, ascending=False)
+    if maker is not None:
+        return ranked[ranked["Maker"] == maker]
+    return ranked.head(limit)
+
+
+def sales_outlook(cube, forecast, model, maker=None):
+    """Actual sales per (Year, Cat) followed by the ``model`` forecast, as Year/Cat/Sales/Kind rows.
+
+    ``forecast`` is the category forecast table, or with ``maker`` the (Cat, Maker)
+    one. Each category's forecast line starts at its last actual year, so the
+    two parts join up when plotted.
+    """
+    actual = cube.aggregate(by=("Year", "Cat"), where={"Maker": maker}).reset_index()
+    actual["Kind"] = "Actual"
+    rows = forecast[forecast["Model"] == model]
+    if maker is not None:
+        rows = rows[rows["Maker"] == maker]
+    future = [col for col in rows.columns if col.isdigit()]
+    projected = rows.melt(id_vars=["Cat"], value_vars=future, var_name="Year", value_name="Sales").dropna(subset=["Sales"])
+    projected = projected.groupby(["Year", "Cat"], observed=True, as_index=False)["Sales"].sum().round()
+    if projected.empty:
+        return actual[actual.groupby("Cat", observed=True)["Sales"].transform("sum") > 0]
+    last_year = actual["Year"].max()
+    bridge = actual[(actual["Year"] == last_year) & actual["Cat"].isin(projected["Cat"])]
+    projected = pd.concat([bridge.drop(columns="Kind"), projected], ignore_index=True)
+    projected["Kind"] = "Forecast"
+    out = pd.concat([actual, projected], ignore_index=True)
+    out = out[out.groupby("Cat", observed=True)["Sales"].transform("sum") > 0]  # Categories the maker never sold in
+    out["Cat"] = out["Cat"].astype(str)
+    out["Year"] = out["Year"].astype(str)
+    return out
+
+
+def forecast_ranking(maker_forecast, model, limit=15):
+    """Makers with the largest ``model`` forecast for the first forecast year, largest first."""
+    rows = maker_forecast[maker_forecast["Model"] == model]
+    year = next(col for col in rows.columns if col.isdigit())
+    future = [col for col in rows.columns if col.isdigit()]
+    return rows[["Maker"] + future].dropna(subset=[year]).nlargest(limit, year).round()
+
+
+def category_sales(cube, where=None):
+    """Sales per vehicle category for the cube filter ``where``, zero-sales categories dropped."""
+    by_cat = cube.aggregate(by=("Cat",), where=where).reset_index()
+    return by_cat[by_cat["Sales"] > 0]
+
+
+def category_heatmap(rollups, start, end, resolution=None, width_px=DEFAULT_CHART_WIDTH_PX):
+    """(all categories over [start, end], resolution key); ``None`` picks the finest roll-up that fits ``width_px``."""
+    resolution = resolution or choose_resolution(rollups, start, end, width_px=width_px)
+    return slice_periods(rollups[resolution], resolution, start, end), resolution
+
+
+def category_trend(rollups, category, start, end, resolution=None, width_px=DEFAULT_CHART_WIDTH_PX):
+    """(one category's series over [start, end], label of what it shows).
+
+    With ``resolution`` the matching roll-up is sliced; without, the native
+    points are LTTB-downsampled when they exceed ``width_px``.
+    """
+    if resolution is None:
+        native = slice_dates(rollups["D"][category], start, end)
+        series = downsample_series(native, width_px=width_px)
+        return series, RESOLUTIONS["D"][1] if len(series) == len(native) else "LTTB-downsampled"
+    return slice_periods(rollups[resolution][category], resolution, start, end), RESOLUTIONS[resolution][1]
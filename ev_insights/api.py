@@ -0,0 +1,381 @@
+"""Local HTTP query service for the dashboard aggregates.
+
+Serves the numbers behind the "EV Sales", "EV Category Trends" and charging
+station views from the same snapshot and the same functions the pages use
+(ev_insights.cube / ev_insights.analytics), without running Streamlit:
+
+    python -m ev_insights.api --port 8765
+    curl 'localhost:8765/v1/top-makers?year=2024&limit=5'
+    curl 'localhost:8765/v1/category-trend?category=TWO%20WHEELER(NT)&start=2023-01-01&resolution=M'
+    curl -H 'Accept: application/vnd.apache.arrow.stream' 'localhost:8765/v1/sales?year=2024' > sales.arrow
+
+``GET /v1`` lists the endpoints and their parameters. Responses are JSON
+(``{"version", "data"}``) or, with ``format=arrow`` or the Arrow stream media
+type in ``Accept``, an Arrow IPC stream. Bodies are gzip-compressed when the
+client accepts it. Every response carries an ETag derived from the data
+version and the normalised query, so a client revalidating with
+``If-None-Match`` gets a 304 without any work done. Encoded bodies sit in a
+size-capped LRU cache until the data version changes, so repeated queries
+cost a dictionary lookup and a socket write.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+
+from ev_insights.analytics import (category_heatmap, category_sales, category_trend, growth_ranking, pcs_totals_by_state,
+                                   sales_outlook)
+from ev_insights.cache import LRUCache
+from ev_insights.cube import share_with_others, top_n
+from ev_insights.data import DATA_DIR
+from ev_insights.datasets import KPI_SUMMARY, load_dataset
+from ev_insights.forecast import DEFAULT_MODEL, MODELS
+from ev_insights.freshness import DataMonitor
+from ev_insights.snapshot import SNAPSHOT_DIR, load_snapshot, watched_paths
+from ev_insights.timeseries import DEFAULT_CHART_WIDTH_PX, RESOLUTIONS
+
+DEFAULT_PORT = 8765
+CACHE_BYTES = 64 * 1024 * 1024
+REFRESH_SECONDS = 1.0  # How often, at most, the data version is rechecked
+MIN_GZIP_BYTES = 512  # Smaller bodies are not worth compressing
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+GROWTH_METRICS = ("Growth %", "CAGR %", "Rolling Growth %")
+
+
+class QueryError(ValueError):
+    """Bad request parameters (HTTP 400)."""
+
+
+class QueryContext:
+    """Datasets of one snapshot version, loaded on first use."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        if name not in self._datasets:
+            with self._lock:
+                if name not in self._datasets:
+                    self._datasets[name] = load_dataset(self.snapshot, name)
+        return self._datasets[name]
+
+
+# ---------- Parameters ----------
+
+def _text(params, name, default=None):
+    value = params.get(name, default)
+    return None if value in (None, "", "All") else value
+
+
+def _int(params, name, default, low=1, high=1000):
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise QueryError(f"'{name}' must be an integer") from None
+    if not low <= value <= high:
+        raise QueryError(f"'{name}' must be between {low} and {high}")
+    return value
+
+
+def _date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        raise QueryError(f"'{name}' must be a date (YYYY-MM-DD)") from None
+
+
+def _choice(params, name, choices, default=None):
+    value = params.get(name, default)
+    if value is not None and value not in choices:
+        raise QueryError(f"'{name}' must be one of {', '.join(choices)}")
+    return value
+
+
+def _cube_filter(ctx, params):
+    return {"Year": _text(params, "year"), "Maker": _text(params, "maker")}
+
+
+def _date_range(ctx, params):
+    start, end = _date(params, "start"), _date(params, "end")
+    dates = ctx["category_rollups"]["D"].index
+    return (start if start is not None else dates[0]), (end if end is not None else dates[-1])
+
+
+def _category(ctx, params):
+    category = params.get("category")
+    columns = list(ctx["category_rollups"]["D"].columns)
+    if category not in columns:
+        raise QueryError(f"'category' must be one of {', '.join(columns)}")
+    return category
+
+
+# ---------- Endpoints ----------
+# Each returns a DataFrame (or, for the KPI summary, a dict) built with the same calls as the matching page
+
+def q_kpis(ctx, params):
+    return ctx[KPI_SUMMARY]
+
+
+def q_sales(ctx, params):
+    return ctx["sales_cube"].rows(_cube_filter(ctx, params)).reset_index(drop=True)
+
+
+def q_sales_by_year(ctx, params):
+    return ctx["sales_cube"].aggregate(by=("Year",), where={"Maker": _text(params, "maker")}).reset_index()
+
+
+def q_market_share(ctx, params):
+    by_maker = ctx["sales_cube"].aggregate(by=("Maker",), where=_cube_filter(ctx, params))
+    return share_with_others(by_maker, top_n=_int(params, "top", 9, high=100))
+
+
+def q_top_makers(ctx, params):
+    by_maker = ctx["sales_cube"].aggregate(by=("Maker",), where=_cube_filter(ctx, params))
+    return top_n(by_maker, _int(params, "limit", 10))
+
+
+def q_category_sales(ctx, params):
+    return category_sales(ctx["sales_cube"], _cube_filter(ctx, params))
+
+
+def q_maker_growth(ctx, params):
+    metric = _choice(params, "metric", GROWTH_METRICS, "Growth %")
+    return growth_ranking(ctx["maker_growth"], metric, maker=_text(params, "maker"), limit=_int(params, "limit", 15))
+
+
+def q_sales_forecast(ctx, params):
+    model = _choice(params, "model", tuple(MODELS), DEFAULT_MODEL)
+    maker = _text(params, "maker")
+    forecast = ctx["sales_forecast"] if maker else ctx["category_forecast"]
+    return sales_outlook(ctx["sales_cube"], forecast, model, maker)
+
+
+def q_pcs_by_state(ctx, params):
+    return pcs_totals_by_state(ctx["pcs"])
+
+
+def q_category_trend(ctx, params):
+    start, end = _date_range(ctx, params)
+    resolution = _choice(params, "resolution", tuple(RESOLUTIONS) + ("auto",), "auto")
+    series, _ = category_trend(ctx["category_rollups"], _category(ctx, params), start, end,
+                               None if resolution == "auto" else resolution,
+                               width_px=_int(params, "width", DEFAULT_CHART_WIDTH_PX, low=10, high=20000))
+    return series.reset_index()
+
+
+def q_category_heatmap(ctx, params):
+    start, end = _date_range(ctx, params)
+    resolution = _choice(params, "resolution", tuple(RESOLUTIONS) + ("auto",), "auto")
+    frame, _ = category_heatmap(ctx["category_rollups"], start, end, None if resolution == "auto" else resolution,
+                                width_px=_int(params, "width", DEFAULT_CHART_WIDTH_PX, low=10, high=20000))
+    return frame.reset_index()
+
+
+# Path -> (handler, parameters, description)
+ENDPOINTS = {
+    "/v1/kpis": (q_kpis, (), "Headline KPI summary"),
+    "/v1/sales": (q_sales, ("year", "maker"), "Sales rows (Year, Maker, Cat, Sales)"),
+    "/v1/sales-by-year": (q_sales_by_year, ("maker",), "Total sales per year"),
+    "/v1/market-share": (q_market_share, ("year", "maker", "top"), "Sales per maker, top N plus Others"),
+    "/v1/top-makers": (q_top_makers, ("year", "maker", "limit"), "Largest makers by sales"),
+    "/v1/category-sales": (q_category_sales, ("year", "maker"), "Sales per vehicle category"),
+    "/v1/maker-growth": (q_maker_growth, ("metric", "maker", "limit"), "Makers ranked by a growth metric"),
+    "/v1/sales-forecast": (q_sales_forecast, ("model", "maker"), "Actual and projected sales per year and category"),
+    "/v1/pcs-by-state": (q_pcs_by_state, (), "Operational public charging stations per state"),
+    "/v1/category-trend": (q_category_trend, ("category", "start", "end", "resolution", "width"),
+                           "One category's registrations over time"),
+    "/v1/category-heatmap": (q_category_heatmap, ("start", "end", "resolution", "width"),
+                             "All categories' registrations over time"),
+}
+
+
+# ---------- Encoding ----------
+
+def encode_json(version, result):
+    data = result.to_dict(orient="records") if isinstance(result, pd.DataFrame) else result
+    return json.dumps({"version": version, "data": data}, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def _json_default(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item"):  # NumPy scalars
+        return value.item()
+    return str(value)
+
+
+def encode_arrow(version, result):
+    import pyarrow as pa
+
+    if not isinstance(result, pd.DataFrame):
+        raise QueryError("this endpoint has no tabular (Arrow) form; use format=json")
+    table = pa.Table.from_pandas(result, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"ev_insights.version": version.encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class Response:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status, headers=None, body=b""):
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+
+
+def _error(status, message):
+    return Response(status, {"Content-Type": "application/json"},
+                    json.dumps({"error": message}).encode("utf-8"))
+
+
+class QueryService:
+    """Answers API requests against the current snapshot; independent of the HTTP layer (see ``respond``)."""
+
+    def __init__(self, snapshot_source, token=None, cache_bytes=CACHE_BYTES, refresh_seconds=REFRESH_SECONDS):
+        self.snapshot_source = snapshot_source  # () -> Snapshot
+        self.token = token  # () -> change token; None serves the first snapshot forever
+        self.refresh_seconds = refresh_seconds
+        self.cache = LRUCache(max_bytes=cache_bytes, sizeof=lambda entry: len(entry[1]))
+        self._context = None
+        self._token = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def context(self):
+        now = time.monotonic()
+        if self._context is not None and (self.token is None or now - self._checked_at < self.refresh_seconds):
+            return self._context
+        with self._lock:
+            token = self.token() if self.token else None
+            if self._context is None or token != self._token:
+                snapshot = self.snapshot_source()
+                if self._context is None or snapshot.version != self._context.version:
+                    self._context = QueryContext(snapshot)
+                    self.cache.clear()  # Entries of the old version can never be hit again
+                self._token = token
+            self._checked_at = now
+        return self._context
+
+    def respond(self, target, headers=None):
+        """Response for a GET of ``target`` (path plus query string); ``headers`` are the request headers."""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        if path in ("/", "/v1"):
+            listing = {p: {"params": list(params), "description": text} for p, (_, params, text) in ENDPOINTS.items()}
+            return Response(200, {"Content-Type": "application/json"}, json.dumps(listing, indent=2).encode("utf-8"))
+        endpoint = ENDPOINTS.get(path)
+        if endpoint is None:
+            return _error(404, f"unknown endpoint {path}; GET /v1 lists them")
+        handler, allowed, _ = endpoint
+        params = dict(parse_qsl(url.query))
+        fmt = params.pop("format", None) or ("arrow" if ARROW_STREAM in headers.get("accept", "") else "json")
+        if fmt not in ("json", "arrow"):
+            return _error(400, "'format' must be json or arrow")
+        unknown = set(params) - set(allowed)
+        if unknown:
+            return _error(400, f"unknown parameter(s) {sorted(unknown)} for {path}; expected {list(allowed)}")
+        use_gzip = "gzip" in headers.get("accept-encoding", "")
+
+        ctx = self.context()
+        query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+        etag = '"' + hashlib.sha1(f"{ctx.version}|{path}|{query}|{fmt}|{use_gzip}".encode("utf-8")).hexdigest()[:24] + '"'
+        base_headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Data-Version": ctx.version, "Vary": "Accept, Accept-Encoding"}
+        if etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+            return Response(304, base_headers)
+
+        key = (ctx.version, path, query, fmt, use_gzip)
+        entry = self.cache.get(key)
+        if entry is None:
+            try:
+                result = handler(ctx, params)
+                body = encode_arrow(ctx.version, result) if fmt == "arrow" else encode_json(ctx.version, result)
+            except QueryError as e:
+                return _error(400, str(e))
+            content_headers = {"Content-Type": ARROW_STREAM if fmt == "arrow" else "application/json"}
+            if use_gzip and len(body) >= MIN_GZIP_BYTES:
+                body = gzip.compress(body, compresslevel=5)
+                content_headers["Content-Encoding"] = "gzip"
+            entry = (content_headers, body)
+            self.cache.put(key, entry)
+        content_headers, body = entry
+        return Response(200, {**base_headers, **content_headers}, body)
+
+
+def serve(service, port=DEFAULT_PORT, host="127.0.0.1"):
+    """Serve ``service`` over HTTP/1.1 (keep-alive) from a thread per connection. Blocks; returns the server on shutdown."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class QueryHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # Headers and body are separate writes; don't let keep-alive wait on delayed ACKs
+
+        def do_GET(self):
+            try:
+                response = service.respond(self.path, dict(self.headers.items()))
+            except Exception as e:  # Keep the connection usable; the message goes to the client
+                response = _error(500, f"{type(e).__name__}: {e}")
+            self.send_response(response.status)
+            for name, value in response.headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(response.body)))
+            self.end_headers()
+            self.wfile.write(response.body)
+
+        def log_message(self, format, *args):
+            pass  # Per-request logging would cost more than answering from the cache
+
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
+
+
+def local_service(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR, dataplane=None, watch=False):
+    """A QueryService over the local snapshot, or attached to a published data plane (ev_insights.dataplane)."""
+    if dataplane:
+        from ev_insights.dataplane import attach, published_paths
+
+        monitor = DataMonitor({"snapshot": lambda: published_paths(dataplane)}, watch=watch)
+        return QueryService(lambda: attach(dataplane), lambda: monitor.token("snapshot"))
+    monitor = DataMonitor({"snapshot": lambda: watched_paths(data_dir, snapshot_dir)}, watch=watch)
+    return QueryService(lambda: load_snapshot(data_dir, snapshot_dir), lambda: monitor.token("snapshot"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the dashboard aggregates as JSON/Arrow over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--dataplane", help="attach to tables published by `python -m ev_insights.dataplane` at this root")
+    parser.add_argument("--watch", action="store_true", help="detect data changes with filesystem events (needs watchdog)")
+    args = parser.parse_args(argv)
+    service = local_service(args.data_dir, args.snapshot_dir, args.dataplane, args.watch)
+    print(f"Serving data version {service.context().version} on http://{args.host}:{args.port}/v1")
+    serve(service, args.port, args.host)
+
+
+if __name__ == "__main__":
+    main()
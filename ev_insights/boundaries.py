@@ -0,0 +1,100 @@
+"""Build-time pipeline and runtime accessor for the state boundary asset.
+
+The dashboard used to download the state GeoJSON from GitHub and simplify it
+with geopandas on every render. This module does that work once:
+
+    python -m ev_insights.boundaries --source <url-or-path> --out data/boundaries
+
+writes one pre-simplified GeoJSON per level of detail. At runtime
+``load_boundaries`` is a plain ``json.load`` - no network, no shapely.
+"""
+import argparse
+import json
+import os
+
+BOUNDARY_SOURCE_URL = "https://raw.githubusercontent.com/Subhash9325/GeoJson-Data-of-Indian-States/master/Indian_States"
+BOUNDARY_DIR = "data/boundaries"
+BOUNDARY_FILE_TEMPLATE = "india_states_{lod}.geojson"
+
+# Simplification tolerance in metres (applied in the local UTM projection)
+LEVELS_OF_DETAIL = {"high": 250, "medium": 1000, "low": 5000}
+DEFAULT_LOD = "medium"
+COORDINATE_DECIMALS = 4  # ~11 m at the equator, well below the coarsest tolerance
+EQUAL_AREA_CRS = "ESRI:102028"  # Asia South Albers Equal Area Conic, for per-state areas
+
+
+def boundary_path(lod=DEFAULT_LOD, directory=BOUNDARY_DIR):
+    if lod not in LEVELS_OF_DETAIL:
+        raise ValueError(f"Unknown level of detail '{lod}'. Expected one of {sorted(LEVELS_OF_DETAIL)}.")
+    return os.path.join(directory, BOUNDARY_FILE_TEMPLATE.format(lod=lod))
+
+
+def load_boundaries(lod=DEFAULT_LOD, directory=BOUNDARY_DIR):
+    """Return the vendored state boundaries as a GeoJSON dict."""
+    with open(boundary_path(lod, directory), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _round_coords(coords, decimals):
+    if isinstance(coords[0], (int, float)):
+        return [round(c, decimals) for c in coords]
+    return [_round_coords(c, decimals) for c in coords]
+
+
+def build_boundaries(source=BOUNDARY_SOURCE_URL, out_dir=BOUNDARY_DIR, levels=LEVELS_OF_DETAIL,
+                     name_field="NAME_1", decimals=COORDINATE_DECIMALS):
+    """Simplify the source polygons once per level of detail and write them to ``out_dir``.
+
+    Only ``name_field`` is kept from the source properties; it is what the
+    choropleth joins on. Each feature also gets ``area_km2``, measured on the
+    unsimplified polygon in an equal-area projection. Returns {lod: path}.
+    """
+    import geopandas as gpd  # Build-time dependency only
+    from shapely import make_valid
+
+    gdf = gpd.read_file(source)
+    if name_field not in gdf.columns:
+        raise KeyError(f"Boundary source has no '{name_field}' property. Columns: {list(gdf.columns)}")
+    gdf = gdf[[name_field, "geometry"]].dropna(subset=["geometry"])
+    gdf = gdf.dissolve(by=name_field, as_index=False)  # One feature per state
+    gdf["geometry"] = make_valid(gdf.geometry.values)
+    areas_km2 = dict(zip(gdf[name_field], (gdf.to_crs(EQUAL_AREA_CRS).area / 1e6).round(1)))
+    projected = gdf.to_crs(gdf.estimate_utm_crs())
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for lod, tolerance in levels.items():
+        simplified = projected.copy()
+        simplified["geometry"] = projected.simplify(tolerance, preserve_topology=True)
+        simplified = simplified.to_crs("EPSG:4326")
+        features = []
+        for name, geom in zip(simplified[name_field], simplified.geometry):
+            if geom is None or geom.is_empty:
+                continue
+            geo = geom.__geo_interface__
+            features.append({
+                "type": "Feature",
+                "properties": {name_field: name, "area_km2": float(areas_km2[name])},
+                "geometry": {"type": geo["type"], "coordinates": _round_coords(geo["coordinates"], decimals)},
+            })
+        path = os.path.join(out_dir, BOUNDARY_FILE_TEMPLATE.format(lod=lod))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        written[lod] = path
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the pre-simplified state boundary files under data/.")
+    parser.add_argument("--source", default=BOUNDARY_SOURCE_URL, help="GeoJSON/shapefile path or URL with state polygons")
+    parser.add_argument("--out", default=BOUNDARY_DIR, help="Output directory")
+    parser.add_argument("--name-field", default="NAME_1", help="Property holding the state name")
+    args = parser.parse_args(argv)
+    for lod, path in build_boundaries(args.source, args.out, name_field=args.name_field).items():
+        print(f"{lod:>6}: {path} ({os.path.getsize(path) / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
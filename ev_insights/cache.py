@@ -0,0 +1,76 @@
+"""Size-capped, thread-safe LRU cache.
+
+Used by the dashboard to keep serialised Plotly figures keyed by
+(page, chart, filter state, data version), shared by every session in the
+worker process.
+"""
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by total payload size (and optionally entry count)."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=None, sizeof=len):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return False  # Larger than the whole cache; not worth evicting everything for
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def get_or_create(self, key, create):
+        """Return the cached value for ``key``, calling ``create()`` and storing its result on a miss.
+
+        Returns ``(value, hit)``.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = create()
+        self.put(key, value)
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
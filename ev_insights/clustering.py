@@ -0,0 +1,75 @@
+"""Server-side clustering for the location maps.
+
+``grid_cluster`` bins points into a regular lon/lat grid whose cell size
+follows the map's zoom level (``cell_degrees``), and returns one row per
+occupied cell: member-weighted centre, point count and the most common
+label. ``cap_points`` picks between raw points and clusters and coarsens the
+grid until the result fits ``max_points``, so the figure payload stays
+bounded however many locations the dataset holds.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+MAX_MAP_POINTS = 4000  # Markers sent to the browser, clustered or not
+TILE_PX = 256  # Web-mercator tile width
+CELL_PX = 48  # Target on-screen size of one cluster cell
+DEFAULT_ZOOM = 5  # ~2 degree cells; India spans about 15 x 15 of them
+
+
+def cell_degrees(zoom, cell_px=CELL_PX):
+    """Grid cell size (degrees of longitude) that spans about ``cell_px`` pixels at ``zoom``."""
+    return 360.0 / (2 ** zoom) * cell_px / TILE_PX
+
+
+def grid_cluster(df, cell_deg, lat_col="Latitude", lon_col="Longitude", label_col=None):
+    """One row per occupied grid cell: Latitude, Longitude (mean of members), Count and, with ``label_col``,
+    the cell's most common label ("Top") and its number of distinct labels ("Distinct")."""
+    lon = df[lon_col].to_numpy(dtype=float)
+    lat = df[lat_col].to_numpy(dtype=float)
+    valid = np.isfinite(lon) & np.isfinite(lat)
+    lon, lat = lon[valid], lat[valid]
+    columns = ["Latitude", "Longitude", "Count"] + (["Top", "Distinct"] if label_col else [])
+    if not len(lon):
+        return pd.DataFrame(columns=columns)
+
+    ix = np.floor((lon + 180.0) / cell_deg).astype(np.int64)
+    iy = np.floor((lat + 90.0) / cell_deg).astype(np.int64)
+    cells, cell_of_point, counts = np.unique(ix * (int(360.0 / cell_deg) + 2) + iy, return_inverse=True, return_counts=True)
+    clusters = pd.DataFrame({
+        "Latitude": np.bincount(cell_of_point, weights=lat) / counts,
+        "Longitude": np.bincount(cell_of_point, weights=lon) / counts,
+        "Count": counts,
+    })
+    if label_col:
+        labels = df[label_col].to_numpy()[valid]
+        label_codes, label_values = pd.factorize(labels, use_na_sentinel=False)
+        # Count each (cell, label) pair once, then keep the largest count per cell
+        pairs, pair_counts = np.unique(cell_of_point * len(label_values) + label_codes, return_counts=True)
+        pair_cell, pair_label = np.divmod(pairs, len(label_values))
+        order = np.lexsort((-pair_counts, pair_cell))
+        first = order[np.r_[True, pair_cell[order][1:] != pair_cell[order][:-1]]]
+        clusters["Top"] = np.asarray(label_values, dtype=object)[pair_label[first]]
+        clusters["Distinct"] = np.bincount(pair_cell, minlength=len(cells))
+    return clusters[columns]
+
+
+def cap_points(df, max_points=MAX_MAP_POINTS, zoom=DEFAULT_ZOOM, mode="auto", label_col=None,
+               lat_col="Latitude", lon_col="Longitude"):
+    """Rows to draw and whether they are clusters: ``(frame, clustered, cell_deg)``.
+
+    ``mode`` is "points" (raw rows, sampled down to ``max_points`` if needed),
+    "clusters", or "auto" (raw rows when they fit, clusters otherwise). Clusters
+    start at the cell size for ``zoom`` and the grid doubles until the count fits.
+    """
+    if mode == "points" or (mode == "auto" and len(df) <= max_points):
+        if len(df) > max_points:
+            df = df.sample(max_points, random_state=0)  # Uniform sample keeps the density picture
+        return df, False, None
+    cell_deg = cell_degrees(zoom)
+    while True:
+        clusters = grid_cluster(df, cell_deg, lat_col, lon_col, label_col)
+        if len(clusters) <= max_points or cell_deg >= 90:
+            return clusters, True, cell_deg
+        cell_deg *= 2 ** math.ceil(math.log(len(clusters) / max_points, 4))  # Cell count falls ~4x per doubling
@@ -0,0 +1,99 @@
+"""Pre-aggregated cube over the long sales table.
+
+``AggregateCube`` groups the measure once by every subset of its dimensions
+(the base cuboid plus all marginal roll-ups) and keeps each as a sorted
+Series. A query such as "sales by Maker for Year 2023" is answered by
+picking the {Year, Maker} cuboid and slicing it by index, never by scanning
+the raw rows, so per-click cost stays flat as dimensions are added.
+"""
+from itertools import combinations
+
+import pandas as pd
+
+SALES_DIMS = ("Year", "Maker", "Cat")
+
+
+class AggregateCube:
+    def __init__(self, df, dims=SALES_DIMS, measure="Sales"):
+        self.dims = tuple(dims)
+        self.measure = measure
+        base = df.groupby(list(self.dims), observed=True, sort=True)[measure].sum()
+        self.cuboids = {frozenset(self.dims): base}
+        # Roll each smaller cuboid up from the base rather than from the raw rows
+        for size in range(len(self.dims) - 1, 0, -1):
+            for combo in combinations(self.dims, size):
+                self.cuboids[frozenset(combo)] = base.groupby(level=list(combo), observed=True, sort=True).sum()
+        self.cuboids[frozenset()] = base.sum()
+        self._members = {dim: sorted(self.cuboids[frozenset([dim])].index.astype(str).unique().tolist())
+                         for dim in self.dims}
+
+    def members(self, dim):
+        """Sorted distinct values of one dimension."""
+        return list(self._members[dim])
+
+    def _slice(self, by, where):
+        unknown = set(by) - set(self.dims) | set(where) - set(self.dims)
+        if unknown:
+            raise KeyError(f"Unknown cube dimension(s): {sorted(unknown)}")
+        dims = [d for d in self.dims if d in where or d in by]
+        cuboid = self.cuboids[frozenset(dims)]
+        if not where:
+            return dims, cuboid
+        levels = [d for d in dims if d in where]
+        key = tuple(where[d] for d in levels)
+        try:
+            if isinstance(cuboid.index, pd.MultiIndex):
+                sliced = cuboid.xs(key, level=levels, drop_level=False)
+            else:
+                sliced = cuboid.loc[[key[0]]]
+        except KeyError:
+            sliced = cuboid.iloc[0:0]
+        return dims, sliced
+
+    def aggregate(self, by=(), where=None):
+        """Sum of the measure grouped by ``by`` after filtering on ``where``.
+
+        ``where`` maps dimension -> value; ``None`` values mean "all". Returns a
+        Series indexed by the ``by`` dimensions (in the order given), or a scalar
+        when ``by`` is empty.
+        """
+        by = tuple(by)
+        where = {d: v for d, v in (where or {}).items() if v is not None}
+        dims, sliced = self._slice(by, where)
+        if not by:
+            return sliced if not where else (sliced.sum() if len(sliced) else 0)
+        drop = [d for d in dims if d not in by]
+        if drop:
+            sliced = sliced.droplevel(drop)
+        if len(by) > 1 and list(sliced.index.names) != list(by):
+            sliced = sliced.reorder_levels(list(by))
+        return sliced
+
+    def rows(self, where=None):
+        """Base-grain rows (one per dimension combination) matching ``where`` as a DataFrame."""
+        where = {d: v for d, v in (where or {}).items() if v is not None}
+        _, sliced = self._slice(self.dims, where)
+        return sliced.reset_index()
+
+
+def build_sales_cube(evsales_melted_df):
+    return AggregateCube(evsales_melted_df, SALES_DIMS, "Sales")
+
+
+def top_n(series, n=10):
+    """Largest ``n`` entries of an aggregate as a two-column frame."""
+    return series.nlargest(n).reset_index()
+
+
+def share_with_others(series, top_n=9, other_label="Others"):
+    """Positive entries sorted by size; beyond ``top_n`` + 1 the tail is folded into ``other_label``."""
+    positive = series[series > 0].sort_values(ascending=False)
+    label = positive.index.name or "key"
+    share = positive.reset_index()
+    share[label] = share[label].astype(str)
+    if len(share) > top_n + 1:
+        share = pd.concat([
+            share.head(top_n),
+            pd.DataFrame([{label: other_label, series.name: share.iloc[top_n:][series.name].sum()}]),
+        ], ignore_index=True)
+    return share
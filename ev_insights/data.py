@@ -0,0 +1,207 @@
+"""Reading and cleaning of the raw CSVs under data/.
+
+These are the cleaning steps that used to live inline in app.py's
+``load_data()``. They return plain pandas frames; ``ev_insights.snapshot``
+persists them so the CSVs are only parsed when their content changes.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from ev_insights.forecast import sales_forecast_tables
+from ev_insights.growth import sales_growth_tables
+from ev_insights.makers import ALIAS_COLUMNS, apply_maker_aliases, build_maker_aliases, extend_maker_aliases
+from ev_insights.states import default_state_index
+
+DATA_DIR = "data"
+
+# Logical dataset name -> source CSV under DATA_DIR
+SOURCE_FILES = {
+    "vehicle_class": "Vehicle Class - All.csv",
+    "sales": "ev_sales_by_makers_and_cat_15-24.csv",
+    "maker_places": "EV Maker by Place.csv",
+    "pcs": "OperationalPC.csv",
+    "ev_category": "ev_cat_01-24.csv",
+}
+
+# Appended drops (see ev_insights.ingest) live next to the sources as data/partitions/<dataset>/<seq>-<hash>.csv
+PARTITION_DIR = "partitions"
+APPENDABLE_DATASETS = ("sales", "ev_category")
+
+def normalize_state_name(name):
+    """Canonical (boundary file) state name for one raw value; see ev_insights.states."""
+    return default_state_index().resolve(name)
+
+
+def normalize_state_column(states, dataset=None, reports=None):
+    """Normalise a whole state column to a categorical of canonical names.
+
+    When ``reports`` is a list, the non-exact matches (see ``StateIndex.normalize``)
+    are appended to it, tagged with ``dataset``.
+    """
+    normalized, report = default_state_index().normalize(states)
+    if reports is not None and not report.empty:
+        reports.append(report.assign(dataset=dataset))
+    return normalized
+
+
+def sales_year_columns(df):
+    return [col for col in df.columns if col.isdigit() and len(col) == 4]
+
+
+def clean_vehicle_class(vehicalclass_df):
+    vehicalclass_df = vehicalclass_df.copy()
+    vehicalclass_df["Total Registration"] = vehicalclass_df["Total Registration"].astype(str).str.replace(",", "").astype(int)
+    return vehicalclass_df
+
+
+def melt_sales(evsales_df_orig):
+    """Wide Cat/Maker/<year> table -> long Cat/Maker/Year/Sales rows."""
+    year_columns = sales_year_columns(evsales_df_orig)
+    evsales_melted_df = evsales_df_orig.melt(id_vars=["Cat", "Maker"],
+                                             value_vars=year_columns,
+                                             var_name="Year", value_name="Sales")
+    evsales_melted_df["Sales"] = pd.to_numeric(evsales_melted_df["Sales"], errors='coerce').fillna(0)
+    evsales_melted_df["Year"] = evsales_melted_df["Year"].astype(str)
+    return evsales_melted_df
+
+
+def add_period_values(table, id_cols, delta):
+    """Add a wide partition (``id_cols`` plus year columns) to a wide table.
+
+    Values for keys already in ``table`` are summed into their year columns;
+    new years are inserted after the last year column and new keys appended,
+    both zero elsewhere. Returns ``(table, rows)`` with ``rows`` the positions
+    of the rows the partition touched, in the partition's row order.
+    """
+    period_cols = sales_year_columns(table)
+    delta_periods = sales_year_columns(delta)
+    keys = pd.MultiIndex.from_frame(table[id_cols].astype(str))
+    first = np.flatnonzero(~keys.duplicated())
+    matched = keys[first].get_indexer(pd.MultiIndex.from_frame(delta[id_cols].astype(str)))
+    is_new = matched < 0
+    rows = np.where(is_new, len(table) + np.cumsum(is_new) - 1, first[np.maximum(matched, 0)])
+
+    out = pd.concat([table, delta.loc[is_new, id_cols]], ignore_index=True) if is_new.any() else table.copy()
+    insert_at = out.columns.get_loc(period_cols[-1]) + 1 if period_cols else len(out.columns)
+    for period in sorted(set(period_cols) | set(delta_periods)):
+        if period in table:
+            column = np.zeros(len(out), dtype=np.result_type(table[period].dtype, delta[period].dtype if period in delta else table[period].dtype))
+            column[:len(table)] = table[period].to_numpy()
+        else:
+            column = np.zeros(len(out), dtype=delta[period].dtype)
+        if period in delta:
+            np.add.at(column, rows, delta[period].to_numpy())
+        if period in out:
+            out[period] = column
+        else:
+            out.insert(insert_at, period, column)
+            insert_at += 1
+    return out, rows
+
+
+def clean_maker_places(ev_market_place_df, reports=None, maker_aliases=None):
+    ev_market_place_df = ev_market_place_df.copy()
+    if maker_aliases is not None:
+        ev_market_place_df['EV Maker'] = apply_maker_aliases(ev_market_place_df['EV Maker'], maker_aliases)
+    ev_market_place_df['State'] = normalize_state_column(ev_market_place_df['State'], "maker_places", reports)
+    return ev_market_place_df
+
+
+def clean_pcs(operationIpc_df, reports=None):
+    operationIpc_df = operationIpc_df.copy()
+    operationIpc_df['State'] = normalize_state_column(operationIpc_df['State'], "pcs", reports)
+    operationIpc_df["No. of Operational PCS"] = pd.to_numeric(operationIpc_df["No. of Operational PCS"], errors='coerce').fillna(0)
+    return operationIpc_df
+
+
+def clean_ev_category(evcat_df):
+    """Category registrations indexed by a sorted DatetimeIndex named 'Date'."""
+    evcat_df = evcat_df.copy()
+    evcat_df["Date"] = pd.to_datetime(evcat_df["Date"], errors='coerce', dayfirst=True)
+    evcat_df = evcat_df.dropna(subset=['Date'])
+    for col in evcat_df.columns:
+        if col != 'Date':
+            evcat_df[col] = pd.to_numeric(evcat_df[col], errors='coerce').fillna(0)
+    # Sorted index -> date ranges are two binary searches (see ev_insights.timeseries.slice_dates)
+    return evcat_df.set_index("Date").sort_index(kind="stable")
+
+
+def clean_sales_partition(df):
+    """A wide Cat/Maker/<year> drop with numeric (comma-free) year columns."""
+    df = df.copy()
+    for col in sales_year_columns(df):
+        df[col] = pd.to_numeric(df[col].astype(str).str.replace(",", ""), errors="coerce").fillna(0)
+    return df[["Cat", "Maker"] + sales_year_columns(df)]
+
+
+def resolve_sales_makers(df, maker_aliases):
+    """A wide Cat/Maker/<year> table with canonical makers (see ev_insights.makers); rows that now share a (Cat, Maker) are summed."""
+    df = df.copy()
+    df["Maker"] = apply_maker_aliases(df["Maker"], maker_aliases).astype(object)
+    years = sales_year_columns(df)
+    df[years] = df[years].apply(pd.to_numeric, errors="coerce")
+    return df.groupby(["Cat", "Maker"], sort=False, as_index=False)[years].sum(min_count=1)
+
+
+def clean_category_partition(df, columns):
+    """A category drop cleaned like the source, with exactly the stored category ``columns`` (missing ones zero)."""
+    return clean_ev_category(df).reindex(columns=columns, fill_value=0)
+
+
+def read_csv(name, data_dir=DATA_DIR):
+    return pd.read_csv(os.path.join(data_dir, SOURCE_FILES[name]))
+
+
+def partition_paths(name, data_dir=DATA_DIR):
+    """Appended partitions of a dataset, in ingestion order."""
+    directory = os.path.join(data_dir, PARTITION_DIR, name)
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".csv")]
+
+
+def read_sources(data_dir=DATA_DIR):
+    """Parse and clean every source CSV. Returns {frame name: DataFrame}.
+
+    ``state_matches`` lists the state names that needed an alias or fuzzy match,
+    or matched nothing, per dataset. ``maker_aliases`` maps every maker name
+    key of the sales and location tables to its canonical maker. Appended
+    partitions are applied in order, producing the same frames
+    ``ev_insights.ingest`` builds incrementally.
+    """
+    raw_sales = read_csv("sales", data_dir)
+    raw_places = read_csv("maker_places", data_dir)
+    raw_parts = [clean_sales_partition(pd.read_csv(path)) for path in partition_paths("sales", data_dir)]
+    maker_aliases = build_maker_aliases(raw_sales["Maker"], reference=raw_places["EV Maker"])
+    for part in raw_parts:
+        maker_aliases = extend_maker_aliases(maker_aliases, part["Maker"])  # Drops only add aliases, as in ingest
+    evsales_df_orig = resolve_sales_makers(raw_sales, maker_aliases)
+    sales_parts = [resolve_sales_makers(part, maker_aliases) for part in raw_parts]
+    evsales_wide = evsales_df_orig
+    for part in sales_parts:
+        evsales_wide, _ = add_period_values(evsales_wide, ["Cat", "Maker"], part)
+    sales_with_growth, maker_growth, category_growth = sales_growth_tables(evsales_wide, sales_year_columns(evsales_wide))
+    sales_forecast, maker_forecast, category_forecast = sales_forecast_tables(evsales_wide, sales_year_columns(evsales_wide))
+    ev_category = clean_ev_category(read_csv("ev_category", data_dir))
+    category_parts = [clean_category_partition(pd.read_csv(path), ev_category.columns)
+                      for path in partition_paths("ev_category", data_dir)]
+    state_reports = []
+    frames = {
+        "vehicle_class": clean_vehicle_class(read_csv("vehicle_class", data_dir)),
+        "sales": sales_with_growth,
+        "sales_melted": pd.concat([melt_sales(df) for df in [evsales_df_orig] + sales_parts], ignore_index=True),
+        "maker_growth": maker_growth,
+        "category_growth": category_growth,
+        "sales_forecast": sales_forecast,
+        "maker_forecast": maker_forecast,
+        "category_forecast": category_forecast,
+        "maker_places": clean_maker_places(raw_places, state_reports, maker_aliases),
+        "pcs": clean_pcs(read_csv("pcs", data_dir), state_reports),
+        "ev_category": pd.concat([ev_category] + category_parts) if category_parts else ev_category,
+    }
+    frames["state_matches"] = (pd.concat(state_reports, ignore_index=True) if state_reports
+                               else pd.DataFrame(columns=["value", "state", "match", "rows", "dataset"]))
+    frames["maker_aliases"] = maker_aliases.astype({col: str for col in ALIAS_COLUMNS})
+    return frames
@@ -0,0 +1,126 @@
+"""Shared-memory data plane for multi-process deployments.
+
+One loader process keeps the snapshot current and publishes each version's
+frames as Arrow IPC files on a tmpfs (``/dev/shm`` by default). App workers
+attach to the published version instead of loading the snapshot
+themselves. The files are memory-mapped and numeric and Arrow-string
+columns convert to pandas without a copy, so every worker maps the same
+physical pages; only categorical key columns (Maker, Cat, State) build a
+per-worker copy of their codes and labels. Per-worker memory therefore
+stays a small fraction of the tables, and workers never parse, hash or
+rebuild anything:
+
+    python -m ev_insights.dataplane                 # loader: publish, then follow changes
+    EV_DATAPLANE=/dev/shm/ev_insights streamlit run app.py   # each worker
+
+The published layout mirrors the snapshot (``manifest.json`` plus one
+directory per version), except that a frame's appended parts are merged
+into one file, since single-chunk columns are what convert zero-copy.
+Publishing a version ends by replacing ``manifest.json``. That is the
+version counter workers watch (ev_insights.freshness): a new manifest
+makes them reattach. Versions still mapped by a worker stay readable after
+they are pruned, because unlinking a mapped file does not free its pages.
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from ev_insights.data import DATA_DIR
+from ev_insights.freshness import DataMonitor
+from ev_insights.snapshot import (MANIFEST_NAME, SNAPSHOT_DIR, SUMMARY_NAME, load_snapshot, load_snapshot_version,
+                                  prune_snapshots, read_manifest, watched_paths, write_json)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "ev_insights")
+POLL_SECONDS = 2.0
+
+
+def publish(snapshot, root=DEFAULT_ROOT):
+    """Copy a persisted snapshot version into ``root`` and make it current. Returns the published manifest."""
+    import pyarrow as pa
+
+    manifest = read_manifest(root)
+    if manifest and manifest.get("version") == snapshot.version:
+        return manifest
+    os.makedirs(root, exist_ok=True)
+    version_dir = os.path.join(root, snapshot.version)
+    if not os.path.isdir(version_dir):
+        tmp_dir = tempfile.mkdtemp(prefix=f".{snapshot.version}-", dir=root)
+        try:
+            for name in snapshot.names:
+                files = [os.path.join(snapshot.path, f) for f in snapshot.files(name)]
+                target = os.path.join(tmp_dir, f"{name}.arrow")
+                if len(files) == 1:
+                    shutil.copyfile(files[0], target)
+                    continue
+                tables = []
+                for path in files:
+                    with pa.memory_map(path, "r") as source:
+                        tables.append(pa.ipc.open_file(source).read_all())
+                table = pa.concat_tables(tables).combine_chunks()
+                with pa.OSFile(target, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            shutil.copyfile(os.path.join(snapshot.path, SUMMARY_NAME), os.path.join(tmp_dir, SUMMARY_NAME))
+            os.rename(tmp_dir, version_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+    manifest = {"version": snapshot.version, "frames": snapshot.names, "published_at": time.time()}
+    write_json(manifest, os.path.join(root, MANIFEST_NAME))
+    prune_snapshots(root, keep=snapshot.version)
+    return manifest
+
+
+def attach(root=DEFAULT_ROOT):
+    """The currently published Snapshot (frames memory-mapped on first access)."""
+    manifest = read_manifest(root)
+    if not manifest:
+        raise FileNotFoundError(f"No data plane published under {root}; start `python -m ev_insights.dataplane`")
+    return load_snapshot_version(root, manifest)
+
+
+def published_paths(root=DEFAULT_ROOT):
+    """What an attached worker watches: the published manifest."""
+    return [os.path.join(root, MANIFEST_NAME)]
+
+
+def serve(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR, root=DEFAULT_ROOT, poll=POLL_SECONDS, watch=False, once=False):
+    """Publish the current snapshot, then republish whenever its inputs change (until interrupted)."""
+    monitor = DataMonitor({"snapshot": lambda: watched_paths(data_dir, snapshot_dir)}, watch=watch)
+    token = None
+    while True:
+        current = monitor.token("snapshot")
+        if current != token:
+            snapshot = load_snapshot(data_dir, snapshot_dir)
+            if snapshot.path is None:
+                raise OSError(f"Snapshot under {snapshot_dir} could not be persisted; nothing to publish")
+            manifest = publish(snapshot, root)
+            logger.info("published %s to %s", manifest["version"], root)
+            token = current
+        if once:
+            return
+        time.sleep(poll)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish the data snapshot to shared memory for app workers.")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"tmpfs directory to publish into (default: {DEFAULT_ROOT})")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between change checks")
+    parser.add_argument("--watch", action="store_true", help="use filesystem events (needs watchdog) instead of polling")
+    parser.add_argument("--once", action="store_true", help="publish the current version and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        serve(args.data_dir, args.snapshot_dir, args.root, args.poll, args.watch, args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
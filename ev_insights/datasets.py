@@ -0,0 +1,37 @@
+"""Lazy dataset registry.
+
+Each dashboard page declares the datasets it needs in ``PAGE_DATASETS``.
+``load_dataset`` resolves one name against a snapshot: stored frames are
+memory-mapped on first access, and derived structures (the sales cube and
+the time-series roll-ups) are assembled from their inputs on demand. A user
+who only opens one page only pays for that page's data.
+"""
+from ev_insights.cube import build_sales_cube
+from ev_insights.timeseries import RESOLUTIONS
+
+# Resolution key -> stored roll-up frame; persisted so appended partitions can extend them (ev_insights.ingest)
+ROLLUP_FRAMES = {key: f"category_rollup_{key}" for key in RESOLUTIONS}
+
+# Derived dataset -> (input datasets, builder)
+DERIVED_DATASETS = {
+    "sales_cube": (("sales_melted",), build_sales_cube),
+    "category_rollups": (tuple(ROLLUP_FRAMES.values()), lambda *frames: dict(zip(ROLLUP_FRAMES, frames))),
+}
+
+KPI_SUMMARY = "kpi_summary"
+
+PAGE_DATASETS = {
+    "Geospatial Insights": ("maker_places", "pcs", "state_matches"),
+    "EV Market Status": ("vehicle_class", "sales_cube"),
+    "EV Sales": ("sales", "sales_cube", "maker_growth", "sales_forecast", "maker_forecast", "category_forecast"),
+    "EV Category Trends": ("ev_category", "category_rollups"),
+}
+
+
+def load_dataset(snapshot, name):
+    if name == KPI_SUMMARY:
+        return snapshot.summary
+    if name in DERIVED_DATASETS:
+        inputs, build = DERIVED_DATASETS[name]
+        return build(*(snapshot[dep] for dep in inputs))
+    return snapshot[name]
@@ -0,0 +1,71 @@
+"""On-demand data exports as CSV, gzip-compressed CSV or Parquet.
+
+The dashboard's download buttons pass a callable instead of a payload, so
+nothing is serialised unless someone clicks. ``export_bytes`` then writes
+the frame in chunks of ``CHUNK_ROWS`` rows (one CSV block or one Parquet row
+group at a time), so the peak extra memory is one chunk's text rather than
+the whole file as a str plus its encoded copy:
+
+    payload = export_bytes(frame, "csv.gz")
+    name = export_file_name("sales_deep_dive_2024_All", "csv.gz")   # "sales_deep_dive_2024_All.csv.gz"
+
+``iter_csv`` yields the same CSV as byte chunks for callers that stream
+straight to a socket or file. Parquet needs pyarrow.
+"""
+import gzip
+import io
+import re
+
+CHUNK_ROWS = 50_000
+
+# Format key -> (label, file extension, MIME type)
+EXPORT_FORMATS = {
+    "csv": ("CSV", ".csv", "text/csv"),
+    "csv.gz": ("Compressed CSV", ".csv.gz", "application/gzip"),
+    "parquet": ("Parquet", ".parquet", "application/vnd.apache.parquet"),
+}
+DEFAULT_EXPORT_FORMAT = "csv"
+
+
+def iter_csv(df, chunk_rows=CHUNK_ROWS):
+    """UTF-8 CSV of ``df`` (header, no index) as byte chunks of at most ``chunk_rows`` rows."""
+    yield df.iloc[0:0].to_csv(index=False).encode("utf-8")
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode("utf-8")
+
+
+def write_export(df, fmt, out, chunk_rows=CHUNK_ROWS):
+    """Write ``df`` in export format ``fmt`` to the binary file object ``out``."""
+    if fmt == "csv":
+        for chunk in iter_csv(df, chunk_rows):
+            out.write(chunk)
+    elif fmt == "csv.gz":
+        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6, mtime=0) as gz:  # mtime=0: same data, same bytes
+            for chunk in iter_csv(df, chunk_rows):
+                gz.write(chunk)
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.Schema.from_pandas(df.iloc[0:0], preserve_index=False)
+        with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+            for start in range(0, max(len(df), 1), chunk_rows):
+                writer.write_table(pa.Table.from_pandas(df.iloc[start:start + chunk_rows], schema=schema, preserve_index=False))
+    else:
+        raise ValueError(f"Unknown export format {fmt!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+
+
+def export_bytes(df, fmt=DEFAULT_EXPORT_FORMAT, chunk_rows=CHUNK_ROWS):
+    """``df`` serialised in export format ``fmt``."""
+    out = io.BytesIO()
+    write_export(df, fmt, out, chunk_rows)
+    return out.getvalue()
+
+
+def export_file_name(base, fmt=DEFAULT_EXPORT_FORMAT):
+    """``base`` made safe as a file name, with the format's extension."""
+    return re.sub(r"[^\w.\-()]+", "_", str(base)).strip("_") + EXPORT_FORMATS[fmt][1]
+
+
+def export_mime(fmt=DEFAULT_EXPORT_FORMAT):
+    return EXPORT_FORMATS[fmt][2]
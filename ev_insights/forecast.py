@@ -0,0 +1,205 @@
+"""Vectorised sales forecasts over an entity x year sales matrix.
+
+Every model fits all rows at once with NumPy, the same way the growth
+metrics are computed (ev_insights.growth): a few array passes per model
+and per year, whatever the number of makers. Each row is fitted from its
+first year with sales on; rows with fewer than ``MIN_HISTORY`` such years
+are not forecast (NaN).
+
+- ``log-linear``: least-squares line through log(1 + sales) over the last
+  ``FIT_WINDOW`` years, so a constant growth rate. The slope is capped at
+  ``MAX_GROWTH_FACTOR`` per year, because a start-up ramp would otherwise
+  extrapolate to absurd volumes.
+- ``holt``: damped additive Holt smoothing with fixed parameters.
+- ``holt-fit``: damped Holt with level/trend smoothing chosen per row from a
+  grid by one-step-ahead error. This costs roughly one ``holt`` run per grid
+  point, so large matrices are split across a process pool.
+
+``sales_forecast_tables`` stacks the (Cat, Maker) rows with the per-maker
+and per-category totals, like ``sales_growth_tables``, and forecasts them
+in one pass per model. The results are stored as snapshot frames, so the
+page only reads them.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from ev_insights.growth import stack_levels
+
+HORIZON = 3  # Years forecast past the latest one
+MIN_HISTORY = 3  # Years from a row's first sale needed to fit a trend
+FIT_WINDOW = 5  # Latest years the log-linear trend is fitted to; earlier growth says little about the next years
+MAX_GROWTH_FACTOR = 2.0  # Cap on the log-linear trend, per year
+HOLT_ALPHA, HOLT_BETA, HOLT_DAMPING = 0.5, 0.3, 0.9
+HOLT_GRID = (0.1, 0.3, 0.5, 0.7, 0.9)  # Candidate alpha and beta values for holt-fit
+PARALLEL_MIN_ROWS = 100_000  # Smaller matrices fit faster than a process pool starts
+
+
+def _history(values):
+    """(index of each row's first year with sales or -1, whether the row has enough history to fit)."""
+    n_periods = values.shape[1]
+    nonzero = values > 0
+    has_sales = nonzero.any(axis=1)
+    first_idx = np.where(has_sales, nonzero.argmax(axis=1), -1)
+    return first_idx, has_sales & (n_periods - first_idx >= MIN_HISTORY)
+
+
+def loglinear_forecast(values, horizon=HORIZON):
+    """rows x horizon forecast from a least-squares line through log(1 + sales)."""
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    n_periods = values.shape[1]
+    first_idx, eligible = _history(values)
+    t = np.arange(n_periods, dtype=float)
+    start = np.maximum(first_idx, n_periods - FIT_WINDOW)
+    weights = ((t >= start[:, None]) & eligible[:, None]).astype(float)
+    y = np.log1p(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = weights.sum(axis=1)
+        mean_t = (weights * t).sum(axis=1) / n
+        mean_y = (weights * y).sum(axis=1) / n
+        dt = t - mean_t[:, None]
+        slope = (weights * dt * (y - mean_y[:, None])).sum(axis=1) / (weights * dt * dt).sum(axis=1)
+    cap = np.log(MAX_GROWTH_FACTOR)
+    slope = np.clip(slope, -cap, cap)
+    future = n_periods - 1 + np.arange(1, horizon + 1)
+    forecast = np.maximum(np.expm1(mean_y[:, None] + slope[:, None] * (future - mean_t[:, None])), 0)
+    forecast[~eligible] = np.nan
+    return forecast
+
+
+def _starts(first_idx, n_periods):
+    """Per period, the rows whose first sale is in it."""
+    return [np.flatnonzero(first_idx == t) for t in range(n_periods)]
+
+
+def _holt_pass(columns, starts, alpha, beta, damping):
+    """(level, trend, sum of squared one-step errors) per row after damped Holt smoothing from its first sale.
+
+    ``columns`` is the periods x rows transpose, so each step reads contiguous
+    memory. Before its first sale a row is all zeros, so level and trend stay
+    zero without masking; at the first sale the level starts at that value.
+    """
+    n_periods, n_rows = columns.shape
+    level, trend, sse = np.zeros(n_rows), np.zeros(n_rows), np.zeros(n_rows)
+    for t in range(n_periods):
+        y = columns[t]
+        trend *= damping
+        predicted = level + trend
+        error = y - predicted
+        level = predicted + alpha * error
+        trend = beta * (level - predicted) + trend  # beta * (new level - old level) + (1 - beta) * damped trend
+        start = starts[t]
+        error[start] = 0
+        level[start] = y[start]
+        trend[start] = 0
+        sse += error * error
+    return level, trend, sse
+
+
+def _holt_extend(level, trend, eligible, horizon, damping):
+    steps = np.cumsum(damping ** np.arange(1, horizon + 1))
+    forecast = np.maximum(level[:, None] + trend[:, None] * steps, 0)
+    forecast[~eligible] = np.nan
+    return forecast
+
+
+def holt_forecast(values, horizon=HORIZON, alpha=HOLT_ALPHA, beta=HOLT_BETA, damping=HOLT_DAMPING):
+    """rows x horizon forecast from damped Holt smoothing with fixed parameters."""
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    first_idx, eligible = _history(values)
+    level, trend, _ = _holt_pass(np.ascontiguousarray(values.T), _starts(first_idx, values.shape[1]), alpha, beta, damping)
+    return _holt_extend(level, trend, eligible, horizon, damping)
+
+
+def holt_fit_forecast(values, horizon=HORIZON, grid=HOLT_GRID, damping=HOLT_DAMPING):
+    """rows x horizon forecast from damped Holt, with (alpha, beta) picked per row by one-step-ahead error."""
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    first_idx, eligible = _history(values)
+    n_rows, starts, columns = len(values), _starts(first_idx, values.shape[1]), np.ascontiguousarray(values.T)
+    best_sse = np.full(n_rows, np.inf)
+    best_level, best_trend = np.zeros(n_rows), np.zeros(n_rows)
+    for alpha in grid:
+        for beta in grid:
+            level, trend, sse = _holt_pass(columns, starts, alpha, beta, damping)
+            better = sse < best_sse
+            best_sse = np.where(better, sse, best_sse)
+            best_level = np.where(better, level, best_level)
+            best_trend = np.where(better, trend, best_trend)
+    return _holt_extend(best_level, best_trend, eligible, horizon, damping)
+
+
+# Model key -> (label, forecast function, worth a process pool on large matrices)
+MODELS = {
+    "log-linear": ("Log-linear trend", loglinear_forecast, False),
+    "holt": ("Damped Holt", holt_forecast, False),
+    "holt-fit": ("Damped Holt (fitted per maker)", holt_fit_forecast, True),
+}
+DEFAULT_MODEL = "holt"
+
+
+def _cpu_count():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))  # CPUs this process may run on, not all of the host's
+    return os.cpu_count() or 1
+
+
+def forecast_matrix(values, model=DEFAULT_MODEL, horizon=HORIZON, workers=None):
+    """rows x horizon forecast of a rows x years matrix.
+
+    ``workers=None`` splits heavy models across a process pool (one worker per
+    CPU) once the matrix has ``PARALLEL_MIN_ROWS`` rows; ``workers=1`` never does.
+    """
+    _, fit, heavy = MODELS[model]
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    _, eligible = _history(values)
+    forecast = np.full((len(values), horizon), np.nan)
+    fitted = values[eligible]  # Rows without enough history stay NaN; no model needs to see them
+    if workers is None:
+        workers = _cpu_count() if heavy and len(fitted) >= PARALLEL_MIN_ROWS else 1
+    if workers <= 1 or len(fitted) < 2 * workers:
+        forecast[eligible] = fit(fitted, horizon)
+        return forecast
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = np.array_split(fitted, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        forecast[eligible] = np.vstack(list(pool.map(fit, chunks, [horizon] * len(chunks))))
+    return forecast
+
+
+def forecast_periods(period_cols, horizon=HORIZON):
+    """Labels of the ``horizon`` years after the last of ``period_cols``."""
+    last = int(period_cols[-1])
+    return [str(last + step) for step in range(1, horizon + 1)]
+
+
+def forecast_frame(df, id_cols, period_cols, models=tuple(MODELS), horizon=HORIZON, workers=None):
+    """One row per (entity, model): the id columns, ``Model`` and one column per forecast year."""
+    values = df[period_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    future = forecast_periods(period_cols, horizon)
+    frames = []
+    for model in models:
+        out = df[id_cols].reset_index(drop=True)
+        out["Model"] = model
+        out[future] = forecast_matrix(values, model, horizon, workers)
+        frames.append(out)
+    return pd.concat(frames, ignore_index=True)
+
+
+def sales_forecast_tables(sales_wide, period_cols, models=tuple(MODELS), horizon=HORIZON, workers=None):
+    """Forecasts per (Cat, Maker) row, per Maker and per Cat from the wide sales table.
+
+    The three levels are stacked by ``growth.stack_levels``, so each model runs once.
+    """
+    stacked, levels = stack_levels(sales_wide, period_cols)
+    table = forecast_frame(stacked, [], period_cols, models, horizon, workers)
+    position = np.tile(np.arange(len(stacked)), len(models))  # forecast_frame repeats the stack once per model
+    value_cols = ["Model"] + forecast_periods(period_cols, horizon)
+
+    def level(frame, start, stop):
+        mask = (position >= start) & (position < stop)
+        keys = frame.drop(columns=period_cols).iloc[position[mask] - start].reset_index(drop=True)
+        return pd.concat([keys, table.loc[mask, value_cols].reset_index(drop=True)], axis=1)
+
+    return tuple(level(*lvl) for lvl in levels)
@@ -0,0 +1,104 @@
+"""Change detection for the files behind cached data.
+
+Caches are keyed on a token that only changes when an input file does,
+instead of expiring on a timer. ``DataMonitor`` groups the inputs by the
+cache they feed (the snapshot, the boundaries, the geocode seed) and hands
+out a token per group:
+
+- by default the token is the group's stat signature (path, size, mtime):
+  a handful of ``os.stat`` calls per rerun, and no file is read;
+- with ``watch=True`` and the optional ``watchdog`` package, a filesystem
+  observer (inotify on Linux) bumps a per-group counter as soon as a file
+  changes, and the token costs nothing to compute.
+
+A new token only means "look again": the snapshot still compares content
+hashes before it rebuilds (see ``ev_insights.snapshot.hash_sources``), so
+touching a file without changing it does not trigger a reparse.
+
+    monitor = DataMonitor({"snapshot": lambda: watched_paths()})
+    get_snapshot(monitor.token("snapshot"))   # cached until an input changes
+"""
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def stat_signature(paths):
+    """(path, size, mtime_ns) per path; missing paths are (path, None, None)."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append((path, None, None))
+        else:
+            signature.append((path, st.st_size, st.st_mtime_ns))
+    return tuple(signature)
+
+
+class DataMonitor:
+    """Per-group change tokens for cache keys; see the module docstring."""
+
+    def __init__(self, groups, watch=False):
+        self.groups = dict(groups)  # Group name -> callable returning the paths the group depends on
+        self._generations = dict.fromkeys(self.groups, 0)
+        self._lock = threading.Lock()
+        self._observer = self._start_observer() if watch else None
+
+    @property
+    def watching(self):
+        return self._observer is not None
+
+    def token(self, group):
+        if self._observer is not None:
+            return ("watch", self._generations[group])
+        return stat_signature(self.groups[group]())
+
+    def changed(self, path):
+        """Bump every group that depends on ``path`` (or on the directory holding it)."""
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        for group, paths in self.groups.items():
+            watched = {os.path.abspath(p) for p in paths()}
+            if path in watched or parent in watched:
+                with self._lock:
+                    self._generations[group] += 1
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.warning("watchdog is not installed; falling back to stat checks")
+            return None
+
+        monitor = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    if path:
+                        monitor.changed(os.fsdecode(path))
+
+        # Watch the nearest existing ancestor of every input, so files and directories created later are seen too
+        roots = set()
+        for paths in self.groups.values():
+            for path in paths():
+                directory = os.path.dirname(os.path.abspath(path))
+                while not os.path.isdir(directory):
+                    directory = os.path.dirname(directory)
+                roots.add(directory)
+        observer = Observer()
+        for root in sorted(roots):
+            if not any(root.startswith(other + os.sep) for other in roots):
+                observer.schedule(Handler(), root, recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
@@ -0,0 +1,373 @@
+"""Persistent place -> coordinate store for the EV maker map.
+
+The store is a small SQLite table keyed on the normalised place name. It is
+seeded from ``data/EV_Maker_with_Location.csv`` so the shipped makers never
+hit the network; only places missing from the table are sent to a geocoding
+backend, and whatever the backend finds is written back for the next session.
+
+Misses go through ``BatchGeocoder``: a token-bucket rate limiter shared by a
+bounded thread pool, with exponential backoff on transient errors. Backends
+declare their own rate and concurrency limits - Nominatim allows one request
+per second on one connection, while ``FileBackend`` answers offline from a
+local CSV as fast as the pool can ask. Lookups from the app make one short
+attempt per place and remember failures for a while, so an unreachable
+service does not stall every rerun; bulk refreshes, with retries, run from
+the CLI:
+
+    python -m ev_insights.geocode refresh places.csv --column Place
+    python -m ev_insights.geocode refresh places.csv --backend file:data/EV_Maker_with_Location.csv
+"""
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+SQLITE_MAX_PARAMS = 900  # Stay under SQLite's default bound-parameter limit
+DEFAULT_STORE_PATH = os.path.join("data", "geocode_store.sqlite")
+DEFAULT_SEED_CSV = os.path.join("data", "EV_Maker_with_Location.csv")
+INTERACTIVE_TIMEOUT_S = 3  # Per request, for lookups made while a page renders
+FAILED_COOLDOWN_S = 24 * 3600  # Places nobody could resolve are not sent to the backend again for this long
+
+
+def place_key(place):
+    """Normalise a place name so 'Pune ', 'pune' and 'PUNE' share one row."""
+    return " ".join(str(place).split()).casefold()
+
+
+class TransientGeocodeError(Exception):
+    """A backend failure worth retrying (timeout, rate limit, service unavailable)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after  # Seconds the service asked us to wait, if it said
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class NominatimBackend:
+    """Geocodes place names against OpenStreetMap's Nominatim service.
+
+    One geopy client (and so one pooled HTTP session) is reused for every
+    request. Nominatim's usage policy allows one request per second from a
+    single connection, which is what ``rate`` and ``max_concurrency`` declare.
+    """
+
+    rate = 1.0
+    max_concurrency = 1
+
+    def __init__(self, user_agent="india_ev_insights_dashboard", timeout=10, country="India", domain=None):
+        from geopy.geocoders import Nominatim  # Only needed when a place misses the store
+        kwargs = {"user_agent": user_agent, "timeout": timeout}
+        if domain:
+            kwargs["domain"] = domain  # Self-hosted Nominatim instances have their own limits
+        try:
+            from functools import partial
+            from geopy.adapters import RequestsAdapter
+            kwargs["adapter_factory"] = partial(RequestsAdapter, pool_connections=1, pool_maxsize=4)
+        except ImportError:
+            pass  # geopy falls back to urllib
+        self.geolocator = Nominatim(**kwargs)
+        self.country = country
+
+    def geocode(self, place):
+        from geopy.exc import GeocoderRateLimited, GeocoderServiceError, GeocoderTimedOut, GeocoderUnavailable
+        try:
+            location = self.geolocator.geocode(f"{place}, {self.country}")
+        except GeocoderRateLimited as e:
+            raise TransientGeocodeError(str(e), retry_after=e.retry_after) from e
+        except (GeocoderTimedOut, GeocoderUnavailable) as e:
+            raise TransientGeocodeError(str(e)) from e
+        except GeocoderServiceError:
+            return None  # Permanent for this query (bad request, no permission, ...)
+        if location is None:
+            return None
+        return location.latitude, location.longitude
+
+
+class FileBackend:
+    """Offline backend answering from a local CSV of place/latitude/longitude rows."""
+
+    rate = None  # No remote service to protect
+    max_concurrency = 8
+
+    def __init__(self, path, place_col="Place", lat_col="Latitude", lon_col="Longitude"):
+        self.path = path
+        self.coords = {}
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for record in csv.DictReader(f):
+                try:
+                    coords = float(record[lat_col]), float(record[lon_col])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                place = (record.get(place_col) or "").strip()
+                if place:
+                    self.coords.setdefault(place_key(place), coords)
+
+    def geocode(self, place):
+        return self.coords.get(place_key(place))
+
+
+def make_backend(spec, timeout=None):
+    """Backend from a short spec: 'none', 'nominatim', 'nominatim:<domain>' or 'file:<path>'."""
+    name, _, arg = (spec or "none").partition(":")
+    if name == "none":
+        return None
+    if name == "nominatim":
+        return NominatimBackend(domain=arg or None, **({"timeout": timeout} if timeout else {}))
+    if name == "file":
+        return FileBackend(arg or DEFAULT_SEED_CSV)
+    raise ValueError(f"Unknown geocoder backend {spec!r} (expected none, nominatim[:domain] or file:<path>)")
+
+
+class BatchGeocoder:
+    """Geocodes many places through one backend with rate limiting, bounded concurrency and retries."""
+
+    def __init__(self, backend, max_workers=None, rate=None, retries=4, backoff=1.0, max_backoff=60.0):
+        self.backend = backend
+        limit = getattr(backend, "max_concurrency", 1)
+        self.max_workers = max(1, min(max_workers or limit, limit))
+        rate = rate if rate is not None else getattr(backend, "rate", None)
+        self.bucket = TokenBucket(rate, capacity=self.max_workers) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def geocode(self, place):
+        """One place with retries: (lat, lon) or None. Raises TransientGeocodeError once the retries run out."""
+        for attempt in range(self.retries + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            try:
+                return self.backend.geocode(place)
+            except TransientGeocodeError as e:
+                if attempt == self.retries:
+                    raise
+                if e.retry_after:
+                    delay = e.retry_after
+                else:
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)  # Jitter spreads out workers
+                time.sleep(delay)
+
+    def _attempt(self, place):
+        try:
+            return self.geocode(place), False
+        except TransientGeocodeError:
+            return None, True
+
+    def geocode_many(self, places, on_result=None):
+        """Yield ``(place, coords, failed)`` as results arrive.
+
+        ``coords`` is None both for places the backend does not know and for ones
+        that kept failing (``failed=True``). ``on_result(done, total)`` runs in the
+        calling thread, so it may update UI elements.
+        """
+        places = list(places)
+        if self.max_workers == 1:
+            results = ((place, self._attempt(place)) for place in places)
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="geocode")
+            futures = {pool.submit(self._attempt, place): place for place in places}
+            results = ((futures[future], future.result()) for future in as_completed(futures))
+        try:
+            for idx, (place, (coords, failed)) in enumerate(results):
+                if on_result is not None:
+                    on_result(idx + 1, len(places))
+                yield place, coords, failed
+        finally:
+            if self.max_workers > 1:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+
+class GeocodeStore:
+    """Indexed place -> (latitude, longitude) table with write-back on misses.
+
+    A bare ``backend`` gets one attempt per place, for lookups made while a
+    page renders; pass a ``BatchGeocoder`` to retry with backoff (the CLI
+    refresh does). Places that fail either way are skipped for
+    ``failed_cooldown`` seconds.
+    """
+
+    def __init__(self, path, seed_csv=None, backend=None, flush_every=100, failed_cooldown=FAILED_COOLDOWN_S):
+        self.path = path
+        self.backend = backend
+        self.geocoder = backend if isinstance(backend, BatchGeocoder) or backend is None else BatchGeocoder(backend, retries=0)
+        self.flush_every = flush_every  # Long refreshes persist progress in batches of this many places
+        self.failed_cooldown = failed_cooldown
+        self._failed = {}  # place key -> time.monotonic() of its last failed lookup
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS places (
+                key TEXT PRIMARY KEY,
+                place TEXT NOT NULL,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                source TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        if seed_csv and os.path.exists(seed_csv):
+            self.seed_from_csv(seed_csv)
+
+    def seed_from_csv(self, csv_path, place_col="Place", lat_col="Latitude", lon_col="Longitude"):
+        """Load coordinates from a CSV; skipped when the file is unchanged since the last seed."""
+        stat = os.stat(csv_path)
+        signature = f"{stat.st_size}:{stat.st_mtime_ns}"
+        meta_name = f"seed:{os.path.abspath(csv_path)}"
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (meta_name,)).fetchone()
+            if row and row[0] == signature:
+                return 0
+
+        rows = {}
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            for record in csv.DictReader(f):
+                place = (record.get(place_col) or "").strip()
+                try:
+                    lat, lon = float(record[lat_col]), float(record[lon_col])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if place:
+                    rows[place_key(place)] = (place, lat, lon)
+
+        now = time.time()
+        with self._lock, self._conn:
+            # A changed seed corrects earlier seed rows; geocoded and manual coordinates are kept
+            self._conn.executemany(
+                """INSERT INTO places VALUES (?, ?, ?, ?, 'seed', ?)
+                   ON CONFLICT(key) DO UPDATE SET place = excluded.place, latitude = excluded.latitude,
+                       longitude = excluded.longitude, updated_at = excluded.updated_at
+                   WHERE places.source = 'seed'""",
+                [(key, place, lat, lon, now) for key, (place, lat, lon) in rows.items()],
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (meta_name, signature))
+        return len(rows)
+
+    def get_many(self, places):
+        """Return {place: (lat, lon)} for the places already in the store."""
+        by_key = {}
+        for place in places:
+            by_key.setdefault(place_key(place), []).append(place)
+        keys = list(by_key)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+                chunk = keys[start:start + SQLITE_MAX_PARAMS]
+                marks = ",".join("?" * len(chunk))
+                query = f"SELECT key, latitude, longitude FROM places WHERE key IN ({marks})"
+                for key, lat, lon in self._conn.execute(query, chunk):
+                    for place in by_key[key]:
+                        found[place] = (lat, lon)
+        return found
+
+    def put_many(self, coords, source="backend"):
+        """Write resolved {place: (lat, lon)} pairs back to the store."""
+        now = time.time()
+        rows = [(place_key(p), str(p).strip(), lat, lon, source, now) for p, (lat, lon) in coords.items()]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def _cooling_down(self, place):
+        failed_at = self._failed.get(place_key(place))
+        return failed_at is not None and time.monotonic() - failed_at < self.failed_cooldown
+
+    def lookup(self, places, on_progress=None, refresh=False):
+        """Resolve places, geocoding only store misses (every place with ``refresh=True``).
+
+        Returns {place: (lat, lon)} with ``(None, None)`` for places nobody could
+        resolve. ``on_progress(done, total)`` is called once per backend result.
+        """
+        places = list(dict.fromkeys(p for p in places if p is not None and str(p).strip()))
+        coords = {} if refresh else self.get_many(places)
+        misses = [p for p in places if p not in coords and (refresh or not self._cooling_down(p))]
+        if misses and self.geocoder is not None:
+            pending = {}
+            for place, result, _ in self.geocoder.geocode_many(misses, on_progress):
+                if result is None:  # Unknown to the backend, or it kept failing
+                    self._failed[place_key(place)] = time.monotonic()
+                    continue
+                pending[place] = result
+                coords[place] = result
+                if len(pending) >= self.flush_every:
+                    self.put_many(pending)
+                    pending = {}
+            if pending:
+                self.put_many(pending)
+        if refresh:
+            found = self.get_many([p for p in places if p not in coords])  # Keep old coordinates for failed refreshes
+            coords.update(found)
+        return {p: coords.get(p, (None, None)) for p in places}
+
+
+def read_places(csv_path, column="Place"):
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        return [row[column].strip() for row in csv.DictReader(f) if (row.get(column) or "").strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local geocode store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    refresh = commands.add_parser("refresh", help="geocode every place in a CSV column into the store")
+    refresh.add_argument("csv", help="CSV file with a column of place names or addresses")
+    refresh.add_argument("--column", default="Place")
+    refresh.add_argument("--store", default=DEFAULT_STORE_PATH)
+    refresh.add_argument("--backend", default="nominatim", help="nominatim, nominatim:<domain> or file:<path>")
+    refresh.add_argument("--workers", type=int, help="concurrent requests (capped by the backend)")
+    refresh.add_argument("--rate", type=float, help="requests per second (default: the backend's limit)")
+    refresh.add_argument("--all", action="store_true", help="re-geocode places already in the store")
+    args = parser.parse_args(argv)
+
+    places = list(dict.fromkeys(read_places(args.csv, args.column)))
+    try:
+        backend = make_backend(args.backend)
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    if backend is None:
+        parser.error("refresh needs a backend other than 'none'")
+    geocoder = BatchGeocoder(backend, max_workers=args.workers, rate=args.rate)
+    store = GeocodeStore(args.store, backend=geocoder)
+    started = time.perf_counter()
+
+    def report(done, total):
+        if done == total or done % 50 == 0:
+            print(f"  {done}/{total} geocoded ({time.perf_counter() - started:.0f}s)")
+
+    coords = store.lookup(places, on_progress=report, refresh=args.all)
+    resolved = sum(1 for lat, _ in coords.values() if lat is not None)
+    print(f"{resolved}/{len(places)} places resolved in {time.perf_counter() - started:.1f}s; store: {args.store}")
+
+
+if __name__ == "__main__":
+    main()
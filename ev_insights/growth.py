@@ -0,0 +1,139 @@
+"""Vectorised growth metrics over an entity x period sales matrix.
+
+Every metric is computed with NumPy over the whole matrix at once, so the
+cost is a handful of array passes no matter how many makers (or how many
+monthly periods) there are. Undefined growth - a zero or missing base - is
+NaN rather than a placeholder value.
+"""
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOW = 3  # Periods compared in the rolling growth metric
+
+METRIC_COLUMNS = ["First Year", "Start Sales", "Latest Sales", "Period Growth %",
+                  "Growth %", "CAGR %", "Rolling Growth %"]
+
+
+def _safe_ratio(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def yoy_growth(values):
+    """Period-over-period growth in %, NaN where the previous period is zero or missing."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] > 1:
+        out[:, 1:] = (_safe_ratio(values[:, 1:], values[:, :-1]) - 1) * 100
+    return out
+
+
+def growth_matrix(values, periods_per_year=1, window=ROLLING_WINDOW):
+    """Compute growth metrics for every row of a rows x periods array.
+
+    Returns a dict of 1-D arrays keyed like METRIC_COLUMNS (``First Year`` holds
+    the column index of the first non-zero period, -1 when there is none) plus a
+    ``YoY %`` rows x periods array.
+    """
+    values = np.asarray(values, dtype=float)
+    n_rows, n_periods = values.shape
+    rows = np.arange(n_rows)
+
+    nonzero = np.nan_to_num(values) > 0
+    has_sales = nonzero.any(axis=1)
+    first_idx = np.where(has_sales, nonzero.argmax(axis=1), -1)
+    start = np.where(has_sales, values[rows, np.maximum(first_idx, 0)], np.nan)
+    latest = values[:, -1] if n_periods else np.full(n_rows, np.nan)
+    earliest = values[:, 0] if n_periods else np.full(n_rows, np.nan)
+
+    # Years between the first non-zero period and the latest one; growth needs at least one step
+    span = np.where(has_sales, (n_periods - 1 - first_idx) / periods_per_year, np.nan)
+    ratio = np.where(span > 0, _safe_ratio(latest, start), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = (np.power(ratio, 1 / np.where(span > 0, span, np.nan)) - 1) * 100
+
+    if n_periods >= 2 * window:
+        recent = np.nansum(values[:, -window:], axis=1)
+        previous = np.nansum(values[:, -2 * window:-window], axis=1)
+        rolling = (_safe_ratio(recent, previous) - 1) * 100
+    else:
+        rolling = np.full(n_rows, np.nan)
+
+    return {
+        "First Year": first_idx,
+        "Start Sales": start,
+        "Latest Sales": latest,
+        "Period Growth %": (_safe_ratio(latest, earliest) - 1) * 100,
+        "Growth %": (ratio - 1) * 100,
+        "CAGR %": cagr,
+        "Rolling Growth %": rolling,
+        "YoY %": yoy_growth(values),
+    }
+
+
+def growth_frame(df, id_cols, period_cols, periods_per_year=1, window=ROLLING_WINDOW):
+    """Growth metrics for a wide frame with one row per entity and one column per period."""
+    values = df[period_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    metrics = growth_matrix(values, periods_per_year, window)
+
+    out = df[id_cols].reset_index(drop=True)
+    period_labels = np.asarray(period_cols, dtype=object)
+    first_idx = metrics.pop("First Year")
+    out["First Year"] = pd.Series(np.where(first_idx >= 0, period_labels[np.maximum(first_idx, 0)], None), dtype=object)
+    yoy = metrics.pop("YoY %")
+    for name, column in metrics.items():
+        out[name] = column
+    yoy_df = pd.DataFrame(yoy[:, 1:], columns=[f"{p} YoY %" for p in period_cols[1:]])
+    return pd.concat([out, yoy_df], axis=1)
+
+
+def stack_levels(sales_wide, period_cols):
+    """The wide sales table's (Cat, Maker) rows, per-Maker and per-Cat totals, stacked.
+
+    Returns ``(stacked, levels)``: ``stacked`` holds the numeric ``period_cols``
+    of all three levels one after another, so a metric or model runs over them
+    in one pass; ``levels`` is ``[(frame, start, stop)]`` for rows, makers and
+    categories, each frame holding that level's keys and period columns and
+    ``stacked.iloc[start:stop]`` its values.
+    """
+    numeric = sales_wide[["Cat", "Maker"]].copy()
+    numeric[period_cols] = sales_wide[period_cols].apply(pd.to_numeric, errors="coerce")
+    by_maker = numeric.groupby("Maker", observed=True, sort=True)[period_cols].sum(min_count=1).reset_index()
+    by_cat = numeric.groupby("Cat", observed=True, sort=True)[period_cols].sum(min_count=1).reset_index()
+
+    stacked = pd.concat([numeric[period_cols], by_maker[period_cols], by_cat[period_cols]], ignore_index=True)
+    n_rows, n_makers = len(numeric), len(by_maker)
+    levels = [(numeric, 0, n_rows), (by_maker, n_rows, n_rows + n_makers), (by_cat, n_rows + n_makers, len(stacked))]
+    return stacked, levels
+
+
+def sales_growth_tables(sales_wide, period_cols, periods_per_year=1, window=ROLLING_WINDOW):
+    """Growth per (Cat, Maker) row, per Maker and per Cat from the wide sales table (see ``stack_levels``)."""
+    stacked, levels = stack_levels(sales_wide, period_cols)
+    table = growth_frame(stacked, [], period_cols, periods_per_year, window)
+    metric_cols = list(table.columns)
+
+    frames = [sales_wide.reset_index(drop=True)] + [frame for frame, _, _ in levels[1:]]  # Rows keep their raw values
+    return tuple(pd.concat([frame, table.iloc[start:stop][metric_cols].reset_index(drop=True)], axis=1)
+                 for frame, (_, start, stop) in zip(frames, levels))
+
+
+def update_growth_table(table, id_cols, delta, periods_per_year=1, window=ROLLING_WINDOW):
+    """Apply a wide partition to a growth table (id columns, year columns, metrics) as built above.
+
+    Only the rows the partition touches get their metrics recomputed - unless
+    it opens a new year, which moves every row's latest period.
+    """
+    from ev_insights.data import add_period_values, sales_year_columns
+
+    period_cols = sales_year_columns(table)
+    values, rows = add_period_values(table[id_cols + period_cols], id_cols, delta)
+    new_period_cols = sales_year_columns(values)
+    if new_period_cols != period_cols:
+        metrics = growth_frame(values, [], new_period_cols, periods_per_year, window)
+    else:
+        metrics = table.drop(columns=id_cols + period_cols).reindex(range(len(values)))
+        metrics = metrics.astype({"First Year": object})
+        fresh = growth_frame(values.iloc[rows], [], period_cols, periods_per_year, window)
+        metrics.iloc[rows] = fresh[metrics.columns].to_numpy()
+    return pd.concat([values, metrics], axis=1)
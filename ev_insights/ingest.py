@@ -0,0 +1,248 @@
+"""Append-only ingestion of new sales and category-registration drops.
+
+A drop is a CSV shaped like its source - wide Cat/Maker/<year> sales, or
+dated category registrations - holding only the new data. ``ingest`` checks
+and cleans just that partition, keeps a copy under data/partitions/ (so a
+full rebuild from the sources reproduces the result) and writes a new
+snapshot version next to the current one:
+
+- ``sales_melted``, ``ev_category`` and the daily roll-up get the partition
+  as an extra Arrow part; their stored files are hard-linked, not rewritten,
+- new maker spellings extend the stored maker alias map, and the drop's
+  makers are resolved through it,
+- the growth tables recompute only the makers and categories the drop
+  touches, and the weekly/monthly roll-ups only their last stored period,
+- the sales forecasts are refitted in one vectorised pass,
+- the KPI summary is updated from the partition's own totals.
+
+Switching the manifest to the new version is the single atomic step; the
+app's caches are keyed by that version. Cost follows the size of the drop,
+not of the history (the per-entity growth and roll-up tables are rewritten,
+but they have one row per maker or period, not per record).
+
+    python -m ev_insights.ingest sales data/drops/sales_2025_01.csv
+    python -m ev_insights.ingest ev_category data/drops/ev_cat_2024_09.csv
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from ev_insights.data import (APPENDABLE_DATASETS, DATA_DIR, PARTITION_DIR, clean_category_partition,
+                              clean_sales_partition, melt_sales, partition_paths, resolve_sales_makers,
+                              sales_year_columns)
+from ev_insights.datasets import ROLLUP_FRAMES
+from ev_insights.forecast import sales_forecast_tables
+from ev_insights.growth import update_growth_table
+from ev_insights.kpis import update_kpis
+from ev_insights.makers import extend_maker_aliases
+from ev_insights.snapshot import (SNAPSHOT_DIR, SNAPSHOT_FORMAT, SUMMARY_NAME, file_sha256, load_snapshot,
+                                  load_snapshot_version, partition_key, read_manifest, read_schema, snapshot_version,
+                                  stat_record, watermarks, with_categoricals, write_frame, write_json, write_manifest)
+from ev_insights.timeseries import append_rollups, build_rollups
+
+
+class IngestError(ValueError):
+    """The partition was rejected; nothing was written."""
+
+
+def _check_numeric(raw, columns):
+    """Problems with the value columns of a raw drop: unparseable or negative numbers."""
+    problems = []
+    for col in columns:
+        text = raw[col].astype(str).str.replace(",", "").str.strip()
+        values = pd.to_numeric(text, errors="coerce")
+        bad = values.isna() & raw[col].notna() & (text != "")
+        if bad.any():
+            problems.append(f"{bad.sum()} non-numeric value(s) in '{col}'")
+        if (values < 0).any():
+            problems.append(f"{(values < 0).sum()} negative value(s) in '{col}'")
+    return problems
+
+
+def validate_sales_partition(raw, latest_year):
+    """Clean a wide sales drop, or raise IngestError.
+
+    Years before the latest stored one are closed; a drop may add to the
+    latest year (monthly totals accumulate) or open later years.
+    """
+    years = sales_year_columns(raw)
+    problems = []
+    missing = [col for col in ("Cat", "Maker") if col not in raw.columns]
+    if missing:
+        problems.append(f"missing column(s) {missing}")
+    if not years:
+        problems.append("no year columns")
+    extra = [col for col in raw.columns if col not in ("Cat", "Maker") and col not in years]
+    if extra:
+        problems.append(f"unexpected column(s) {extra}")
+    closed = [year for year in years if year < latest_year]
+    if closed:
+        problems.append(f"year(s) {closed} are before the latest stored year {latest_year}")
+    if not missing:
+        if raw[["Cat", "Maker"]].isna().any(axis=None):
+            problems.append("rows without Cat or Maker")
+        duplicates = raw.duplicated(["Cat", "Maker"]).sum()
+        if duplicates:
+            problems.append(f"{duplicates} duplicate Cat/Maker row(s)")
+    problems += _check_numeric(raw, years)
+    if problems:
+        raise IngestError("; ".join(problems))
+    return clean_sales_partition(raw)
+
+
+def validate_category_partition(raw, columns, last_date):
+    """Clean a category-registration drop against the stored ``columns``, or raise IngestError.
+
+    Every row needs a date after ``last_date``; stored categories missing from
+    the drop are zero, categories the store does not know are rejected.
+    """
+    problems = []
+    if "Date" not in raw.columns:
+        raise IngestError("missing column 'Date'")
+    extra = [col for col in raw.columns if col != "Date" and col not in columns]
+    if extra:
+        problems.append(f"unknown categor(ies) {extra}")
+    problems += _check_numeric(raw, [col for col in raw.columns if col != "Date"])
+    dates = pd.to_datetime(raw["Date"], errors="coerce", dayfirst=True)
+    if dates.isna().any():
+        problems.append(f"{dates.isna().sum()} row(s) without a valid date")
+    elif last_date is not None and dates.min() <= pd.Timestamp(last_date):
+        problems.append(f"dates from {dates.min().date()} overlap the stored data (up to {pd.Timestamp(last_date).date()})")
+    if problems:
+        raise IngestError("; ".join(problems))
+    return clean_category_partition(raw, columns)
+
+
+def sales_updates(snapshot, delta):
+    """(rewritten frames, appended parts, summary) for a cleaned wide sales partition."""
+    maker_aliases = extend_maker_aliases(snapshot["maker_aliases"], delta["Maker"])
+    delta = resolve_sales_makers(delta, maker_aliases)
+    years = sales_year_columns(delta)
+    rewrites = {
+        "maker_aliases": maker_aliases,
+        "sales": update_growth_table(snapshot["sales"], ["Cat", "Maker"], delta),
+        "maker_growth": update_growth_table(snapshot["maker_growth"], ["Maker"],
+                                            delta.groupby("Maker", as_index=False, sort=False)[years].sum())
+                        .sort_values("Maker", ignore_index=True, key=lambda s: s.astype(str)),
+        "category_growth": update_growth_table(snapshot["category_growth"], ["Cat"],
+                                               delta.groupby("Cat", as_index=False, sort=False)[years].sum())
+                           .sort_values("Cat", ignore_index=True, key=lambda s: s.astype(str)),
+    }
+    # Forecasts depend on every year of a row, so they are refitted; one vectorised pass over the whole table
+    updated = rewrites["sales"]
+    rewrites["sales_forecast"], rewrites["maker_forecast"], rewrites["category_forecast"] = sales_forecast_tables(
+        updated, sales_year_columns(updated))
+    melted = melt_sales(delta)
+    return rewrites, {"sales_melted": melted}, update_kpis(snapshot.summary, melted)
+
+
+def category_updates(snapshot, delta):
+    """(rewritten frames, appended parts, summary) for a cleaned category partition."""
+    coarse = {key: snapshot[name] for key, name in ROLLUP_FRAMES.items() if key != "D"}
+    extended = append_rollups(coarse, delta)
+    daily = build_rollups(delta)["D"]  # Every date is new, so the daily roll-up just appends
+    rewrites = {ROLLUP_FRAMES[key]: frame for key, frame in extended.items()}
+    return rewrites, {"ev_category": delta, ROLLUP_FRAMES["D"]: daily}, snapshot.summary
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)  # Parts never change once written, so versions can share them
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def store_partition(name, path, digest, data_dir=DATA_DIR):
+    """Copy an accepted drop under data/partitions/<name>/ as <seq>-<hash>.csv. Returns the stored path."""
+    directory = os.path.join(data_dir, PARTITION_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, f"{len(partition_paths(name, data_dir)) + 1:04d}-{digest[:12]}.csv")
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+def ingest(name, path, data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR):
+    """Append the drop at ``path`` to dataset ``name`` and publish a new snapshot version. Returns the Snapshot."""
+    if name not in APPENDABLE_DATASETS:
+        raise IngestError(f"'{name}' does not take partitions (expected one of {', '.join(APPENDABLE_DATASETS)})")
+    manifest = read_manifest(snapshot_dir)
+    if not manifest or manifest.get("format") != SNAPSHOT_FORMAT:
+        load_snapshot(data_dir, snapshot_dir)  # One full build; later drops are incremental
+        manifest = read_manifest(snapshot_dir)
+    if not manifest:
+        raise IngestError(f"No writable snapshot under {snapshot_dir}")
+    snapshot = load_snapshot_version(snapshot_dir, manifest)
+
+    digest = file_sha256(path)
+    if digest in manifest["sources"].values():
+        raise IngestError(f"{path} was already ingested")
+    marks = manifest.get("watermarks") or watermarks(snapshot)
+    raw = pd.read_csv(path)
+    if raw.empty:
+        raise IngestError(f"{path} has no rows")
+    if name == "sales":
+        delta = validate_sales_partition(raw, marks["sales"])
+        rewrites, appends, summary = sales_updates(snapshot, delta)
+    else:
+        delta = validate_category_partition(raw, snapshot["ev_category"].columns, marks["ev_category"])
+        rewrites, appends, summary = category_updates(snapshot, delta)
+
+    stored = store_partition(name, path, digest, data_dir)
+    sources = dict(manifest["sources"], **{partition_key(name, stored): digest})
+    stats = dict(manifest.get("stats", {}), **{partition_key(name, stored): stat_record(stored)})
+    version = snapshot_version(sources)
+    version_dir = os.path.join(snapshot_dir, version)
+    parts = {frame: snapshot.files(frame) for frame in snapshot.names}
+    if not os.path.isdir(version_dir):
+        tmp_dir = tempfile.mkdtemp(prefix=f".{version}-", dir=snapshot_dir)
+        try:
+            for frame, df in rewrites.items():
+                write_frame(with_categoricals(frame, df), os.path.join(tmp_dir, f"{frame}.arrow"))
+                parts[frame] = [f"{frame}.arrow"]
+            for frame, df in appends.items():
+                part = f"{frame}.{len(parts[frame]):04d}.arrow"
+                write_frame(df, os.path.join(tmp_dir, part), schema=read_schema(os.path.join(snapshot.path, parts[frame][0])))
+                parts[frame].append(part)
+            for frame, files in parts.items():
+                for file_name in files:
+                    if not os.path.exists(os.path.join(tmp_dir, file_name)):
+                        _link_or_copy(os.path.join(snapshot.path, file_name), os.path.join(tmp_dir, file_name))
+            write_json(summary, os.path.join(tmp_dir, SUMMARY_NAME))
+            os.rename(tmp_dir, version_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    marks = dict(marks)
+    if name == "sales":
+        marks["sales"] = max(marks["sales"], sales_year_columns(delta)[-1])
+    else:
+        marks["ev_category"] = delta.index.max().isoformat()
+    manifest = dict(manifest, version=version, sources=sources, stats=stats, watermarks=marks,
+                    parts={frame: files for frame, files in parts.items() if len(files) > 1})
+    write_manifest(snapshot_dir, manifest)
+    return load_snapshot_version(snapshot_dir, manifest)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append a new data drop to the snapshot without rebuilding it.")
+    parser.add_argument("dataset", choices=APPENDABLE_DATASETS)
+    parser.add_argument("csv", help="the new partition, shaped like the dataset's source CSV")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+    try:
+        snapshot = ingest(args.dataset, args.csv, args.data_dir, args.snapshot_dir)
+    except IngestError as e:
+        parser.exit(1, f"Rejected {args.csv}: {e}\n")
+    print(f"Snapshot {snapshot.version} now includes {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Lightweight hot-path instrumentation.
+
+``Metrics`` records wall time per named section (data loading, geocoding,
+boundary loading, aggregations, figure building and rendering), cache hits
+and misses, payload bytes and item counts. Sections nest and are thread-safe; a cached
+function marks a miss by calling ``mark_miss()`` from inside its body, so
+the caller's section is counted as a hit whenever the body did not run:
+
+    with METRICS.section("dataset", cache=True, name="sales"):
+        load_dataset_cached("sales")   # body calls METRICS.mark_miss()
+
+Labels become Prometheus labels, so they must take a small, fixed set of
+values (a dataset or chart name); a count such as the number of places goes
+through ``add_items`` instead of a label. Totals are exposed as rows for a
+debug panel, as Prometheus text
+(``to_prometheus``, served by ``serve_metrics``), and optionally as one
+JSON log line per section on the ``ev_insights.metrics`` logger.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("ev_insights.metrics")
+
+METRIC_PREFIX = "ev_insights"
+
+
+class SectionStats:
+    __slots__ = ("calls", "seconds", "max_seconds", "last_seconds", "hits", "misses", "bytes", "last_bytes", "items")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self.last_bytes = 0
+        self.items = 0
+
+
+class _Frame:
+    __slots__ = ("miss", "nbytes", "nitems")
+
+    def __init__(self):
+        self.miss = False
+        self.nbytes = None
+        self.nitems = None
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    """Process-wide registry of section timings, cache hits/misses and payload sizes."""
+
+    def __init__(self, log_events=False):
+        self.log_events = log_events
+        self.started_at = time.time()
+        self._stats = {}  # (section, label key) -> SectionStats
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def section(self, section, cache=False, **labels):
+        """Time the block as ``section``; with ``cache=True`` also count it as a hit or (if marked) a miss."""
+        frame = _Frame()
+        stack = self._stack()
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield frame
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            self.record(section, elapsed, hit=(not frame.miss) if cache else None, nbytes=frame.nbytes, nitems=frame.nitems, **labels)
+
+    def mark_miss(self):
+        """Flag the innermost open section of this thread as a cache miss (call from a cached function's body)."""
+        stack = self._stack()
+        if stack:
+            stack[-1].miss = True
+
+    def add_bytes(self, nbytes):
+        """Attach a payload size to the innermost open section of this thread."""
+        stack = self._stack()
+        if stack:
+            stack[-1].nbytes = (stack[-1].nbytes or 0) + nbytes
+
+    def add_items(self, count):
+        """Attach an item count (places, rows, ...) to the innermost open section of this thread."""
+        stack = self._stack()
+        if stack:
+            stack[-1].nitems = (stack[-1].nitems or 0) + count
+
+    def record(self, section, seconds, hit=None, nbytes=None, nitems=None, **labels):
+        key = (section, _label_key(labels))
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = SectionStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.last_seconds = seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            if hit is True: stats.hits += 1
+            elif hit is False: stats.misses += 1
+            if nbytes is not None:
+                stats.bytes += nbytes
+                stats.last_bytes = nbytes
+            if nitems is not None:
+                stats.items += nitems
+        if self.log_events:
+            event = {"section": section, "ms": round(seconds * 1000, 3), **labels}
+            if hit is not None: event["hit"] = hit
+            if nbytes is not None: event["bytes"] = nbytes
+            if nitems is not None: event["items"] = nitems
+            logger.info(json.dumps(event, default=str))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+    def rows(self):
+        """One dict per (section, labels), slowest total first - the shape the debug panel displays."""
+        with self._lock:
+            items = [(name, dict(labels), stats) for (name, labels), stats in self._stats.items()]
+        rows = []
+        for name, labels, s in items:
+            rows.append({
+                "section": name,
+                "labels": ", ".join(f"{k}={v}" for k, v in labels.items()),
+                "calls": s.calls,
+                "hits": s.hits,
+                "misses": s.misses,
+                "mean_ms": s.seconds / s.calls * 1000 if s.calls else 0.0,
+                "last_ms": s.last_seconds * 1000,
+                "max_ms": s.max_seconds * 1000,
+                "total_ms": s.seconds * 1000,
+                "last_bytes": s.last_bytes,
+                "bytes": s.bytes,
+                "items": s.items,
+            })
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            items = [(name, labels, stats) for (name, labels), stats in sorted(self._stats.items())]
+        series = {
+            "section_calls_total": ("counter", "Times the section ran", lambda s: s.calls),
+            "section_seconds_total": ("counter", "Wall time spent in the section", lambda s: s.seconds),
+            "section_seconds_max": ("gauge", "Slowest single run of the section", lambda s: s.max_seconds),
+            "cache_hits_total": ("counter", "Cache hits recorded for the section", lambda s: s.hits),
+            "cache_misses_total": ("counter", "Cache misses recorded for the section", lambda s: s.misses),
+            "payload_bytes_total": ("counter", "Payload bytes produced by the section", lambda s: s.bytes),
+            "section_items_total": ("counter", "Items (places, rows, ...) the section processed", lambda s: s.items),
+        }
+        lines = []
+        for metric, (kind, help_text, value) in series.items():
+            full_name = f"{METRIC_PREFIX}_{metric}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for name, labels, stats in items:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in (("section", name),) + labels)
+                lines.append(f"{full_name}{{{label_text}}} {value(stats)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+METRICS = Metrics()
+
+
+def serve_metrics(port, metrics=METRICS, host="127.0.0.1"):
+    """Serve ``metrics`` as Prometheus text on http://host:port/metrics from a daemon thread. Returns the server.
+
+    Binds to localhost unless ``host`` says otherwise: the timings describe the
+    deployment, so exposing them to the network is an explicit choice.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood stderr
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ev-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,80 @@
+"""Headline KPI summary shown in the dashboard header.
+
+Computed once when the snapshot is built and stored next to it as a small
+JSON record, so rendering the header never touches the underlying tables.
+Besides the all-time headline figures the record carries per-year and
+per-category breakdowns, so any year or category variant of the header is a
+dictionary lookup as well.
+"""
+
+
+def _totals(series):
+    """{label: int total} with string keys (JSON objects only have string keys)."""
+    return {str(key): int(value) for key, value in series.items()}
+
+
+def compute_kpis(frames):
+    vehicle_class = frames["vehicle_class"]
+    sales = frames["sales_melted"]
+    pcs = frames["pcs"]
+
+    sales_by_year = sales.groupby("Year", observed=True, sort=True)["Sales"].sum()
+    sales_by_category = sales.groupby("Cat", observed=True, sort=True)["Sales"].sum()
+    sales_by_year_category = sales.groupby(["Year", "Cat"], observed=True, sort=True)["Sales"].sum()
+
+    years = [str(year) for year in sales_by_year.index]
+    latest_year = years[-1] if years else ""
+    previous_year = years[-2] if len(years) > 1 else ""
+    by_year = _totals(sales_by_year)
+    return {
+        "total_registrations": int(vehicle_class["Total Registration"].sum()),
+        "registrations_by_class": _totals(vehicle_class.groupby("Vehicle Class", sort=True)["Total Registration"].sum()),
+        "total_sales": int(sales_by_year.sum()),
+        "latest_year": latest_year,
+        "previous_year": previous_year,
+        "sales_latest_year": by_year.get(latest_year, 0),
+        "sales_previous_year": by_year.get(previous_year, 0),
+        "sales_by_year": by_year,
+        "sales_by_category": _totals(sales_by_category),
+        "sales_by_year_category": {year: _totals(per_cat.droplevel("Year"))
+                                   for year, per_cat in sales_by_year_category.groupby(level="Year", observed=True)},
+        "total_pcs": int(pcs["No. of Operational PCS"].sum()),
+        "pcs_by_state": _totals(pcs.groupby("State", observed=True, sort=True)["No. of Operational PCS"].sum()),
+    }
+
+
+def update_kpis(summary, sales_delta):
+    """The summary with the rows of an appended long sales partition added, without rescanning the stored rows."""
+    by_year = dict(summary["sales_by_year"])
+    by_category = dict(summary["sales_by_category"])
+    by_year_category = {year: dict(per_cat) for year, per_cat in summary["sales_by_year_category"].items()}
+    grouped = sales_delta.groupby(["Year", "Cat"], observed=True, sort=True)["Sales"].sum()
+    for (year, cat), value in grouped.items():
+        year, cat, value = str(year), str(cat), int(value)
+        by_year[year] = by_year.get(year, 0) + value
+        by_category[cat] = by_category.get(cat, 0) + value
+        per_cat = by_year_category.setdefault(year, {})
+        per_cat[cat] = per_cat.get(cat, 0) + value
+
+    years = sorted(by_year)
+    latest_year = years[-1] if years else ""
+    previous_year = years[-2] if len(years) > 1 else ""
+    return dict(summary,
+                total_sales=sum(by_year.values()),
+                latest_year=latest_year,
+                previous_year=previous_year,
+                sales_latest_year=by_year.get(latest_year, 0),
+                sales_previous_year=by_year.get(previous_year, 0),
+                sales_by_year={year: by_year[year] for year in years},
+                sales_by_category=dict(sorted(by_category.items())),
+                sales_by_year_category={year: dict(sorted(by_year_category[year].items())) for year in years})
+
+
+def sales_delta_pct(summary, year=None):
+    """Year-over-year change in total sales for ``year`` (default: latest), or None without a non-zero prior year."""
+    years = list(summary["sales_by_year"])
+    year = year or summary["latest_year"]
+    if year not in years or years.index(year) == 0:
+        return None
+    previous = summary["sales_by_year"][years[years.index(year) - 1]]
+    return (summary["sales_by_year"][year] - previous) / previous * 100 if previous else None
@@ -0,0 +1,48 @@
+"""Deferred imports for modules that only some pages need.
+
+``lazy_module("plotly.express")`` returns a stand-in that imports the real
+module on first attribute access, so the app's import block stays cheap and
+a session that never draws a chart never pays for the charting stack:
+
+    px = lazy_module("plotly.express")
+    px.bar(...)   # plotly.express is imported here, once per process
+
+The geo stack (geopandas, shapely, pyproj, geopy) is not imported at module
+level anywhere in ev_insights; the functions that need it import it
+themselves. benchmarks/bench_startup.py checks that this stays true.
+"""
+import importlib
+import sys
+
+
+class LazyModule:
+    """Stand-in for a module, imported on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = self.__dict__["_module"] = importlib.import_module(self._name)  # Thread-safe: imports lock per module
+        return module
+
+    @property
+    def loaded(self):
+        return self.__dict__["_module"] is not None or self._name in sys.modules
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_module(name):
+    """The module if it is already imported, otherwise a LazyModule for it."""
+    return sys.modules.get(name) or LazyModule(name)
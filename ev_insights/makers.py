@@ -0,0 +1,307 @@
+"""Maker-name entity resolution for the sales and maker location tables.
+
+The sales CSV spells one company several ways (``"VOLVO GROUP INDIA PVT
+LTD"`` in stray quotes, ``PVT. LTD`` / ``PRIVATE LIMITED``, doubled spaces),
+and the location CSV uses short brand names (``Tata Motors``), so the same
+maker used to show up as several rows and the two tables did not join.
+
+``build_maker_aliases`` resolves the raw names into a persisted alias map,
+one row per comparison key (``maker_keys``: lowercased, punctuation and
+legal-form words such as PVT/LTD/LIMITED dropped):
+
+- names with the same key are one maker;
+- near-duplicate keys are linked when their trigrams have a Dice
+  similarity of at least ``MIN_SIMILARITY`` (and the same numbers). Pairs are
+  only scored within MinHash LSH buckets, and within a bucket only between
+  neighbours in sorted order, so the work grows linearly with the number of
+  names instead of with all pairs;
+- a reference name (the location table's) whose key is a token prefix of
+  exactly one maker's key names that maker (``Ola Electric`` ->
+  ``OLA ELECTRIC TECHNOLOGIES PVT LTD``); the prefix candidates come from a
+  first-token index.
+
+Each maker is displayed under its reference name if it has one, otherwise
+under its most frequent spelling. The map is stored with the snapshot
+(``maker_aliases``) and applied to whole columns through their distinct
+values; new drops only extend it (``extend_maker_aliases``), so existing
+names never move:
+
+    aliases = build_maker_aliases(sales["Maker"], reference=places["EV Maker"])
+    sales["Maker"] = apply_maker_aliases(sales["Maker"], aliases)
+"""
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+MIN_SIMILARITY = 0.87  # Dice similarity of character trigrams needed to link two maker keys
+MINHASH_BANDS, MINHASH_ROWS = 8, 3  # LSH bands x rows per band; keys with Jaccard similarity above ~0.5 usually share a bucket
+NEIGHBOUR_WINDOW = 4  # Within a bucket, each key is scored against this many following keys in sorted order
+ALIAS_COLUMNS = ["key", "maker", "match"]
+
+# Legal-form words that do not tell makers apart; "(P) LTD" also loses its P
+LEGAL_FORMS = ("pvt", "private", "ltd", "limited", "llp", "inc", "incorporated", "corp", "corporation",
+               "plc", "pte", "gmbh")
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240101)  # Fixed, so the same names always land in the same buckets
+_HASH_A = _rng.integers(1, _PRIME, MINHASH_BANDS * MINHASH_ROWS, dtype=np.int64)
+_HASH_B = _rng.integers(0, _PRIME, MINHASH_BANDS * MINHASH_ROWS, dtype=np.int64)
+
+
+def _string_array(values):
+    import pyarrow as pa
+
+    return pa.array([str(value) for value in values], pa.string())
+
+
+def clean_maker_names(values):
+    """Display spellings of ``values``: surrounding quotes dropped, whitespace collapsed."""
+    import pyarrow.compute as pc
+
+    names = pc.utf8_trim(pc.utf8_trim_whitespace(_string_array(values)), "\"'")
+    return pc.utf8_trim_whitespace(pc.replace_substring_regex(names, r"\s+", " ")).to_pylist()
+
+
+def maker_keys(values):
+    """Comparison keys of ``values``: lowercased, '&' spelled out, punctuation and legal-form words dropped.
+
+    One vectorised pass per rewrite, so keying 100k names costs milliseconds.
+    """
+    import pyarrow.compute as pc
+
+    keys = pc.replace_substring(pc.utf8_lower(_string_array(values)), "&", " and ")
+    keys = pc.replace_substring_regex(keys, r"[^\p{L}\p{M}\p{N}\s_]", " ")
+    keys = pc.replace_substring_regex(keys, r"\bp\s+(ltd|limited)\b", r"\1")
+    keys = pc.replace_substring_regex(keys, rf"\b({'|'.join(LEGAL_FORMS)})\b", " ")
+    return pc.utf8_trim_whitespace(pc.replace_substring_regex(keys, r"\s+", " ")).to_pylist()
+
+
+def clean_maker_name(name):
+    return clean_maker_names([name])[0]
+
+
+def maker_key(name):
+    return maker_keys([name])[0]
+
+
+def _number_codes(keys):
+    """Per key, a code for the numbers it contains; keys with different numbers are never linked."""
+    import pyarrow.compute as pc
+
+    numbers = pc.utf8_trim_whitespace(pc.replace_substring_regex(_string_array(keys), r"[^0-9]+", " "))
+    return pd.factorize(numbers.to_numpy(zero_copy_only=False))[0]
+
+
+def _trigram_sets(keys):
+    """(codes, offsets): the distinct byte trigrams of each padded key as ``key << 24 | trigram``.
+
+    ``codes`` is sorted, so key k's trigrams are ``codes[offsets[k]:offsets[k + 1]]``
+    and a (key, trigram) membership test is one binary search. For ASCII
+    names these are the character trigrams of ev_insights.states.trigrams.
+    """
+    encoded = [f"  {key} ".encode("utf-8") for key in keys]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b"".join(encoded) + b"\0\0", dtype=np.uint8).astype(np.int64)
+    grams = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+    owner = np.repeat(np.arange(len(keys), dtype=np.int64), lengths)
+    position = np.arange(len(owner)) - (np.cumsum(lengths) - lengths)[owner]
+    inside = position <= lengths[owner] - 3  # Trigrams that do not run into the next key
+    codes = np.sort((owner[inside] << 24) | grams[inside])
+    codes = codes[np.append(True, codes[1:] != codes[:-1])]
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes >> 24, minlength=len(keys)), out=offsets[1:])
+    return codes, offsets
+
+
+def _signatures(codes, offsets):
+    """keys x (bands * rows) MinHash signatures of the trigram sets."""
+    grams = codes & 0xFFFFFF
+    signatures = np.empty((len(offsets) - 1, len(_HASH_A)), dtype=np.int64)
+    for col, (a, b) in enumerate(zip(_HASH_A, _HASH_B)):  # One hash function at a time keeps memory at one column of trigrams
+        signatures[:, col] = np.minimum.reduceat((grams * a + b) % _PRIME, offsets[:-1])
+    return signatures
+
+
+def _dice(codes, offsets, first, second):
+    """Dice similarity of the trigram sets of each (first, second) key pair."""
+    sizes = np.diff(offsets)
+    counts = sizes[first]
+    pair = np.repeat(np.arange(len(first)), counts)
+    within = np.arange(len(pair)) - np.repeat(np.cumsum(counts) - counts, counts)
+    probe = (second[pair] << 24) | (codes[offsets[first][pair] + within] & 0xFFFFFF)
+    found = codes[np.minimum(np.searchsorted(codes, probe), len(codes) - 1)] == probe
+    shared = np.bincount(pair, weights=found, minlength=len(first))
+    return 2 * shared / (counts + sizes[second])
+
+
+def candidate_pairs(keys, trigram_sets=None):
+    """(i, j) index arrays, i < j, of the keys worth scoring against each other.
+
+    Keys sharing a MinHash band are sorted together; each is paired with the
+    next ``NEIGHBOUR_WINDOW`` keys in its bucket, never with the whole bucket.
+    """
+    n = len(keys)
+    if n < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    signatures = _signatures(*(trigram_sets or _trigram_sets(keys)))
+    rank = np.argsort(np.argsort(np.asarray(keys, dtype=object), kind="stable"), kind="stable")
+    firsts, seconds = [], []
+    for band in range(MINHASH_BANDS):
+        bucket = np.zeros(n, dtype=np.uint64)
+        for col in range(band * MINHASH_ROWS, (band + 1) * MINHASH_ROWS):
+            bucket = bucket * np.uint64(1_000_003) ^ signatures[:, col].astype(np.uint64)
+        order = np.lexsort((rank, bucket))
+        for step in range(1, min(NEIGHBOUR_WINDOW, n - 1) + 1):
+            first, second = order[:-step], order[step:]
+            same = bucket[first] == bucket[second]
+            firsts.append(first[same])
+            seconds.append(second[same])
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    pairs = np.sort(np.minimum(first, second) * n + np.maximum(first, second))
+    pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]  # The same neighbours recur in several bands
+    return pairs // n, pairs % n
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _link(keys, min_similarity, involving=None):
+    """Union-find roots of ``keys`` after linking similar candidate pairs.
+
+    With ``involving`` (a boolean mask), only pairs touching a masked key are
+    scored, so keys outside the mask are never linked to each other.
+    """
+    trigram_sets = _trigram_sets(keys)
+    first, second = candidate_pairs(keys, trigram_sets)
+    keep = _number_codes(keys)
+    keep = keep[first] == keep[second]  # "EV 2" and "EV 3" are different makers however similar
+    if involving is not None:
+        keep &= involving[first] | involving[second]
+    first, second = first[keep], second[keep]
+    similar = _dice(*trigram_sets, first, second) >= min_similarity
+    parent = list(range(len(keys)))
+    for i, j in zip(first[similar].tolist(), second[similar].tolist()):
+        root_i, root_j = _find(parent, i), _find(parent, j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)  # The earliest key stays the root
+    return np.array([_find(parent, i) for i in range(len(keys))], dtype=np.int64)
+
+
+def _spellings(values, reference=False):
+    """Distinct display spellings of ``values``: name, key, rows, first (position), reference."""
+    values = pd.Series(values, dtype=object).dropna()
+    codes, uniques = pd.factorize(values)
+    names = clean_maker_names(uniques)
+    spellings = pd.DataFrame({"name": names, "key": maker_keys(names),
+                              "rows": np.bincount(codes, minlength=len(uniques)), "first": np.arange(len(uniques))})
+    spellings = spellings[spellings["key"] != ""]
+    spellings = spellings.groupby("name", sort=False, as_index=False).agg(
+        key=("key", "first"), rows=("rows", "sum"), first=("first", "min"))
+    return spellings.assign(reference=reference)
+
+
+def _canonical_names(spellings, cluster):
+    """Display name and its key per cluster: the first reference spelling, else the most frequent one (earliest on ties)."""
+    ranked = spellings.assign(cluster=cluster).sort_values(["cluster", "reference", "rows", "first"],
+                                                           ascending=[True, False, False, True], kind="stable")
+    return ranked.drop_duplicates("cluster").set_index("cluster")[["name", "key"]]
+
+
+def _prefix_links(keys, roots, is_reference, is_name):
+    """Union reference-only clusters with the one cluster whose keys extend them token-wise.
+
+    Returns the new roots and the clusters that were linked this way.
+    """
+    by_first_token = defaultdict(list)
+    for idx in np.flatnonzero(is_name):
+        by_first_token[keys[idx].split(" ", 1)[0]].append(idx)
+    clusters_with_makers = set(roots[is_name].tolist())
+    linked = {}
+    for idx in np.flatnonzero(is_reference):
+        if roots[idx] in clusters_with_makers:
+            continue  # Already the same key as (or similar to) a maker
+        prefix = keys[idx] + " "
+        targets = {roots[other] for other in by_first_token.get(keys[idx].split(" ", 1)[0], ())
+                   if keys[other].startswith(prefix)}
+        if len(targets) == 1:
+            linked[targets.pop()] = roots[idx]
+    if linked:
+        roots = roots.copy()
+        moved = np.isin(roots, list(linked))
+        roots[moved] = [linked[root] for root in roots[moved].tolist()]
+    return roots, set(linked.values())
+
+
+def _alias_frame(keys, makers, kinds):
+    return pd.DataFrame({"key": keys, "maker": makers, "match": kinds}, columns=ALIAS_COLUMNS)
+
+
+def build_maker_aliases(names, reference=(), min_similarity=MIN_SIMILARITY):
+    """Alias map (key, maker, match) resolving every name in ``names`` and ``reference``.
+
+    ``match`` is ``exact`` for the key of the display name itself, ``fuzzy``
+    for keys linked by similarity and ``prefix`` for makers named after a
+    reference name they extend.
+    """
+    spellings = pd.concat([_spellings(reference, reference=True), _spellings(names)], ignore_index=True)
+    key_codes, keys = pd.factorize(spellings["key"])
+    keys = keys.tolist()
+    from_reference = spellings["reference"].to_numpy()
+    is_reference, is_name = np.zeros(len(keys), dtype=bool), np.zeros(len(keys), dtype=bool)
+    is_reference[key_codes[from_reference]] = True
+    is_name[key_codes[~from_reference]] = True
+    roots = _link(keys, min_similarity)
+    roots, prefixed = _prefix_links(keys, roots, is_reference, is_name)
+    canonical = _canonical_names(spellings, roots[key_codes])
+    makers = canonical["name"].reindex(roots).to_numpy()
+    kinds = np.where(canonical["key"].reindex(roots).to_numpy() == np.asarray(keys, dtype=object), "exact",
+                     np.where(np.isin(roots, list(prefixed)) & is_name, "prefix", "fuzzy"))
+    return _alias_frame(keys, makers, kinds)
+
+
+def extend_maker_aliases(aliases, names, min_similarity=MIN_SIMILARITY):
+    """``aliases`` plus rows for the keys of ``names`` it does not have yet.
+
+    A new key similar to a known one takes that maker; the rest are resolved
+    among themselves like ``build_maker_aliases``. Existing rows are kept as
+    they are, so a drop never renames data already stored.
+    """
+    spellings = _spellings(names)
+    known = pd.Index(aliases["key"].astype(str))
+    spellings = spellings[known.get_indexer(spellings["key"]) < 0]
+    if spellings.empty:
+        return aliases
+    key_codes, new_keys = pd.factorize(spellings["key"])
+    keys = known.tolist() + new_keys.tolist()
+    is_new = np.arange(len(keys)) >= len(known)
+    roots = _link(keys, min_similarity, involving=is_new)
+    new_roots = roots[len(known):]
+    known_makers = aliases["maker"].astype(str).to_numpy()
+    canonical = _canonical_names(spellings, new_roots[key_codes])
+    makers = np.where(new_roots < len(known), known_makers[np.minimum(new_roots, len(known) - 1)],
+                      canonical["name"].reindex(new_roots).to_numpy())
+    kinds = np.where(canonical["key"].reindex(new_roots).to_numpy() == new_keys.to_numpy(dtype=object), "exact", "fuzzy")
+    added = _alias_frame(new_keys.tolist(), makers, kinds)
+    return pd.concat([aliases.astype({col: str for col in ALIAS_COLUMNS}), added], ignore_index=True)
+
+
+def apply_maker_aliases(values, aliases):
+    """``values`` as a categorical of display names, mapping each distinct value once.
+
+    Values whose key the map lacks keep their cleaned spelling; missing values stay missing.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    names = clean_maker_names(uniques)
+    positions = pd.Index(aliases["key"].astype(str)).get_indexer(maker_keys(names))
+    makers = aliases["maker"].astype(str).to_numpy()
+    resolved = np.where(positions >= 0, makers[np.maximum(positions, 0)], np.asarray(names, dtype=object))
+    categories = pd.Index(list(dict.fromkeys(resolved.tolist())))
+    category_codes = np.append(categories.get_indexer(resolved), -1)  # Code -1 (missing) stays missing
+    return pd.Series(pd.Categorical.from_codes(category_codes[codes], categories=categories),
+                     index=values.index, name=values.name)
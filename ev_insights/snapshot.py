@@ -0,0 +1,330 @@
+"""Versioned columnar snapshot of the cleaned datasets.
+
+``build_snapshot`` runs the CSV cleaning in ``ev_insights.data`` once and
+writes every frame as an uncompressed Arrow IPC file, with categorical
+dtypes for the Maker/Cat/State columns. ``load_snapshot`` memory-maps those
+files on first access, and only rebuilds when the content hash of a source
+CSV changes. The headline KPIs are computed at build time and kept next to
+the frames as a small JSON record:
+
+    data/snapshot/manifest.json         -> points at the current version
+    data/snapshot/<version>/<frame>.arrow
+    data/snapshot/<version>/<frame>.<n>.arrow   (parts appended by ev_insights.ingest)
+    data/snapshot/<version>/summary.json
+
+    python -m ev_insights.snapshot      # (re)build ahead of deployment
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from ev_insights.data import APPENDABLE_DATASETS, DATA_DIR, PARTITION_DIR, SOURCE_FILES, partition_paths, read_sources, sales_year_columns
+from ev_insights.datasets import ROLLUP_FRAMES
+from ev_insights.kpis import compute_kpis
+from ev_insights.states import boundary_paths, default_state_index
+from ev_insights.timeseries import build_rollups
+
+SNAPSHOT_FORMAT = 10  # Bump when cleaning logic or frame layout changes
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshot")
+MANIFEST_NAME = "manifest.json"
+SUMMARY_NAME = "summary.json"
+
+CATEGORICAL_COLUMNS = {
+    "sales": ["Cat", "Maker"],
+    "sales_melted": ["Cat", "Maker"],
+    "maker_growth": ["Maker"],
+    "category_growth": ["Cat"],
+    "sales_forecast": ["Cat", "Maker", "Model"],
+    "maker_forecast": ["Maker", "Model"],
+    "category_forecast": ["Cat", "Model"],
+    "maker_places": ["EV Maker", "State"],
+    "maker_aliases": ["maker", "match"],
+    "pcs": ["State"],
+}
+
+
+class Snapshot:
+    """Cleaned frames plus the version string that identifies them.
+
+    Frames of a persisted snapshot are memory-mapped on first access; an
+    in-memory snapshot (read-only deployments) is handed all of them up front.
+    ``parts`` lists the files of frames that had partitions appended.
+    """
+
+    def __init__(self, version, frames=None, path=None, names=None, summary=None, parts=None):
+        self.version = version
+        self.frames = dict(frames or {})
+        self.path = path  # None when the snapshot could not be persisted
+        self.names = sorted(names if names is not None else self.frames)
+        self.summary = summary
+        self.parts = dict(parts or {})
+        self._lock = threading.Lock()
+
+    def files(self, name):
+        """File names (relative to ``path``) that make up a stored frame, base file first."""
+        return list(self.parts.get(name, [f"{name}.arrow"]))
+
+    def __getitem__(self, name):
+        frame = self.frames.get(name)
+        if frame is None:
+            if name not in self.names or self.path is None:
+                raise KeyError(name)
+            with self._lock:
+                frame = self.frames.get(name)
+                if frame is None:
+                    frame = self.frames[name] = read_frame([os.path.join(self.path, f) for f in self.files(name)])
+        return frame
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def loaded(self):
+        """Names of the frames read so far."""
+        return sorted(self.frames)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def partition_key(name, path):
+    return f"{PARTITION_DIR}/{name}/{os.path.basename(path)}"
+
+
+def source_paths(data_dir=DATA_DIR):
+    """Source key -> file for every input of the snapshot: the CSVs and their appended partitions."""
+    paths = {name: os.path.join(data_dir, filename) for name, filename in SOURCE_FILES.items()}
+    for name in APPENDABLE_DATASETS:
+        for path in partition_paths(name, data_dir):
+            paths[partition_key(name, path)] = path
+    return paths
+
+
+def watched_paths(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR):
+    """Everything whose change can change the current snapshot (see ev_insights.freshness).
+
+    The boundary files count too: state names are normalised against them.
+    """
+    partition_dirs = [os.path.join(data_dir, PARTITION_DIR, name) for name in APPENDABLE_DATASETS]
+    return (list(source_paths(data_dir).values()) + partition_dirs + [os.path.join(snapshot_dir, MANIFEST_NAME)]
+            + boundary_paths())
+
+
+def stat_record(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def hash_sources(data_dir=DATA_DIR, known=None, stats=None):
+    """Content hash per source.
+
+    With ``known`` (a manifest), a file whose size and mtime match the
+    manifest's record reuses the recorded hash, so revalidating an unchanged
+    tree costs one stat call per file. ``stats``, if given, is filled with the
+    records to store; they are taken before hashing, so a file written
+    mid-hash is simply hashed again next time.
+    """
+    known_hashes = (known or {}).get("sources", {})
+    known_stats = (known or {}).get("stats", {})
+    hashes = {}
+    for key, path in source_paths(data_dir).items():
+        record = stat_record(path)
+        if stats is not None:
+            stats[key] = record
+        hashes[key] = known_hashes[key] if key in known_hashes and known_stats.get(key) == record else file_sha256(path)
+    hashes["state_index"] = default_state_index().fingerprint  # State names are normalised against the boundary file
+    return hashes
+
+
+def snapshot_version(source_hashes):
+    payload = json.dumps({"format": SNAPSHOT_FORMAT, "sources": source_hashes}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def with_categoricals(name, df):
+    for col in CATEGORICAL_COLUMNS.get(name, []):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def source_frames(data_dir=DATA_DIR):
+    """Cleaned frames plus the stored category roll-ups, with categorical key columns."""
+    frames = read_sources(data_dir)
+    rollups = build_rollups(frames["ev_category"])
+    frames.update({ROLLUP_FRAMES[key]: rollups[key] for key in ROLLUP_FRAMES})
+    return {name: with_categoricals(name, df) for name, df in frames.items()}
+
+
+def write_frame(df, path, schema=None):
+    """Write ``df`` as an Arrow IPC file; with ``schema`` (an appended part) cast to the base file's schema."""
+    import pyarrow as pa
+
+    # Named indexes (e.g. the Date index of ev_category) round-trip; RangeIndexes are stored as metadata only
+    table = pa.Table.from_pandas(df, preserve_index=None)
+    if schema is not None:
+        table = table.cast(schema)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_schema(path):
+    import pyarrow as pa
+
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).schema
+
+
+def read_frame(paths):
+    """Read one Arrow IPC file, or several with the same schema (a frame and its appended parts) as one frame."""
+    import pyarrow as pa
+
+    tables = []
+    # Uncompressed IPC + memory map: column buffers are paged in lazily, not copied up front
+    for path in [paths] if isinstance(paths, str) else paths:
+        with pa.memory_map(path, "r") as source:
+            tables.append(pa.ipc.open_file(source).read_all())
+    table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+    return table.to_pandas(split_blocks=True)
+
+
+def write_json(obj, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def read_summary(version_dir):
+    with open(os.path.join(version_dir, SUMMARY_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def current_version(snapshot_dir=SNAPSHOT_DIR):
+    """Version the manifest points at (None without one); cheap enough to check on every rerun."""
+    manifest = read_manifest(snapshot_dir)
+    return manifest.get("version") if manifest else None
+
+
+def watermarks(frames):
+    """Latest stored period of each appendable dataset; appended partitions must not reach behind it."""
+    ev_category = frames["ev_category"]
+    return {
+        "sales": sales_year_columns(frames["sales"])[-1],
+        "ev_category": ev_category.index.max().isoformat() if len(ev_category) else None,
+    }
+
+
+def write_manifest(snapshot_dir, manifest):
+    write_json(manifest, os.path.join(snapshot_dir, MANIFEST_NAME))
+    prune_snapshots(snapshot_dir, keep=manifest["version"])
+
+
+def build_snapshot(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR, source_hashes=None, source_stats=None):
+    """Parse the CSVs and persist every cleaned frame. Returns the loaded Snapshot."""
+    if source_hashes is None:
+        source_stats = {}
+        source_hashes = hash_sources(data_dir, stats=source_stats)
+    version = snapshot_version(source_hashes)
+    frames = source_frames(data_dir)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version_dir = os.path.join(snapshot_dir, version)
+    if not os.path.isdir(version_dir):
+        # Write into a scratch directory and rename, so readers never see half a snapshot
+        tmp_dir = tempfile.mkdtemp(prefix=f".{version}-", dir=snapshot_dir)
+        try:
+            for name, df in frames.items():
+                write_frame(df, os.path.join(tmp_dir, f"{name}.arrow"))
+            write_json(compute_kpis(frames), os.path.join(tmp_dir, SUMMARY_NAME))
+            os.rename(tmp_dir, version_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(version_dir):  # Lost a race with another builder otherwise
+                raise
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "sources": source_hashes,
+        "stats": source_stats or {},
+        "frames": sorted(frames),
+        "watermarks": watermarks(frames),
+    }
+    write_manifest(snapshot_dir, manifest)
+    return load_snapshot_version(snapshot_dir, manifest)
+
+
+def load_snapshot_version(snapshot_dir, manifest):
+    """Open a persisted version: only the KPI summary is read now, frames on first access."""
+    version_dir = os.path.join(snapshot_dir, manifest["version"])
+    summary = read_summary(version_dir)  # Raises OSError if the version directory went missing
+    return Snapshot(manifest["version"], path=version_dir, names=manifest["frames"], summary=summary,
+                    parts=manifest.get("parts"))
+
+
+def prune_snapshots(snapshot_dir=SNAPSHOT_DIR, keep=None):
+    """Drop old version directories (the previous one stays for readers still mapping it)."""
+    versions = [d for d in os.listdir(snapshot_dir)
+                if os.path.isdir(os.path.join(snapshot_dir, d)) and d != keep]
+    versions.sort(key=lambda d: os.path.getmtime(os.path.join(snapshot_dir, d)), reverse=True)
+    for stale in versions[1:]:
+        shutil.rmtree(os.path.join(snapshot_dir, stale), ignore_errors=True)
+
+
+def load_snapshot(data_dir=DATA_DIR, snapshot_dir=SNAPSHOT_DIR):
+    """Return the current Snapshot, rebuilding it only if a source CSV's content changed."""
+    manifest = read_manifest(snapshot_dir)
+    source_stats = {}
+    source_hashes = hash_sources(data_dir, known=manifest, stats=source_stats)
+    if (manifest and manifest.get("format") == SNAPSHOT_FORMAT and manifest.get("sources") == source_hashes):
+        try:
+            snapshot = load_snapshot_version(snapshot_dir, manifest)
+        except (OSError, ValueError):
+            pass  # Version directory went missing or is incomplete; rebuild below
+        else:
+            if manifest.get("stats") != source_stats:
+                # Touched but unchanged files: record their new stats so the next check skips hashing them
+                try:
+                    write_json(dict(manifest, stats=source_stats), os.path.join(snapshot_dir, MANIFEST_NAME))
+                except OSError:
+                    pass
+            return snapshot
+    try:
+        return build_snapshot(data_dir, snapshot_dir, source_hashes, source_stats)
+    except OSError:
+        # Read-only deployments still work, they just parse the CSVs every cold start
+        frames = source_frames(data_dir)
+        return Snapshot(snapshot_version(source_hashes), frames, summary=compute_kpis(frames))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the columnar data snapshot from the CSVs under data/.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+    snapshot = build_snapshot(args.data_dir, args.out)
+    print(f"Snapshot {snapshot.version} written to {snapshot.path}")
+    for name in snapshot.names:
+        df = snapshot[name]
+        print(f"  {name:<14} {len(df):>8} rows  {df.memory_usage(deep=True).sum() / 1024:>9.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
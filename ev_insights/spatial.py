@@ -0,0 +1,87 @@
+"""Point-in-polygon assignment of coordinates to states.
+
+``StateLocator`` loads the state polygons once into a shapely STRtree, so
+assigning any number of points is a single vectorised tree query rather than
+a polygon test per point and state. Points that fall just outside every
+polygon (coastal locations against simplified coastlines) snap to the
+nearest state within ``snap_degrees``. ``state_density`` turns the resulting
+per-state counts into counts per 1,000 km² using the ``area_km2`` the
+boundary build stores on each feature.
+"""
+import numpy as np
+import pandas as pd
+
+SNAP_DEGREES = 0.05  # ~5 km; a geocoded city on a simplified coastline is rarely further out
+
+
+class StateLocator:
+    """STRtree over the state polygons of a boundary GeoJSON."""
+
+    def __init__(self, geojson, name_field="NAME_1", snap_degrees=SNAP_DEGREES):
+        import shapely
+        from shapely.geometry import shape
+
+        features = [f for f in geojson["features"] if f.get("geometry")]
+        self.names = np.array([f["properties"][name_field] for f in features], dtype=object)
+        self.areas_km2 = pd.Series([f["properties"].get("area_km2", np.nan) for f in features],
+                                   index=pd.Index(self.names, name="State"), dtype=float)
+        self.geometries = np.array([shape(f["geometry"]) for f in features], dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+        self.snap_degrees = snap_degrees
+        self.snap_zone = None
+        if snap_degrees:
+            # Everything within snap_degrees of some state; one prepared polygon, so testing it is cheap
+            self.snap_zone = shapely.buffer(shapely.union_all(self.geometries), snap_degrees, quad_segs=8)
+            shapely.prepare(self.snap_zone)
+
+    def locate(self, lon, lat):
+        """State name per point (object array, None outside every state or for missing coordinates)."""
+        import shapely
+
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        result = np.full(len(lon), None, dtype=object)
+        valid = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+        if not len(valid):
+            return result
+        points = shapely.points(lon[valid], lat[valid])
+        point_idx, state_idx = self.tree.query(points, predicate="within")
+        # Overlapping polygons can both contain a point; keep the first state in file order
+        order = np.lexsort((state_idx, point_idx))
+        point_idx, state_idx = point_idx[order], state_idx[order]
+        first = np.r_[True, point_idx[1:] != point_idx[:-1]]
+        result[valid[point_idx[first]]] = self.names[state_idx[first]]
+
+        if self.snap_zone is not None:
+            outside = np.flatnonzero(result[valid] == None)  # noqa: E711 - elementwise comparison
+            # Nearest-state searches are costly; only run them for points in the snap zone
+            outside = outside[shapely.contains_xy(self.snap_zone, lon[valid[outside]], lat[valid[outside]])]
+            if len(outside):
+                near_point, near_state = self.tree.query_nearest(points[outside], max_distance=self.snap_degrees,
+                                                                 all_matches=False)
+                result[valid[outside[near_point]]] = self.names[near_state]
+        return result
+
+    def join(self, df, lat_col="Latitude", lon_col="Longitude", column="Located State"):
+        """Copy of ``df`` with the state each row's coordinates fall in (categorical) added as ``column``."""
+        located = self.locate(df[lon_col].to_numpy(dtype=float, na_value=np.nan),
+                              df[lat_col].to_numpy(dtype=float, na_value=np.nan))
+        return df.assign(**{column: pd.Categorical(located, categories=self.names)})
+
+    def state_density(self, counts, per_km2=1000):
+        """Frame of State, count, area and count per ``per_km2`` km² from a per-state count Series."""
+        counts = pd.Series(counts)
+        counts.index = counts.index.astype(str)
+        frame = pd.DataFrame({"Count": counts.reindex(self.areas_km2.index, fill_value=0),
+                              "Area (km²)": self.areas_km2})
+        frame[f"Per {per_km2:,} km²"] = frame["Count"] / frame["Area (km²)"] * per_km2
+        extra = counts.index.difference(self.areas_km2.index)  # States without a polygon keep their count
+        if len(extra):
+            frame = pd.concat([frame, pd.DataFrame({"Count": counts[extra]})])
+        return frame.rename_axis("State").reset_index().sort_values("Count", ascending=False, ignore_index=True)
+
+
+def count_by_state(located, dropna=True):
+    """Number of points per located state."""
+    return pd.Series(located, dtype=object).value_counts(dropna=dropna)
@@ -0,0 +1,188 @@
+"""State-name normalisation against the boundary file.
+
+``StateIndex`` is built once from the ``NAME_1`` values of the vendored
+state boundaries plus a table of known aliases, so every normalised name is
+one the choropleth can join on. Spellings it has not seen are resolved with a
+precomputed character-trigram index (best Dice similarity above a threshold,
+and clearly ahead of the next state - "Pradesh" alone is left ambiguous
+rather than credited to whichever Pradesh ranks first) and memoised.
+``normalize`` maps a whole column through its distinct values only,
+returning a categorical column and a report of alias, fuzzy, ambiguous and
+unmatched values:
+
+    index = default_state_index()
+    states, report = index.normalize(df["State"])
+"""
+import hashlib
+import os
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ev_insights.boundaries import BOUNDARY_DIR, LEVELS_OF_DETAIL, boundary_path, load_boundaries
+from ev_insights.freshness import stat_signature
+
+UNKNOWN_STATE = "Unknown"
+MIN_SIMILARITY = 0.55  # Dice similarity of character trigrams needed for a fuzzy match
+MIN_MARGIN = 0.1  # ... and the lead it needs over the best other state
+
+# Alternative spellings -> the boundary file's NAME_1
+STATE_ALIASES = {
+    "Andaman & Nicobar": "Andaman and Nicobar Islands",
+    "Andaman & Nicobar Islands": "Andaman and Nicobar Islands",
+    "Arunanchal Pradesh": "Arunachal Pradesh",
+    "Dadra & Nagar Haveli": "Dadra and Nagar Haveli",
+    "Dadra & Nagar Haveli and Daman & Diu": "Dadra and Nagar Haveli",
+    "Dadra and Nagar Haveli and Daman and Diu": "Dadra and Nagar Haveli",
+    "D&D and DNH": "Dadra and Nagar Haveli",
+    "DNH and DD": "Dadra and Nagar Haveli",
+    "NCT of Delhi": "Delhi",
+    "New Delhi": "Delhi",
+    "Orissa": "Odisha",
+    "Telengana": "Telangana",
+    "Jammu & Kashmir": "Jammu and Kashmir",
+    "J&K": "Jammu and Kashmir",
+    "Puducherry": "Pondicherry",
+    "Uttaranchal": "Uttarakhand",
+    "Chattisgarh": "Chhattisgarh",
+    "Tamilnadu": "Tamil Nadu",
+}
+
+# Territories that are real but have no polygon in the boundary file; kept as-is rather than fuzzy-matched elsewhere
+STATES_WITHOUT_BOUNDARY = ("Lakshadweep", "Ladakh", "Daman and Diu")
+
+
+def name_key(name):
+    """Comparison key: casefolded, '&' spelled out, punctuation dropped, whitespace collapsed."""
+    name = str(name).casefold().replace("&", " and ")
+    return " ".join(re.sub(r"[^\w\s]", " ", name).split())
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StateIndex:
+    """Canonical state names plus aliases, with a trigram index for unseen spellings."""
+
+    def __init__(self, canonical_names, aliases=STATE_ALIASES, min_similarity=MIN_SIMILARITY, min_margin=MIN_MARGIN):
+        self.canonical_names = sorted(set(canonical_names))
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._exact = {}  # key -> (canonical, "exact" | "alias")
+        for name in self.canonical_names:
+            self._exact[name_key(name)] = (name, "exact")
+        for alias, canonical in aliases.items():
+            if canonical in self.canonical_names:
+                self._exact.setdefault(name_key(alias), (canonical, "alias"))
+        # Inverted trigram index over every known key (names and aliases alike)
+        self._keys = list(self._exact)
+        self._key_grams = [trigrams(key) for key in self._keys]
+        self._postings = defaultdict(list)
+        for idx, grams in enumerate(self._key_grams):
+            for gram in grams:
+                self._postings[gram].append(idx)
+        self._memo = {}
+
+    @property
+    def fingerprint(self):
+        payload = "\n".join(f"{k}\t{v[0]}" for k, v in sorted(self._exact.items()))
+        return hashlib.sha256(f"{self.min_similarity}\n{self.min_margin}\n{payload}".encode("utf-8")).hexdigest()[:16]
+
+    def match(self, name):
+        """(canonical name or None, match kind) for one raw value; kind is exact, alias, fuzzy, ambiguous, unmatched or missing."""
+        if name is None or (not isinstance(name, str) and pd.isna(name)):
+            return None, "missing"
+        key = name_key(name)
+        if not key:
+            return None, "missing"
+        hit = self._exact.get(key)
+        if hit is not None:
+            return hit
+        if key not in self._memo:
+            self._memo[key] = self._fuzzy(key)
+        return self._memo[key]
+
+    def _fuzzy(self, key):
+        grams = trigrams(key)
+        overlap = Counter(idx for gram in grams for idx in self._postings.get(gram, ()))
+        scores = {}  # Best score per canonical name, so a state's own aliases do not compete with it
+        for idx, shared in overlap.items():
+            name = self._exact[self._keys[idx]][0]
+            scores[name] = max(scores.get(name, 0.0), 2 * shared / (len(grams) + len(self._key_grams[idx])))
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.min_similarity:
+            return None, "unmatched"
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < self.min_margin:
+            return None, "ambiguous"
+        return ranked[0][0], "fuzzy"
+
+    def resolve(self, name, default=UNKNOWN_STATE):
+        canonical, kind = self.match(name)
+        if canonical is not None:
+            return canonical
+        return default if kind == "missing" else " ".join(str(name).split())
+
+    def normalize(self, values, unknown=UNKNOWN_STATE):
+        """Normalise a whole column, matching each distinct value once.
+
+        Returns ``(categorical Series, report)``. Missing values become
+        ``unknown``; unmatched and ambiguous values are kept (whitespace-trimmed) so nothing
+        is silently dropped. ``report`` is a DataFrame with one row per distinct
+        raw value that was not an exact match: value, state, match, rows.
+        """
+        values = pd.Series(values)
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        resolved, kinds = [], []
+        for raw in uniques:
+            canonical, kind = self.match(raw)
+            resolved.append(canonical if canonical is not None else self.resolve(raw, unknown))
+            kinds.append(kind)
+        categories = pd.Index(list(dict.fromkeys(resolved + [unknown])))
+        category_codes = categories.get_indexer(resolved + [unknown])  # Code -1 (missing) picks the trailing unknown
+        normalized = pd.Series(pd.Categorical.from_codes(category_codes[codes], categories=categories),
+                               index=values.index, name=values.name)
+
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        report = pd.DataFrame({"value": [str(u) for u in uniques], "state": resolved, "match": kinds, "rows": counts})
+        missing_rows = int((codes < 0).sum())
+        if missing_rows:
+            report.loc[len(report)] = [None, unknown, "missing", missing_rows]
+        report = report[report["match"] != "exact"].reset_index(drop=True)
+        return normalized, report
+
+
+def boundary_state_names(lod=None, directory=BOUNDARY_DIR):
+    """NAME_1 values of the vendored boundaries (the coarsest level of detail present, it is the smallest file)."""
+    levels = [lod] if lod else sorted(LEVELS_OF_DETAIL, key=LEVELS_OF_DETAIL.get, reverse=True)
+    for level in levels:
+        if os.path.exists(boundary_path(level, directory)):
+            geojson = load_boundaries(level, directory)
+            return [f["properties"]["NAME_1"] for f in geojson["features"]]
+    raise FileNotFoundError(f"No state boundary file under {directory}")
+
+
+def boundary_paths(directory=BOUNDARY_DIR):
+    return [boundary_path(lod, directory) for lod in LEVELS_OF_DETAIL]
+
+
+def default_state_index(directory=BOUNDARY_DIR):
+    """Index over the vendored boundary names (or, without them, the alias targets) plus territories they lack.
+
+    Cached per boundary-file stat signature, so regenerated boundaries get a
+    fresh index (and snapshot fingerprint) without a restart.
+    """
+    return _state_index(directory, stat_signature(boundary_paths(directory)))
+
+
+@lru_cache(maxsize=4)
+def _state_index(directory, signature):  # ``signature`` only keys the cache
+    try:
+        names = boundary_state_names(directory=directory)
+    except FileNotFoundError:
+        names = list(STATE_ALIASES.values())
+    return StateIndex(list(names) + list(STATES_WITHOUT_BOUNDARY))
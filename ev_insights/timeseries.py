@@ -0,0 +1,134 @@
+"""Multi-resolution roll-ups and downsampling for the category time series.
+
+``build_rollups`` aggregates the registration series once at native, weekly
+and monthly resolution. For a given date span and chart width,
+``choose_resolution`` picks the finest roll-up that fits the pixel budget,
+and ``lttb`` downsamples a single line to a fixed number of points while
+keeping its visual shape. Both keep the Plotly payload bounded however
+many years of data the feed holds.
+"""
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+DEFAULT_CHART_WIDTH_PX = 1200
+POINTS_PER_PIXEL = 1.0
+
+# Roll-up key -> (pandas frequency, label); ordered finest to coarsest. Coarser roll-ups
+# are labelled by the first day of their period, like the native rows they sum
+RESOLUTIONS = {
+    "D": (None, "Daily"),  # Native rows, duplicate dates summed
+    "W": ("W-MON", "Weekly"),  # Monday-to-Sunday weeks
+    "M": ("MS", "Monthly"),
+}
+
+
+def slice_dates(df, start=None, end=None):
+    """Rows of a frame/series with a sorted DatetimeIndex whose date falls in [start, end].
+
+    Two ``searchsorted`` calls plus a positional slice: O(log n) and a view onto
+    the underlying data rather than a boolean-mask copy.
+    """
+    index = df.index
+    lo = 0 if start is None else index.searchsorted(pd.Timestamp(start), side="left")
+    hi = len(index) if end is None else index.searchsorted(pd.Timestamp(end), side="right")
+    return df.iloc[lo:hi]
+
+
+def slice_periods(rollup, key, start=None, end=None):
+    """Rows of roll-up ``key`` whose period overlaps [start, end].
+
+    Roll-ups are labelled by period start, so the period holding ``start`` is
+    labelled before it; plain ``slice_dates`` would drop that period's rows.
+    """
+    freq = RESOLUTIONS[key][0]
+    if freq is not None and start is not None:
+        start = to_offset(freq).rollback(pd.Timestamp(start).normalize())
+    return slice_dates(rollup, start, end)
+
+
+def build_rollups(evcat_df, date_col="Date"):
+    """Return {resolution key: frame indexed by period start} for every numeric column.
+
+    ``evcat_df`` may carry the dates as a column or (as the snapshot stores it) as
+    a sorted DatetimeIndex. Periods with no source rows are dropped rather than
+    shown as zero, so sparse feeds are not padded out at the finer resolutions.
+    """
+    if date_col in evcat_df.columns:
+        evcat_df = evcat_df.set_index(date_col)
+    numeric_cols = [c for c in evcat_df.columns if pd.api.types.is_numeric_dtype(evcat_df[c])]
+    native = evcat_df[numeric_cols]
+    if not (native.index.is_monotonic_increasing and native.index.is_unique):
+        native = native.groupby(level=0, sort=True).sum()
+    native = native.rename_axis(date_col)
+    rollups = {"D": native}
+    for key, (freq, _) in RESOLUTIONS.items():
+        if freq is not None:
+            rollups[key] = native.resample(freq, label="left", closed="left").sum(min_count=1).dropna(how="all")
+    return rollups
+
+
+def append_rollups(rollups, delta, date_col="Date"):
+    """Roll-ups of the stored series extended by ``delta`` (rows dated after everything stored).
+
+    History is not re-aggregated: ``delta`` is rolled up on its own and only its
+    first period is merged into the stored last period when the two coincide
+    (a monthly drop landing in a week or month that is already partly stored).
+    """
+    fresh = build_rollups(delta, date_col)
+    out = {}
+    for key, stored in rollups.items():
+        added = fresh[key]
+        if len(stored) and len(added) and added.index[0] == stored.index[-1]:
+            added = pd.concat([stored.iloc[[-1]].add(added.iloc[[0]], fill_value=0), added.iloc[1:]])
+            stored = stored.iloc[:-1]
+        out[key] = pd.concat([stored, added])
+    return out
+
+
+def point_budget(width_px=DEFAULT_CHART_WIDTH_PX, points_per_px=POINTS_PER_PIXEL):
+    return max(int(width_px * points_per_px), 2)
+
+
+def choose_resolution(rollups, start, end, width_px=DEFAULT_CHART_WIDTH_PX, points_per_px=POINTS_PER_PIXEL):
+    """Finest roll-up whose row count within [start, end] fits the chart's point budget."""
+    budget = point_budget(width_px, points_per_px)
+    for key in RESOLUTIONS:
+        if len(slice_periods(rollups[key], key, start, end)) <= budget:
+            return key
+    return list(RESOLUTIONS)[-1]
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling. Returns the indices of the kept points.
+
+    ``x`` must be sorted and numeric (datetimes can be passed as their int64 ticks).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 buckets between the end points
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        # Twice the triangle area (prev point, candidate, next-bucket average) for every candidate
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(area.argmax())
+        kept[i + 1] = prev
+    return kept
+
+
+def downsample_series(series, width_px=DEFAULT_CHART_WIDTH_PX, points_per_px=POINTS_PER_PIXEL):
+    """LTTB-downsample a datetime-indexed Series to the chart's point budget (no-op if it already fits)."""
+    budget = point_budget(width_px, points_per_px)
+    if len(series) <= budget:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    return series.iloc[lttb(x, series.fillna(0).to_numpy(), budget)]